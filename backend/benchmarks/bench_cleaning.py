@@ -0,0 +1,103 @@
+"""Benchmark vectorized empty-row removal and phone standardization.
+
+Compares the current CleaningOperations implementations against the
+row-wise versions they replaced. Run from the backend directory:
+
+    python -m benchmarks.bench_cleaning --rows 1000000 10000000
+"""
+import argparse
+import re
+import time
+import numpy as np
+import pandas as pd
+from utils.cleaning_operations import CleaningOperations
+
+
+def legacy_remove_empty_rows(df: pd.DataFrame):
+    """Row-wise implementation used before vectorization"""
+    original_count = len(df)
+    mask = df.apply(lambda row: row.isna().all() or all((str(x).strip() == '' or pd.isna(x)) for x in row), axis=1)
+    df = df[~mask]
+    return df, original_count - len(df)
+
+
+def legacy_fix_phone_formats(df: pd.DataFrame, column: str):
+    """Per-value implementation used before vectorization"""
+    fixed_count = 0
+    def standardize_phone(val):
+        nonlocal fixed_count
+        if pd.isna(val):
+            return val
+        digits = re.sub(r'\D', '', str(val))
+        if len(digits) == 10:
+            fixed_count += 1
+            return f"{digits[:3]}-{digits[3:6]}-{digits[6:]}"
+        return val
+    df[column] = df[column].apply(standardize_phone)
+    return df, fixed_count
+
+
+def make_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Build a frame with phone variants and roughly 5% blank rows"""
+    rng = np.random.default_rng(seed)
+    area = rng.integers(200, 999, rows).astype(str)
+    line = rng.integers(1000000, 9999999, rows).astype(str)
+    styles = rng.integers(0, 4, rows)
+    phones = np.where(styles == 0, np.char.add(area, line),
+             np.where(styles == 1, np.char.add(np.char.add(area, '-'), line),
+             np.where(styles == 2, np.char.add(np.char.add('(', area), np.char.add(') ', line)), '12345')))
+    df = pd.DataFrame({
+        'phone': phones.astype(object),
+        'name': rng.choice(['Alice', 'Bob', ' Carol ', ''], rows).astype(object),
+        'amount': rng.random(rows),
+    })
+    blank = rng.random(rows) < 0.05
+    df.loc[blank, 'phone'] = ''
+    df.loc[blank, 'name'] = '  '
+    df.loc[blank, 'amount'] = np.nan
+    return df
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def run(rows: int, include_legacy: bool) -> list:
+    ops = CleaningOperations()
+    df = make_frame(rows)
+    results = []
+
+    new_time, (_, new_removed) = timed(ops.remove_empty_rows, df)
+    old_time, old_removed = None, None
+    if include_legacy:
+        old_time, (_, old_removed) = timed(legacy_remove_empty_rows, df)
+        assert old_removed == new_removed, "remove_empty_rows results differ"
+    results.append(('remove_empty_rows', rows, old_time, new_time))
+
+    new_time, (_, new_fixed) = timed(ops.fix_phone_formats, df.copy(), {'column': 'phone'})
+    old_time = None
+    if include_legacy:
+        old_time, (_, old_fixed) = timed(legacy_fix_phone_formats, df.copy(), 'phone')
+        assert old_fixed == new_fixed, "fix_phone_formats results differ"
+    results.append(('fix_phone_formats', rows, old_time, new_time))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000000, 10000000])
+    parser.add_argument('--skip-legacy', action='store_true', help='Only time the vectorized versions')
+    args = parser.parse_args()
+
+    print(f"{'operation':<20} {'rows':>10} {'legacy (s)':>11} {'vectorized (s)':>15} {'speedup':>8}")
+    for rows in args.rows:
+        for name, n, old_time, new_time in run(rows, not args.skip_legacy):
+            legacy = f"{old_time:.2f}" if old_time is not None else '-'
+            speedup = f"{old_time / new_time:.1f}x" if old_time is not None else '-'
+            print(f"{name:<20} {n:>10} {legacy:>11} {new_time:>15.3f} {speedup:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Benchmark /history pages on a large file_records table.
+
+Fills a SQLite database with synthetic records, then times the endpoint's
+first, middle and last pages, with and without status and date filters,
+next to the query it replaced: the newest 50 records by a full scan and
+sort, and OFFSET paging to the same depth. Keyset pages should take the
+same time at any depth. Run from the backend directory:
+
+    python -m benchmarks.bench_history --rows 1000000
+    python -m benchmarks.bench_history --rows 10000000 --db /tmp/history.db
+
+A --db that already holds at least --rows records is reused as is.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+STATUSES = ('uploaded', 'analyzed', 'cleaned', 'error')
+INSERT_BATCH = 50000
+PAGE_SIZE = 50
+
+
+def fill(engine, rows: int):
+    """Add synthetic records until the table holds rows of them, uploaded over three years"""
+    with engine.connect() as conn:
+        existing = conn.exec_driver_sql("SELECT COUNT(*) FROM file_records").scalar()
+    if existing >= rows:
+        return existing
+    start = datetime(2023, 1, 1)
+    step = timedelta(days=3 * 365) / rows
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for batch_start in range(existing, rows, INSERT_BATCH):
+            batch = [
+                (f"bench-{i}", f"file_{i}.csv", (start + step * i).strftime('%Y-%m-%d %H:%M:%S.%f'),
+                 1024 + i % 4096, 1000 + i % 997, 8, i % 9, STATUSES[i % 7 % len(STATUSES)], 0, 0, 0)
+                for i in range(batch_start, min(batch_start + INSERT_BATCH, rows))
+            ]
+            cursor.executemany(
+                "INSERT INTO file_records (file_id, original_filename, upload_date, file_size, total_rows, "
+                "total_columns, issues_count, status, rows_removed, values_fixed, columns_renamed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch
+            )
+            raw.commit()
+            print(f"\rInserted {min(batch_start + INSERT_BATCH, rows)} / {rows} records", end='', flush=True)
+        cursor.execute("ANALYZE")
+        raw.commit()
+    finally:
+        raw.close()
+    print()
+    return rows
+
+
+def timed_ms(func, repeat: int) -> float:
+    """Median milliseconds of repeat calls"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def cursor_at(engine, depth: int, status: str = None) -> str:
+    """The cursor /history returns after depth records, found with one slow OFFSET query"""
+    from models.database import FileRecord
+    from routers.data_cleaning import encode_history_cursor
+    where = "WHERE status = ? " if status else ""
+    params = (status, depth - 1) if status else (depth - 1,)
+    with engine.connect() as conn:
+        row = conn.exec_driver_sql(
+            f"SELECT id, upload_date FROM file_records {where}ORDER BY upload_date DESC, id DESC LIMIT 1 OFFSET ?",
+            params
+        ).first()
+    return encode_history_cursor(FileRecord(id=row[0], upload_date=datetime.fromisoformat(row[1])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--db', help='SQLite file to fill or reuse; a temporary one by default')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed requests per case; the median is kept')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    db_path = os.path.abspath(args.db or os.path.join(tmp, 'history.db'))
+    # The app reads its settings on import, so point it at scratch storage first
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    for name in ('UPLOAD_DIR', 'CLEANED_DIR', 'DATASET_DIR'):
+        os.environ.setdefault(name, os.path.join(tmp, name.lower()))
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from models.database import engine
+    from routers import data_cleaning  # creates the tables and indexes
+
+    start = time.perf_counter()
+    total = fill(engine, args.rows)
+    print(f"{total} records in {db_path} (filled in {time.perf_counter() - start:.1f}s)")
+
+    app = FastAPI()
+    app.include_router(data_cleaning.router)
+    client = TestClient(app)
+
+    def page(**params):
+        response = client.get('/history', params={'limit': PAGE_SIZE, **params})
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    middle, last = total // 2, max(total - PAGE_SIZE, 1)
+    recent = (datetime(2023, 1, 1) + timedelta(days=3 * 365) * 0.9).isoformat()
+    window = ((datetime(2023, 1, 1) + timedelta(days=365)).isoformat(),
+              (datetime(2023, 1, 1) + timedelta(days=366)).isoformat())
+
+    cases = [
+        ('first page', lambda: page()),
+        (f'page at record {middle}', lambda c=cursor_at(engine, middle): page(cursor=c)),
+        (f'page at record {last}', lambda c=cursor_at(engine, last): page(cursor=c)),
+        ('status=cleaned, first page', lambda: page(status='cleaned')),
+        ('status=cleaned, deep page', lambda c=cursor_at(engine, total // 7, 'cleaned'): page(status='cleaned', cursor=c)),
+        ('uploaded_after (last 10%)', lambda: page(uploaded_after=recent)),
+        ('one-day date range', lambda: page(uploaded_after=window[0], uploaded_before=window[1])),
+        ('status + date range', lambda: page(status='error', uploaded_after=window[0], uploaded_before=window[1])),
+    ]
+
+    def legacy(sql, *params):
+        def run():
+            with engine.connect() as conn:
+                conn.exec_driver_sql(sql, params).all()
+        return run
+
+    # NOT INDEXED reproduces the plan from before upload_date was indexed
+    legacy_cases = [
+        ('first page, full scan + sort', legacy(
+            "SELECT * FROM file_records NOT INDEXED ORDER BY upload_date DESC LIMIT ?", PAGE_SIZE)),
+        (f'OFFSET {middle}', legacy(
+            "SELECT * FROM file_records ORDER BY upload_date DESC, id DESC LIMIT ? OFFSET ?", PAGE_SIZE, middle)),
+        (f'OFFSET {last}', legacy(
+            "SELECT * FROM file_records ORDER BY upload_date DESC, id DESC LIMIT ? OFFSET ?", PAGE_SIZE, last)),
+    ]
+
+    print(f"\n{'/history (keyset)':<40} {'median ms':>10}")
+    for name, func in cases:
+        print(f"{name:<40} {timed_ms(func, args.repeat):>10.2f}", flush=True)
+    print(f"\n{'replaced queries':<40} {'median ms':>10}")
+    for name, func in legacy_cases:
+        # These scan the table, so a few runs are enough
+        print(f"{name:<40} {timed_ms(func, min(args.repeat, 3)):>10.2f}", flush=True)
+
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT id FROM file_records WHERE status = 'cleaned' "
+            "AND (upload_date, id) < ('2024-01-01', 1) ORDER BY upload_date DESC, id DESC LIMIT 51"
+        ).all()
+    print("\nQuery plan of a filtered page:", '; '.join(row[-1] for row in plan))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""Time every analysis check, cleaning fix, file read and export format.
+
+Each case runs on a synthetic frame from benchmarks.datagen. Times are the
+best of --repeat runs; peak memory is the most the case allocated above
+what it started with, measured with tracemalloc in one extra run. Memory
+held by pyarrow isn't traced. Run from the backend directory:
+
+    python -m benchmarks.bench_suite --rows 10000 100000 1000000 10000000
+    python -m benchmarks.bench_suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench_suite --baseline benchmarks/baseline.json --only clean.
+
+With --baseline, cases slower or larger than the stored run by more than
+--tolerance are reported and the exit status is 1.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import pandas as pd
+from benchmarks.datagen import make_dirty_frame
+from services.data_analyzer import DataAnalyzer
+from services.data_profile import DataProfile
+from services.file_handler import FileHandler
+from utils.cleaning_operations import CleaningOperations
+
+# Excel sheets hold 1,048,576 rows including the header
+EXCEL_MAX_ROWS = 1048575
+
+# Differences below these are noise, whatever the ratio
+MIN_SECONDS_CHANGE = 0.005
+MIN_MB_CHANGE = 1.0
+
+Case = Tuple[str, Callable[[], object]]
+
+
+def analysis_cases(df: pd.DataFrame) -> Iterator[Case]:
+    """Each check on its own, with a fresh profile so shared column views are counted"""
+    analyzer = DataAnalyzer()
+    for check in DataAnalyzer.CHECKS:
+        yield f"analyze.{check}", lambda check=check: getattr(analyzer, check)(df, DataProfile(df))
+
+
+def cleaning_cases(df: pd.DataFrame) -> Iterator[Case]:
+    """Each fix on the issue the analyzer reports for df, plus a full cleaning run"""
+    ops = CleaningOperations()
+    issues = DataAnalyzer().analyze(df)
+    by_type = {}
+    for issue in issues:
+        by_type.setdefault(issue['type'], issue)
+    row_index = DataProfile(df).row_index
+
+    # Fixes replace the columns they change, so a shallow copy keeps df intact
+    fixes = {
+        'column_naming': ops.fix_column_names,
+        'date_format': ops.fix_date_formats,
+        'phone_format': ops.fix_phone_formats,
+        'whitespace': ops.fix_whitespace,
+    }
+    for issue_type, fix in fixes.items():
+        if issue_type in by_type:
+            yield f"clean.{fix.__name__}", lambda fix=fix, issue=by_type[issue_type]: fix(df.copy(deep=False), issue)
+    yield 'clean.remove_duplicates', lambda: ops.remove_duplicates(df.copy(deep=False))
+    yield 'clean.remove_duplicates_indexed', lambda: ops.remove_duplicates(df.copy(deep=False), row_index)
+    yield 'clean.handle_missing_values', lambda: ops.handle_missing_values(df.copy(deep=False))
+    yield 'clean.remove_empty_rows', lambda: ops.remove_empty_rows(df.copy(deep=False))
+    selected = [issue['id'] for issue in issues]
+    yield 'clean.apply_cleaning', lambda: ops.apply_cleaning(df, issues, selected)
+
+
+def file_cases(df: pd.DataFrame, handler: FileHandler) -> Iterator[Case]:
+    """export_data in every format, then read_file on the exported CSV and Excel files"""
+    name = f"bench_{len(df)}"
+    formats = [fmt for fmt in FileHandler.EXPORT_FORMATS if fmt != 'xlsx' or len(df) <= EXCEL_MAX_ROWS]
+    for fmt in formats:
+        yield f"export.{fmt}", lambda fmt=fmt: handler.export_data(df, fmt, f"{name}.{fmt}")
+    for fmt in ('csv', 'xlsx'):
+        if fmt in formats:
+            path = os.path.join(handler.cleaned_dir, f"{name}.{fmt}")
+            yield f"read_file.{fmt}", lambda fmt=fmt, path=path: handler.read_file(_exported(handler, df, fmt, path))
+
+
+def _exported(handler: FileHandler, df: pd.DataFrame, fmt: str, path: str) -> str:
+    """path, exporting df to it first when --only skipped the export case"""
+    if not os.path.exists(path):
+        handler.export_data(df, fmt, os.path.basename(path))
+    return path
+
+
+def measure(func: Callable[[], object], repeat: int, trace_memory: bool) -> Dict:
+    """Best time of repeat runs and, when trace_memory is set, peak traced memory of one more"""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    result = {'seconds': round(min(times), 6), 'peak_mb': None}
+    if trace_memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            result['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 3)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run(rows: int, handler: FileHandler, only: Optional[List[str]], repeat: int,
+        trace_memory: bool, dirtiness: float) -> Dict[str, Dict]:
+    df = make_dirty_frame(rows, dirtiness)
+    results = {}
+    for cases in (analysis_cases(df), cleaning_cases(df), file_cases(df, handler)):
+        for name, func in cases:
+            if only and not any(pattern in name for pattern in only):
+                continue
+            result = measure(func, repeat, trace_memory)
+            results[f"{name}@{rows}"] = result
+            _print_row(name, rows, result)
+    return results
+
+
+def load_baseline(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: Dict[str, Dict], dirtiness: float):
+    """Write results to path, keeping stored cases that weren't run this time"""
+    stored = load_baseline(path)['results'] if os.path.exists(path) else {}
+    stored.update(results)
+    baseline = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'dirtiness': dirtiness,
+        'results': dict(sorted(stored.items())),
+    }
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2)
+        f.write('\n')
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """Print each case against its baseline and return the ones that regressed"""
+    regressions = []
+    print(f"\n{'case':<42} {'seconds':>10} {'baseline':>10} {'change':>8} {'peak MB':>10} {'baseline':>10} {'change':>8}")
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        name, rows = key.rsplit('@', 1)
+        slower = _regressed(result['seconds'], base['seconds'], tolerance, MIN_SECONDS_CHANGE)
+        larger = _regressed(result['peak_mb'], base.get('peak_mb'), tolerance, MIN_MB_CHANGE)
+        flag = '  << slower' if slower else ''
+        flag += '  << more memory' if larger else ''
+        print(f"{name + '@' + rows:<42} {result['seconds']:>10.4f} {base['seconds']:>10.4f} "
+              f"{_change(result['seconds'], base['seconds']):>8} {_mb(result['peak_mb']):>10} "
+              f"{_mb(base.get('peak_mb')):>10} {_change(result['peak_mb'], base.get('peak_mb')):>8}{flag}")
+        if slower or larger:
+            regressions.append(key)
+    return regressions
+
+
+def _regressed(value: Optional[float], base: Optional[float], tolerance: float, floor: float) -> bool:
+    if value is None or base is None:
+        return False
+    return value > base * (1 + tolerance) and value - base > floor
+
+
+def _change(value: Optional[float], base: Optional[float]) -> str:
+    if value is None or not base:
+        return '-'
+    return f"{(value - base) / base * 100:+.0f}%"
+
+
+def _mb(value: Optional[float]) -> str:
+    return f"{value:.1f}" if value is not None else '-'
+
+
+def _print_row(name: str, rows: int, result: Dict):
+    print(f"{name:<36} {rows:>10} {result['seconds']:>10.4f} {_mb(result['peak_mb']):>10}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000, 10000000])
+    parser.add_argument('--only', nargs='+', help='Run only cases whose name contains one of these')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case; the best is kept')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc run')
+    parser.add_argument('--dirtiness', type=float, default=0.1, help='Share of malformed values per column')
+    parser.add_argument('--baseline', help='Compare with results stored in this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown or growth, 0.2 = 20%%')
+    parser.add_argument('--save-baseline', help='Store the results in this JSON file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Exports and reads go to a scratch directory instead of storage/
+        os.environ['UPLOAD_DIR'] = os.path.join(tmp, 'uploads')
+        os.environ['CLEANED_DIR'] = os.path.join(tmp, 'cleaned')
+        handler = FileHandler()
+
+        print(f"{'case':<36} {'rows':>10} {'seconds':>10} {'peak MB':>10}")
+        results = {}
+        for rows in args.rows:
+            results.update(run(rows, handler, args.only, args.repeat, not args.no_memory, args.dirtiness))
+
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results, args.dirtiness)
+        print(f"\nSaved {len(results)} results to {args.save_baseline}")
+    if args.baseline:
+        regressions = compare(results, load_baseline(args.baseline)['results'], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Generate synthetic datasets with the problems the analyzer looks for.
+
+Every column mixes clean values with dirty ones: dates in several formats,
+malformed emails, phone number variants, padded names and amounts with
+currency text. Some cells are blank, some rows are mostly blank and some
+rows repeat earlier ones. Run from the backend directory to write a file:
+
+    python -m benchmarks.datagen --rows 1000000 --dirtiness 0.2 --output dirty.csv
+"""
+import argparse
+import numpy as np
+import pandas as pd
+
+DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y', '%b %d, %Y', '%d %B %Y']
+CITIES = ['Austin', 'Boston', 'Chicago', 'Denver', 'Miami', 'Portland', 'Seattle', 'Tampa']
+FIRST_NAMES = ['Alice', 'Bob', 'Carol', 'Dave', 'Erin', 'Frank', 'Grace', 'Heidi', 'Ivan', 'Judy']
+LAST_NAMES = ['Smith', 'Jones', 'Brown', 'Garcia', 'Miller', 'Davis', 'Lopez', 'Wilson']
+DOMAINS = ['example.com', 'mail.org', 'corp.net']
+
+# Distinct values per column are drawn from pools of at most this many, so
+# values repeat as they do in real files and large frames build quickly
+POOL_SIZE = 100000
+
+
+def _pick(rng: np.random.Generator, variants: np.ndarray, rows: int, dirtiness: float) -> np.ndarray:
+    """Draw rows values from a (variant, pool) table; variant 0 is the clean one"""
+    styles, pool = variants.shape
+    style = np.where(rng.random(rows) < dirtiness, rng.integers(1, styles, rows), 0)
+    return variants[style, rng.integers(0, pool, rows)]
+
+
+def _date_variants() -> np.ndarray:
+    days = pd.Timestamp('2015-01-01') + pd.to_timedelta(np.arange(3650), unit='D')
+    return np.array([days.strftime(fmt) for fmt in DATE_FORMATS], dtype=object)
+
+
+def _phone_variants(rng: np.random.Generator, pool: int) -> np.ndarray:
+    numbers = zip(rng.integers(200, 999, pool), rng.integers(200, 999, pool), rng.integers(0, 9999, pool))
+    styles = []
+    for area, exchange, line in numbers:
+        styles.append((f"{area}-{exchange}-{line:04d}", f"({area}) {exchange}-{line:04d}",
+                       f"{area}{exchange}{line:04d}", f"{area} {exchange} {line:04d}",
+                       f"+1 {area}.{exchange}.{line:04d}"))
+    return np.array(styles, dtype=object).T
+
+
+def _person_names(rng: np.random.Generator, pool: int) -> np.ndarray:
+    first = np.array(FIRST_NAMES, dtype=object)[rng.integers(0, len(FIRST_NAMES), pool)]
+    last = np.array(LAST_NAMES, dtype=object)[rng.integers(0, len(LAST_NAMES), pool)]
+    return first + ' ' + last
+
+
+def _email_variants(rng: np.random.Generator, names: np.ndarray) -> np.ndarray:
+    domains = np.array(DOMAINS, dtype=object)[rng.integers(0, len(DOMAINS), len(names))]
+    users = np.char.lower(np.char.replace(names.astype(str), ' ', '.')).astype(object)
+    users = users + np.arange(len(names)).astype(str).astype(object)
+    return np.array([
+        users + '@' + domains,
+        users + ' at ' + domains,
+        users + '@@' + domains,
+        users + '@' + np.char.partition(domains.astype(str), '.')[:, 0].astype(object),
+    ])
+
+
+def _amount_variants(rng: np.random.Generator, pool: int) -> np.ndarray:
+    amounts = np.char.mod('%.2f', rng.random(pool) * 1000).astype(object)
+    return np.array([amounts, '$' + amounts, amounts + ' USD'])
+
+
+def make_dirty_frame(rows: int, dirtiness: float = 0.1, null_rate: float = 0.02,
+                     duplicate_rate: float = 0.02, seed: int = 0) -> pd.DataFrame:
+    """Build a frame of rows rows where about dirtiness of each column's values are malformed.
+
+    About null_rate of the cells are blank and half as many rows are
+    mostly blank; about duplicate_rate of the rows repeat another row.
+    """
+    rng = np.random.default_rng(seed)
+    pool = max(min(rows, POOL_SIZE), 1)
+    names = _person_names(rng, pool)
+    unique_rows = max(rows - int(rows * duplicate_rate), 1 if rows else 0)
+
+    df = pd.DataFrame({
+        'Order Date': _pick(rng, _date_variants(), unique_rows, dirtiness),
+        'Email Address': _pick(rng, _email_variants(rng, names), unique_rows, dirtiness),
+        'Phone Number': _pick(rng, _phone_variants(rng, pool), unique_rows, dirtiness),
+        ' Customer Name ': _pick(rng, np.array([names, '  ' + names + ' ']), unique_rows, dirtiness),
+        'Amount': _pick(rng, _amount_variants(rng, pool), unique_rows, dirtiness),
+        'city': np.array(CITIES, dtype=object)[rng.integers(0, len(CITIES), unique_rows)],
+    })
+
+    for column in df.columns:
+        df.loc[rng.random(unique_rows) < null_rate, column] = None
+    sparse = rng.random(unique_rows) < null_rate / 2
+    df.loc[sparse, df.columns[:-1]] = None
+
+    if rows > unique_rows:
+        repeats = df.iloc[rng.integers(0, unique_rows, rows - unique_rows)]
+        df = pd.concat([df, repeats], ignore_index=True)
+        df = df.iloc[rng.permutation(rows)].reset_index(drop=True)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--dirtiness', type=float, default=0.1, help='Share of malformed values per column')
+    parser.add_argument('--null-rate', type=float, default=0.02, help='Share of blank cells')
+    parser.add_argument('--duplicate-rate', type=float, default=0.02, help='Share of repeated rows')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='dirty.csv')
+    args = parser.parse_args()
+
+    df = make_dirty_frame(args.rows, args.dirtiness, args.null_rate, args.duplicate_rate, args.seed)
+    df.to_csv(args.output, index=False)
+    print(f"Wrote {len(df)} rows to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
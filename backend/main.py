@@ -1,12 +1,13 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, PlainTextResponse
 import uvicorn
 import os
 from dotenv import load_dotenv
 
 from routers import data_cleaning
 from services.file_handler import FileHandler
+from utils.metrics import metrics
 
 load_dotenv()
 
@@ -40,10 +41,19 @@ async def root():
         "docs": "/docs"
     }
 
+@app.on_event("shutdown")
+async def shutdown_workers():
+    data_cleaning.worker_pool.shutdown()
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Stage latency histograms, row counts and memory deltas in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", 8000))
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, JSON
+from sqlalchemy import create_engine, event, Column, Index, Integer, String, DateTime, Text, JSON, UniqueConstraint, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -7,11 +7,40 @@ import os
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./storage/data_cleaner.db")
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
+# SQLite settings applied to every connection. WAL lets readers such as
+# /history run while a worker writes, and NORMAL sync is safe under WAL.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    # Milliseconds a connection waits for a lock before failing
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000)),
+    # Negative sizes are in KiB
+    "cache_size": -int(os.getenv("SQLITE_CACHE_KB", 64 * 1024)),
+    "temp_store": "MEMORY",
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 ** 2)),
+}
+
+@event.listens_for(engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    if engine.dialect.name != "sqlite":
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 class FileRecord(Base):
     __tablename__ = "file_records"
+    __table_args__ = (
+        # Newest-first history pages, overall and per status
+        Index('ix_file_records_upload_date_id', 'upload_date', 'id'),
+        Index('ix_file_records_status_upload_date_id', 'status', 'upload_date', 'id'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     file_id = Column(String, unique=True, index=True)
@@ -29,11 +58,58 @@ class FileRecord(Base):
     columns_renamed = Column(Integer, default=0)
     status = Column(String, default="uploaded")  # uploaded, analyzed, cleaned
     error_message = Column(Text, nullable=True)
+    file_path = Column(String, nullable=True)  # uploaded source file
+    dataset_path = Column(String, nullable=True)  # Arrow dataset of the original data
+    cleaned_dataset_path = Column(String, nullable=True)  # Arrow dataset of the cleaned data
+    issues = Column(JSON, nullable=True)  # full issue details used by /clean
+    content_hash = Column(String, nullable=True, index=True)  # SHA-256 of the uploaded bytes, plus ":<sheet>" past the first sheet
+    cleaning_version = Column(Integer, default=0)  # bumped by every /clean run, keys cached exports
+    sheet_name = Column(String, nullable=True)  # worksheet read from an Excel upload
+
+class AnalysisResult(Base):
+    __tablename__ = "analysis_results"
+    __table_args__ = (UniqueConstraint('content_hash', 'rules_version'),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String, index=True)
+    rules_version = Column(Integer)  # DataAnalyzer.RULES_VERSION that produced the result
+    issues = Column(JSON)
+    stats = Column(JSON)
+    dtypes = Column(JSON, nullable=True)
+    created_date = Column(DateTime, default=datetime.utcnow)
+
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, unique=True, index=True)
+    kind = Column(String)  # analyze, clean
+    file_id = Column(String, index=True)
+    status = Column(String, default="queued")  # queued, running, completed, failed
+    progress = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)
+    error_message = Column(Text, nullable=True)
+    created_date = Column(DateTime, default=datetime.utcnow)
+    updated_date = Column(DateTime, nullable=True)
 
 def init_db():
     """Initialize database"""
     os.makedirs("./storage", exist_ok=True)
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+
+def add_missing_columns():
+    """Add columns and indexes defined on the models but missing from existing tables"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {col['name'] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    col_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
 
 def get_db():
     """Get database session"""
@@ -1,254 +1,403 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, BackgroundTasks, Depends
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, File, Form, UploadFile, HTTPException, BackgroundTasks, Depends, Query, Header
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy.orm import Session
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session, load_only
+import asyncio
+import base64
+import json
 import os
+import time
 import uuid
-from typing import List
-from datetime import datetime
-import pytz
-import numpy as np
-from services.file_handler import FileHandler
-from services.data_analyzer import DataAnalyzer
+import zipfile
+from urllib.parse import quote
+from typing import List, Optional
+from datetime import datetime, timezone
+from services.file_handler import FileTooLargeError, SheetNotFoundError
+from services.job_manager import JobManager
+from services.worker_pool import WorkerPool
+from services import pipeline
+from services.pipeline import file_handler, dataset_store, export_cache, PreviewError
+from utils.cleaning_operations import CleaningOperations
+from utils.metrics import server_timing, timing_breakdown
 from models.schemas import AnalysisResponse, CleaningRequest, CleaningResponse
 from models.database import get_db, FileRecord, init_db
-from utils.cleaning_operations import CleaningOperations,replace_nan,convert_numpy_types
 
 # Initialize database
 init_db()
 
 router = APIRouter()
 
-file_handler = FileHandler()
-data_analyzer = DataAnalyzer()
-cleaning_ops = CleaningOperations()
+# Largest page the preview endpoint serves
+PREVIEW_MAX_LIMIT = int(os.getenv("PREVIEW_MAX_LIMIT", 1000))
+# Largest page the history endpoint serves
+HISTORY_MAX_LIMIT = int(os.getenv("HISTORY_MAX_LIMIT", 500))
 
-# Store analysis results temporarily (in-memory cache)
-analysis_store = {}
+# Columns /history returns, so the stored issues aren't loaded for every row
+HISTORY_COLUMNS = (
+    FileRecord.id, FileRecord.file_id, FileRecord.original_filename, FileRecord.upload_date,
+    FileRecord.file_size, FileRecord.total_rows, FileRecord.total_columns, FileRecord.issues_count,
+    FileRecord.cleaned_filename, FileRecord.status, FileRecord.rows_removed, FileRecord.values_fixed,
+    FileRecord.columns_renamed,
+)
 
-ist = pytz.timezone('Asia/Kolkata')
+# Pandas work runs here so it never blocks the event loop
+worker_pool = WorkerPool()
+job_manager = JobManager(worker_pool)
+
+
+def get_file_record(db: Session, file_id: str) -> FileRecord:
+    """Look up the record for a file or raise 404"""
+    record = db.query(FileRecord).filter(FileRecord.file_id == file_id).first()
+    if not record:
+        raise HTTPException(status_code=404, detail="File not found")
+    return record
+
+
+def attachment_headers(filename: str) -> dict:
+    """Content-Disposition header that makes the browser save a response as filename"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return {"Content-Disposition": f"attachment; filename*=utf-8''{quoted}"}
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches an ETag"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    # Weak comparison, as HTTP requires for If-None-Match
+    return '*' in tags or etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+
+async def run_reporting_timings(timings: bool, func, *args):
+    """Run func on the worker pool, adding the time each stage took to its result when timings is set"""
+    if not timings:
+        return await worker_pool.run(func, *args)
+    result, stages = await worker_pool.run_timed(func, *args)
+    return {**result, "timings": timing_breakdown(stages)}
+
+def encode_history_cursor(record: FileRecord) -> str:
+    """Opaque position after record in newest-first history order"""
+    position = json.dumps([record.upload_date.isoformat(), record.id])
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip("=")
+
+def decode_history_cursor(cursor: str) -> tuple:
+    try:
+        upload_date, record_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(upload_date), int(record_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid history cursor")
+
+def as_stored_date(value: datetime) -> datetime:
+    """Upload dates are stored as naive UTC"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def job_accepted(job_id: str) -> JSONResponse:
+    """Response for an operation submitted as a background job"""
+    return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"})
 
 
 @router.post("/upload")
-async def upload_file(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    """Upload and preview data file"""
+async def upload_file(file: UploadFile = File(...), sheet: Optional[str] = None, timings: bool = False):
+    """Upload and preview data file, reading the given worksheet of an Excel workbook.
+
+    timings adds the time each processing stage took to the response.
+    """
+    file_path = None
     try:
         # Validate file
         if not file.filename.endswith(('.csv', '.xlsx', '.xls')):
             raise HTTPException(status_code=400, detail="Only CSV and Excel files are supported")
+        if sheet is not None and file.filename.endswith('.csv'):
+            raise HTTPException(status_code=400, detail="A sheet can only be selected in Excel files")
         
         # Generate file ID
         file_id = str(uuid.uuid4())
         
-        # Save file and get size
-        file_path, file_size = await file_handler.save_upload(file, file_id)
+        # Stream file to disk, getting size and content hash
+        file_path, file_size, content_hash = await file_handler.save_upload(file, file_id)
         
-        # Read and clean data
-        df = file_handler.read_file(file_path)
-        df_clean = df.replace({np.nan: None, np.inf: None, -np.inf: None})
-
-        # Create preview
-        preview = df_clean.head(20).to_dict(orient="records")
-        
-        # Store in database
-        db_record = FileRecord(
-            file_id=file_id,
-            original_filename=file.filename,
-            upload_date=datetime.utcnow(),
-            file_size=file_size,
-            total_rows=int(len(df)),
-            total_columns=int(len(df.columns)),
-            status="uploaded"
+        # Parse, store and preview the data off the event loop
+        response_data = await run_reporting_timings(
+            timings, pipeline.ingest_upload, file_id, file.filename, file_path, file_size, content_hash, sheet
         )
-        db.add(db_record)
-        db.commit()
-        db.refresh(db_record)
-        
-        # Store in memory for processing
-        analysis_store[file_id] = {
-            'file_path': file_path,
-            'dataframe': df,
-            'original_filename': file.filename
-        }
-        
-        # Return JSON-safe response
-        response_data = {
-            "file_id": file_id,
-            "filename": file.filename,
-            "preview": preview,
-            "stats": {
-                "total_rows": int(len(df)),
-                "total_columns": int(len(df.columns)),
-                "columns": df.columns.tolist(),
-                "file_size": file_size
-            }
-        }
         
         return jsonable_encoder(response_data)
     
+    except HTTPException:
+        raise
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except SheetNotFoundError as e:
+        # Nothing was recorded for this upload, so don't keep its file
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/analyze/{file_id}")
-async def analyze_data(file_id: str, db: Session = Depends(get_db)):
-    """Analyze data and return cleaning suggestions"""
+@router.post("/batch")
+async def batch_upload(files: List[UploadFile] = File(...), issue_types: Optional[str] = Form(None)):
+    """Upload, analyze and clean many files, or the data files of zip archives, in parallel.
+
+    issue_types is a comma-separated list of issue types cleaned in every
+    file; without it files are only analyzed. Each file is processed on the
+    worker pool, so the batch scales with WORKER_POOL_SIZE.
+    """
+    selected_types = [t.strip() for t in (issue_types or '').split(',') if t.strip()]
+    unknown = [t for t in selected_types if t not in CleaningOperations.ISSUE_TYPES]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown issue types: {', '.join(unknown)}; expected any of {', '.join(CleaningOperations.ISSUE_TYPES)}"
+        )
+    for file in files:
+        if not file.filename.endswith(file_handler.UPLOAD_EXTENSIONS) and not file_handler.is_archive(file.filename):
+            raise HTTPException(status_code=400, detail=f"{file.filename}: only CSV, Excel and zip files are supported")
+
+    start = time.perf_counter()
+    saved = []
     try:
-        if file_id not in analysis_store:
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        df = analysis_store[file_id]['dataframe']
-        
-        # Perform analysis
-        enhanced_issues = data_analyzer.analyze(df)
-        
-        # Store analysis results
-        analysis_store[file_id]['issues'] = enhanced_issues
-        
-        # Update database record
-        db_record = db.query(FileRecord).filter(FileRecord.file_id == file_id).first()
-        if db_record:
-            db_record.issues_found = [
-                {
-                    'type': issue['type'],
-                    'severity': issue['severity'],
-                    'title': issue['title']
-                } for issue in enhanced_issues
-            ]
-            db_record.issues_count = len(enhanced_issues)
-            db_record.status = "analyzed"
-            db.commit()
-        
-        return {
-            "file_id": file_id,
-            "issues": enhanced_issues,
-            "stats": {
-                "total_rows": int(len(df)),
-                "total_columns": int(len(df.columns)),
-                "empty_rows": int(df.isnull().all(axis=1).sum()),
-                "duplicate_rows": int(df.duplicated().sum())
-            }
-        }
+        for file in files:
+            file_id = str(uuid.uuid4())
+            file_path, file_size, content_hash = await file_handler.save_upload(file, file_id)
+            if not file_handler.is_archive(file.filename):
+                saved.append((file_id, file.filename, file_path, file_size, content_hash))
+                continue
+            try:
+                saved.extend(await worker_pool.run(file_handler.extract_archive, file_path))
+            finally:
+                os.remove(file_path)
+    except (FileTooLargeError, zipfile.BadZipFile, ValueError) as e:
+        for _, _, file_path, *_ in saved:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        status_code = 413 if isinstance(e, FileTooLargeError) else 400
+        raise HTTPException(status_code=status_code, detail=str(e))
+    if len(saved) > file_handler.batch_max_files:
+        for _, _, file_path, *_ in saved:
+            os.remove(file_path)
+        raise HTTPException(status_code=400, detail=f"At most {file_handler.batch_max_files} files are accepted per batch")
+
+    results = await asyncio.gather(*[
+        worker_pool.run(pipeline.process_batch_file, *upload, selected_types) for upload in saved
+    ])
+    summary = pipeline.summarize_batch(results)
+    summary["duration"] = round(time.perf_counter() - start, 3)
+    return jsonable_encoder({"issue_types": selected_types, "files": results, "summary": summary})
+
+@router.post("/analyze/{file_id}")
+async def analyze_data(file_id: str, background: bool = False, fast: bool = False, timings: bool = False,
+                       db: Session = Depends(get_db)):
+    """Analyze data and return cleaning suggestions, or submit it as a job when background is set.
+
+    fast analyzes a sample of rows across the file and estimates how many
+    rows each issue affects. timings adds the time each check took.
+    """
+    get_file_record(db, file_id)
     
+    if background:
+        return job_accepted(await job_manager.submit("analyze", file_id, pipeline.analyze_file, file_id, fast))
+    
+    try:
+        return await run_reporting_timings(timings, pipeline.analyze_file, file_id, fast)
     except Exception as e:
-        # Log error to database
-        db_record = db.query(FileRecord).filter(FileRecord.file_id == file_id).first()
-        if db_record:
-            db_record.error_message = str(e)
-            db_record.status = "error"
-            db.commit()
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/clean/{file_id}")
-async def clean_data(file_id: str, request: dict, db: Session = Depends(get_db)):
-    """Apply selected cleaning operations"""
-    try:
-        if file_id not in analysis_store:
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        df = analysis_store[file_id]['dataframe'].copy()
-        issues = analysis_store[file_id]['issues']
-        original_filename = analysis_store[file_id]['original_filename']
-        selected_issue_ids = request.get('selected_issues', [])
-        
-        # Apply cleaning operations
-        cleaned_df, changes = cleaning_ops.apply_cleaning(
-            df, 
-            issues, 
-            selected_issue_ids
-        )
-        
-        # Save cleaned data permanently
-        cleaned_filename = file_handler.save_cleaned_data(
-            cleaned_df, 
-            original_filename,
-            file_id
-        )
-        
-        # Store cleaned data
-        analysis_store[file_id]['cleaned_df'] = cleaned_df
-        analysis_store[file_id]['changes'] = changes
-        analysis_store[file_id]['cleaned_filename'] = cleaned_filename
-        
-        # Update database record
-        db_record = db.query(FileRecord).filter(FileRecord.file_id == file_id).first()
-        if db_record:
-            db_record.cleaned_filename = cleaned_filename
-            db_record.cleaned_date = datetime.now(ist)
-            db_record.rows_removed = changes.get('rows_removed', 0)
-            db_record.values_fixed = changes.get('values_fixed', 0)
-            db_record.columns_renamed = changes.get('columns_renamed', 0)
-            db_record.status = "cleaned"
-            db.commit()
-        
-        # Get preview of cleaned data
-        preview = file_handler.get_preview(cleaned_df, rows=20)
-        preview = replace_nan(preview)
-
-        response_data = convert_numpy_types({
-            "file_id": file_id,
-            "preview": preview,
-            "changes": changes,
-            "cleaned_filename": cleaned_filename,
-            "stats": {
-                "original_rows": int(len(df)),
-                "cleaned_rows": int(len(cleaned_df)),
-                "rows_removed": int(len(df) - len(cleaned_df))
-            }
-        })
-        
-        return response_data
+async def clean_data(file_id: str, request: dict, background: bool = False, timings: bool = False,
+                     db: Session = Depends(get_db)):
+    """Apply selected cleaning operations, or submit them as a job when background is set.
+
+    timings adds the time each cleaning step and the save took.
+    """
+    db_record = get_file_record(db, file_id)
+    if db_record.issues is None:
+        raise HTTPException(status_code=400, detail="File has not been analyzed")
+    selected_issue_ids = request.get('selected_issues', [])
+    
+    if background:
+        return job_accepted(await job_manager.submit("clean", file_id, pipeline.clean_file, file_id, selected_issue_ids))
     
+    try:
+        return await run_reporting_timings(timings, pipeline.clean_file, file_id, selected_issue_ids)
     except Exception as e:
-        # Log error to database
-        import traceback
-        traceback.print_exc()
-        db_record = db.query(FileRecord).filter(FileRecord.file_id == file_id).first()
-        if db_record:
-            db_record.error_message = str(e)
-            db_record.status = "error"
-            db.commit()
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/clean/{file_id}/explain")
+async def explain_cleaning(file_id: str, request: dict, db: Session = Depends(get_db)):
+    """Show the order selected cleaning operations would run in, with estimated rows and cost"""
+    db_record = get_file_record(db, file_id)
+    if db_record.issues is None:
+        raise HTTPException(status_code=400, detail="File has not been analyzed")
+    try:
+        return await worker_pool.run(pipeline.explain_cleaning, file_id, request.get('selected_issues', []))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/download/{file_id}/{format}")
-async def download_cleaned_data(file_id: str, format: str):
-    """Download cleaned data in specified format"""
+@router.get("/preview/{file_id}")
+async def preview_data(
+    file_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=PREVIEW_MAX_LIMIT),
+    columns: Optional[str] = None,
+    dataset: str = Query("original", pattern="^(original|cleaned)$"),
+    issue_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Page through original or cleaned rows, optionally only those affected by an issue"""
+    get_file_record(db, file_id)
+    selected_columns = [col.strip() for col in columns.split(',') if col.strip()] if columns else None
+    
     try:
-        if file_id not in analysis_store:
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        if 'cleaned_df' not in analysis_store[file_id]:
-            raise HTTPException(status_code=400, detail="No cleaned data available")
-        
-        cleaned_df = analysis_store[file_id]['cleaned_df']
-        cleaned_filename = analysis_store[file_id]['cleaned_filename']
-        
-        # Export to requested format
-        output_path = file_handler.export_data(
-            cleaned_df, 
-            format,
-            cleaned_filename
+        result = await worker_pool.run(
+            pipeline.preview_rows, file_id, dataset, offset, limit, selected_columns, issue_id
         )
-        
-        # Determine download filename
-        base_name = os.path.splitext(cleaned_filename)[0]
-        download_filename = f"{base_name}.{format.lower()}"
-        
+    except PreviewError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return jsonable_encoder(result)
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get status, progress and result of a background job"""
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Stream status and progress of a background job as server-sent events"""
+    if await job_manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(
+        job_manager.events(job_id),
+        media_type="text/event-stream",
+        # Disable caching and proxy buffering so events arrive as they happen
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/download/{file_id}/{format}")
+async def download_cleaned_data(
+    file_id: str,
+    format: str,
+    stream: bool = True,
+    gzip: bool = False,
+    sql_style: str = Query("insert", pattern="^(insert|copy)$"),
+    batch_size: Optional[int] = Query(None, ge=1),
+    if_none_match: Optional[str] = Header(None),
+    timings: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Download cleaned data in specified format.
+
+    Exports are cached per cleaning run and tagged with an ETag, so repeated
+    downloads are served from disk and revalidations get 304 Not Modified.
+    Uncached CSV, JSON and SQL are streamed chunk by chunk unless stream is
+    false, and can be gzipped on the fly. Excel exports are written to disk
+    first. SQL exports use multi-row INSERTs of batch_size rows, or a COPY
+    data block. timings adds a Server-Timing header to exports written
+    to disk for this request.
+    """
+    db_record = get_file_record(db, file_id)
+    if db_record.cleaned_filename is None:
+        raise HTTPException(status_code=400, detail="No cleaned data available")
+    if format.lower() not in file_handler.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format}")
+    streamable = format.lower() in file_handler.STREAMING_FORMATS
+    if gzip and not streamable:
+        raise HTTPException(status_code=400, detail="gzip is only available for CSV, JSON and SQL exports")
+    
+    version = db_record.cleaning_version or 0
+    variant = pipeline.export_variant(format, gzip, sql_style, batch_size)
+    headers = {"ETag": export_cache.etag(file_id, version, variant), "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    media_type = "application/gzip" if gzip else file_handler.get_media_type(format)
+    
+    cached_path = pipeline.find_export(file_id, db_record.cleaned_filename, version, format, variant)
+    if cached_path is not None:
         return FileResponse(
-            output_path,
-            filename=download_filename,
-            media_type=file_handler.get_media_type(format)
+            cached_path,
+            filename=pipeline.download_filename(db_record.cleaned_filename, format, gzip),
+            media_type=media_type,
+            headers=headers
         )
     
+    if streamable and (stream or gzip):
+        exported = pipeline.stream_export(
+            file_id, format, db_record.cleaned_filename, version, gzip, sql_style, batch_size
+        )
+        if exported is None:
+            raise HTTPException(status_code=400, detail="No cleaned data available")
+        
+        content, download_filename = exported
+        headers.update(attachment_headers(download_filename))
+        return StreamingResponse(content, media_type=media_type, headers=headers)
+    
+    try:
+        exported, stages = await worker_pool.run_timed(
+            pipeline.export_file, file_id, format, db_record.cleaned_filename, version, sql_style, batch_size
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if exported is None:
+        raise HTTPException(status_code=400, detail="No cleaned data available")
+    
+    output_path, download_filename = exported
+    if timings:
+        headers["Server-Timing"] = server_timing(stages)
+    return FileResponse(
+        output_path,
+        filename=download_filename,
+        media_type=media_type,
+        headers=headers
+    )
+
+@router.get("/store/stats")
+async def get_store_stats():
+    """Get dataset store memory usage and cache counters"""
+    return dataset_store.stats()
 
 @router.get("/history")
-async def get_history(db: Session = Depends(get_db)):
-    """Get file processing history"""
-    records = db.query(FileRecord).order_by(FileRecord.upload_date.desc()).limit(50).all()
+async def get_history(
+    limit: int = Query(50, ge=1, le=HISTORY_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    uploaded_after: Optional[datetime] = None,
+    uploaded_before: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    """Get file processing history, newest first, one page at a time.
+
+    Pass the returned next_cursor to get the following page; it is null on
+    the last one. status keeps records with that status, and
+    uploaded_after (inclusive) and uploaded_before (exclusive) bound the
+    upload date. Pages are read by seeking an index on (status,)
+    upload_date, id, so they cost the same however deep they are.
+    """
+    query = db.query(FileRecord).options(load_only(*HISTORY_COLUMNS))
+    if status is not None:
+        query = query.filter(FileRecord.status == status)
+    if uploaded_after is not None:
+        query = query.filter(FileRecord.upload_date >= as_stored_date(uploaded_after))
+    if uploaded_before is not None:
+        query = query.filter(FileRecord.upload_date < as_stored_date(uploaded_before))
+    if cursor is not None:
+        query = query.filter(tuple_(FileRecord.upload_date, FileRecord.id) < decode_history_cursor(cursor))
+    
+    # One extra row tells whether another page follows
+    records = query.order_by(FileRecord.upload_date.desc(), FileRecord.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_history_cursor(records[limit - 1]) if len(records) > limit else None
     return {
         "records": [
             {
@@ -265,8 +414,9 @@ async def get_history(db: Session = Depends(get_db)):
                 "values_fixed": r.values_fixed,
                 "columns_renamed": r.columns_renamed
             }
-            for r in records
-        ]
+            for r in records[:limit]
+        ],
+        "next_cursor": next_cursor
     }
 
 @router.get("/file/{file_id}")
@@ -0,0 +1,39 @@
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+from models.database import AnalysisResult, FileRecord
+
+
+class AnalysisCache:
+    """Analysis results keyed by upload content hash and analyzer rules version"""
+
+    def __init__(self, rules_version: int):
+        self.rules_version = rules_version
+
+    def get(self, db: Session, content_hash: Optional[str]) -> Optional[AnalysisResult]:
+        """Return the cached analysis for identical content, if any"""
+        if not content_hash:
+            return None
+        return db.query(AnalysisResult).filter(
+            AnalysisResult.content_hash == content_hash,
+            AnalysisResult.rules_version == self.rules_version
+        ).first()
+
+    def put(self, db: Session, content_hash: Optional[str], issues: List[Dict], stats: Dict,
+            dtypes: Optional[Dict] = None):
+        """Cache an analysis result; the caller commits the session"""
+        if not content_hash or self.get(db, content_hash) is not None:
+            return
+        db.add(AnalysisResult(
+            content_hash=content_hash,
+            rules_version=self.rules_version,
+            issues=issues,
+            stats=stats,
+            dtypes=dtypes
+        ))
+
+    def find_previous_upload(self, db: Session, content_hash: str, file_id: str) -> Optional[FileRecord]:
+        """Return the latest earlier upload of identical content"""
+        return db.query(FileRecord).filter(
+            FileRecord.content_hash == content_hash,
+            FileRecord.file_id != file_id
+        ).order_by(FileRecord.upload_date.desc()).first()
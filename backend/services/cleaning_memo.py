@@ -0,0 +1,43 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+
+class CleaningMemo:
+    """Frames left after each step of recent cleaning runs, per file.
+
+    Re-cleaning a file with a changed selection resumes from the last step
+    the two runs share. Steps only replace the columns they change, so
+    consecutive snapshots share every other column. Memos live in the
+    memory of the worker that cleaned the file; CLEANING_MEMO_FILES bounds
+    how many files keep one.
+    """
+
+    def __init__(self, max_files: Optional[int] = None):
+        self.max_files = max_files if max_files is not None else int(os.getenv("CLEANING_MEMO_FILES", 4))
+        self._steps = OrderedDict()  # file id -> (token, steps)
+        self._lock = threading.Lock()
+
+    def get(self, file_id: str, token) -> List[tuple]:
+        """Steps memoized for a file, or an empty list if its data or issues changed since"""
+        with self._lock:
+            entry = self._steps.get(file_id)
+            if entry is None or entry[0] != token:
+                return []
+            self._steps.move_to_end(file_id)
+            # apply_cleaning rewrites the list, so concurrent runs each get their own
+            return list(entry[1])
+
+    def put(self, file_id: str, token, steps: List[tuple]):
+        if self.max_files <= 0:
+            return
+        with self._lock:
+            self._steps[file_id] = (token, steps)
+            self._steps.move_to_end(file_id)
+            while len(self._steps) > self.max_files:
+                self._steps.popitem(last=False)
+
+    def discard(self, file_id: str):
+        with self._lock:
+            self._steps.pop(file_id, None)
@@ -0,0 +1,208 @@
+import pandas as pd
+import numpy as np
+from typing import List, Optional
+from utils.dtypes import as_text
+from utils.patterns import EMAIL_PATTERN
+from utils.sampling import StreamSampler
+
+
+def find_invalid_emails(values: pd.Series) -> pd.Series:
+    """Return the non-null values (as strings) that are not valid email addresses"""
+    as_str = as_text(values.dropna())
+    return as_str[~as_str.str.match(EMAIL_PATTERN)]
+
+
+class ColumnAccumulator:
+    """Mergeable per-column statistics collected one chunk at a time.
+
+    Accumulators built over consecutive parts of a file can be combined with
+    ``merge`` as long as ``self`` covers the rows that come first and each
+    was given the row its part starts at.
+    """
+
+    def __init__(self, name: str, date_sample_size: int = 0, phone_sample_size: int = 0,
+                 track_emails: bool = False, max_examples: int = 3, sampling: str = 'stratified',
+                 total_rows: Optional[int] = None, start_row: int = 0):
+        self.name = name
+        self.date_sample_size = date_sample_size
+        self.phone_sample_size = phone_sample_size
+        self.track_emails = track_emails
+        self.max_examples = max_examples
+
+        self.missing = 0
+        self.non_null = 0
+        self.is_object = False
+        self.numeric = 0
+        self.non_numeric_examples: List[str] = []
+        self.has_whitespace = False
+        # Whether a chunk parsed as numbers had values, whose padding is lost
+        self.numeric_chunks = False
+        # Non-null values for the format checks, sampled across the whole file
+        self.date_sampler = StreamSampler(date_sample_size, sampling, total_rows, start_row=start_row)
+        self.phone_sampler = StreamSampler(phone_sample_size, sampling, total_rows, start_row=start_row)
+        self.invalid_emails = 0
+        self.invalid_email_examples: List[str] = []
+
+    def update(self, series: pd.Series):
+        """Fold one chunk of the column into the accumulator"""
+        non_null = series.dropna()
+        self.missing += int(len(series) - len(non_null))
+        self.non_null += int(len(non_null))
+
+        if series.dtype == 'object':
+            self.is_object = True
+            numeric_mask = pd.to_numeric(non_null, errors='coerce').notna()
+            self.numeric += int(numeric_mask.sum())
+            self._extend(self.non_numeric_examples, non_null[~numeric_mask], self.max_examples)
+
+            if not self.has_whitespace:
+                as_str = series.astype(str)
+                self.has_whitespace = bool(as_str.str.strip().ne(as_str).any())
+        else:
+            # Chunks parsed with a non-object dtype are numeric throughout
+            self.numeric += int(len(non_null))
+            self.numeric_chunks = self.numeric_chunks or len(non_null) > 0
+
+        present = series.notna().to_numpy()
+        if self.date_sample_size:
+            self.date_sampler.update(series, present)
+        if self.phone_sample_size:
+            self.phone_sampler.update(series, present)
+
+        if self.track_emails:
+            invalid = find_invalid_emails(non_null)
+            self.invalid_emails += int(len(invalid))
+            self._extend(self.invalid_email_examples, invalid, self.max_examples)
+
+    def merge(self, other: 'ColumnAccumulator') -> 'ColumnAccumulator':
+        """Combine with an accumulator covering the rows that follow this one"""
+        self.missing += other.missing
+        self.non_null += other.non_null
+        self.is_object = self.is_object or other.is_object
+        self.numeric += other.numeric
+        self.has_whitespace = self.has_whitespace or other.has_whitespace
+        self.numeric_chunks = self.numeric_chunks or other.numeric_chunks
+        self.invalid_emails += other.invalid_emails
+        self.non_numeric_examples = (self.non_numeric_examples + other.non_numeric_examples)[:self.max_examples]
+        self.invalid_email_examples = (self.invalid_email_examples + other.invalid_email_examples)[:self.max_examples]
+        self.date_sampler.merge(other.date_sampler)
+        self.phone_sampler.merge(other.phone_sampler)
+        return self
+
+    @property
+    def date_sample(self) -> List[str]:
+        return self._sampled(self.date_sampler)
+
+    @property
+    def phone_sample(self) -> List[str]:
+        return self._sampled(self.phone_sampler)
+
+    @property
+    def whitespace_unresolved(self) -> bool:
+        """Whether the column is text but its numeric chunks weren't checked for whitespace"""
+        return self.is_object and self.numeric_chunks and not self.has_whitespace
+
+    def update_text(self, series: pd.Series):
+        """Check a chunk of the column read as text for whitespace"""
+        non_null = series.dropna().astype(str)
+        self.has_whitespace = self.has_whitespace or bool(non_null.str.strip().ne(non_null).any())
+
+    @property
+    def numeric_ratio(self) -> float:
+        """Share of non-null values that coerce to a number"""
+        if self.non_null == 0:
+            return 0.0
+        return float(self.numeric / self.non_null)
+
+    @property
+    def non_numeric(self) -> int:
+        return self.non_null - self.numeric
+
+    @staticmethod
+    def _sampled(sampler: StreamSampler) -> List[str]:
+        sample = sampler.sample()
+        return [] if sample is None else [str(x) for x in sample.tolist()]
+
+    @staticmethod
+    def _extend(target: list, values: pd.Series, limit: int):
+        """Append values as strings until the target holds ``limit`` items"""
+        room = limit - len(target)
+        if room > 0:
+            target.extend(str(x) for x in values.head(room).tolist())
+
+
+class DuplicateAccumulator:
+    """Counts duplicate rows across chunks using 64-bit row fingerprints.
+
+    With row_hashes, each chunk's fingerprints are appended to that list, so
+    a RowHashIndex of the whole file can be stored afterwards.
+    """
+
+    def __init__(self, row_hashes: Optional[List[np.ndarray]] = None):
+        self.row_hashes = row_hashes
+        self.duplicates = 0
+        self.empty_rows = 0
+        self.total_rows = 0
+        # Sorted, unique fingerprints of every row seen so far
+        self.seen = np.empty(0, dtype=np.uint64)
+
+    def update(self, chunk: pd.DataFrame):
+        """Fold one chunk of rows into the accumulator"""
+        self.total_rows += int(len(chunk))
+        self.empty_rows += int(chunk.isnull().all(axis=1).sum())
+        if len(chunk) == 0:
+            return
+
+        hashes = row_fingerprints(chunk)
+        if self.row_hashes is not None:
+            self.row_hashes.append(hashes)
+        repeated_in_chunk = pd.Series(hashes).duplicated().values
+        unique_hashes = hashes[~repeated_in_chunk]
+        already_seen = self._contains(unique_hashes)
+
+        self.duplicates += int(repeated_in_chunk.sum() + already_seen.sum())
+        self._add(unique_hashes[~already_seen])
+
+    def merge(self, other: 'DuplicateAccumulator') -> 'DuplicateAccumulator':
+        """Combine with an accumulator covering the rows that follow this one"""
+        overlap = self._contains(other.seen)
+        self.duplicates += other.duplicates + int(overlap.sum())
+        self.empty_rows += other.empty_rows
+        self.total_rows += other.total_rows
+        self._add(other.seen[~overlap])
+        return self
+
+    def _contains(self, hashes: np.ndarray) -> np.ndarray:
+        if len(self.seen) == 0:
+            return np.zeros(len(hashes), dtype=bool)
+        positions = np.searchsorted(self.seen, hashes)
+        positions[positions == len(self.seen)] = 0
+        return self.seen[positions] == hashes
+
+    def _add(self, hashes: np.ndarray):
+        # Both inputs are sorted runs, which the stable sort merges in linear time
+        self.seen = np.sort(np.concatenate([self.seen, np.sort(hashes)]), kind='stable')
+
+
+def row_fingerprints(df: pd.DataFrame) -> np.ndarray:
+    """Hash every row of a frame to a uint64, independent of its index.
+
+    Each column is split into a numeric part and a text part before hashing,
+    so a value hashes the same whether its chunk was parsed as int, float or
+    object.
+    """
+    parts = {}
+    for i in range(df.shape[1]):
+        values = df.iloc[:, i]
+        if values.dtype == 'object':
+            numeric = pd.to_numeric(values, errors='coerce')
+            text = values.where(numeric.isna())
+        elif pd.api.types.is_numeric_dtype(values.dtype):
+            numeric = values
+            text = pd.Series(None, index=values.index, dtype=object)
+        else:
+            numeric = pd.Series(np.nan, index=values.index)
+            text = values
+        parts[f"{i}_num"] = numeric.astype('float64')
+        parts[f"{i}_text"] = text
+    return pd.util.hash_pandas_object(pd.DataFrame(parts, index=df.index), index=False).values
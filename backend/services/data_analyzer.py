@@ -1,54 +1,233 @@
 import pandas as pd
 import numpy as np
+import os
 import re
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple
 from datetime import datetime
+from services.column_accumulators import ColumnAccumulator, DuplicateAccumulator
+from services.data_profile import DataProfile
+from utils.patterns import DATE_PATTERNS, PHONE_PATTERNS, EMAIL_PATTERN, classify_formats, match_formats
+from utils.metrics import stage
+from utils.progress import ProgressCallback, report_progress
+from utils.dtypes import as_text, is_text_dtype
+from utils.sampling import SAMPLING_MODES, sample_values, wilson_interval
+
+# Values per column the date and phone format checks classify
+DATE_SAMPLE_SIZE = 1000
+PHONE_SAMPLE_SIZE = 1000
 
 class DataAnalyzer:
-    def __init__(self):
+    # Bump whenever a check changes what it reports, so cached results are recomputed
+    RULES_VERSION = 1
+    
+    # Checks run by analyze, in the order their issues are reported
+    CHECKS = (
+        'check_column_names',
+        'check_date_formats',
+        'check_missing_values',
+        'check_duplicates',
+        'check_data_types',
+        'check_phone_formats',
+        'check_email_formats',
+        'check_whitespace',
+    )
+    
+    def __init__(self, sampling: Optional[str] = None):
         self.issue_id_counter = 1
+        # How format checks pick their values across the file; see utils.sampling
+        self.sampling = (sampling or os.getenv("ANALYSIS_SAMPLING", "stratified")).lower()
+        if self.sampling not in SAMPLING_MODES:
+            raise ValueError(f"Unsupported sampling mode: {self.sampling}")
+    
+    @property
+    def rules_version(self) -> int:
+        """RULES_VERSION combined with the sampling mode, which also changes what is reported"""
+        return self.RULES_VERSION * len(SAMPLING_MODES) + SAMPLING_MODES.index(self.sampling)
     
-    def analyze(self, df: pd.DataFrame) -> List[Dict]:
-        """Analyze dataframe and return list of issues"""
+    def analyze(self, df: pd.DataFrame, progress: Optional[ProgressCallback] = None,
+                profile: Optional[DataProfile] = None) -> List[Dict]:
+        """Analyze dataframe and return list of issues, reporting each finished check to progress.
+
+        The checks share one DataProfile, so each column view they need is
+        computed once. Pass a profile to reuse it afterwards, e.g. for stats.
+        """
         issues = []
+        start = time.perf_counter()
+        profile = profile or DataProfile(df)
+        
+        for step, check in enumerate(self.CHECKS, 1):
+            # Checks return a single issue, a list of issues or None
+            with stage('analyze', check, len(df)) as record:
+                result = getattr(self, check)(df, profile)
+                record['rows_out'] = len(df)
+            if isinstance(result, list):
+                issues.extend(result)
+            elif result:
+                issues.append(result)
+            report_progress(progress, start, stage='analyze', operation=check,
+                            step=step, total_steps=len(self.CHECKS), rows_processed=len(df))
+        
+        return issues
+    
+    def analyze_sample(self, sample: pd.DataFrame, total_rows: int, progress: Optional[ProgressCallback] = None,
+                       duplicate_count: Optional[int] = None) -> List[Dict]:
+        """Analyze a row sample of a larger dataset.
+
+        Each issue that applies to rows gets an estimate of the share of
+        rows it affects, with a Wilson confidence interval. Duplicates are
+        rarely both sampled, so their sample share is only a lower bound;
+        pass duplicate_count, known from a stored row index, to report them
+        exactly instead.
+        """
+        issues = self.analyze(sample, progress=progress)
+        if duplicate_count is not None:
+            issues = [issue for issue in issues if issue['type'] != 'duplicates']
+            if duplicate_count > 0:
+                issue = self._duplicates_issue(duplicate_count)
+                share = duplicate_count / total_rows if total_rows else 0.0
+                issue['estimate'] = {
+                    'sample_rows': int(total_rows), 'affected_in_sample': int(duplicate_count),
+                    'prevalence': share, 'ci_low': share, 'ci_high': share,
+                    'estimated_rows': int(duplicate_count), 'exact': True
+                }
+                # Keep the order analyze reports issues in
+                position = next((i for i, other in enumerate(issues)
+                                 if other['type'] not in ('column_naming', 'date_format', 'missing_values')), len(issues))
+                issues.insert(position, issue)
         
-        # Check column naming
-        column_issues = self.check_column_names(df)
+        for issue in issues:
+            if issue['type'] == 'column_naming' or 'estimate' in issue:
+                continue
+            affected = int(self.issue_rows(sample, issue).sum())
+            issue['estimate'] = self.estimate_prevalence(affected, len(sample), total_rows)
+            if issue['type'] == 'duplicates':
+                issue['estimate']['lower_bound'] = True
+        return issues
+    
+    def estimate_prevalence(self, affected: int, sample_rows: int, total_rows: int) -> Dict:
+        """Share of all rows an issue affects, estimated from a sample"""
+        share = affected / sample_rows if sample_rows else 0.0
+        low, high = wilson_interval(affected, sample_rows)
+        return {
+            'sample_rows': int(sample_rows),
+            'affected_in_sample': int(affected),
+            'prevalence': share,
+            'ci_low': low,
+            'ci_high': high,
+            'confidence': 0.95,
+            'estimated_rows': int(round(share * total_rows)),
+            'exact': sample_rows >= total_rows
+        }
+    
+    def analyze_chunks(self, chunks: Iterable[pd.DataFrame], progress: Optional[ProgressCallback] = None,
+                       row_hashes: Optional[List[np.ndarray]] = None,
+                       total_rows: Optional[int] = None,
+                       text_chunks: Optional[Callable[[List[int]], Iterable[pd.DataFrame]]] = None) -> Tuple[List[Dict], Dict]:
+        """Analyze a file chunk by chunk and return issues plus dataset stats.
+
+        Every check is fed through mergeable accumulators, so peak memory is
+        bounded by the chunk size while the issues match ``analyze``. Progress
+        is reported after each chunk and once the issues are built. Each
+        chunk's row fingerprints are appended to row_hashes, when given.
+        Stratified format samples need total_rows, the file's row count.
+
+        Chunks parsed as numbers drop the padding around their values, so a
+        column that is text in other chunks is read again through
+        text_chunks, given the column positions and yielding them as text,
+        until its whitespace check is settled.
+        """
+        columns = None
+        accumulators = {}
+        duplicates = DuplicateAccumulator(row_hashes)
+        start = time.perf_counter()
+
+        with stage('analyze', 'scan_chunks') as record:
+            for step, chunk in enumerate(chunks, 1):
+                if columns is None:
+                    columns = chunk.columns.tolist()
+                    accumulators = {col: self._new_accumulator(col, total_rows) for col in columns}
+                for col in columns:
+                    accumulators[col].update(chunk[col])
+                duplicates.update(chunk)
+                report_progress(progress, start, stage='analyze', operation='read_chunk',
+                                step=step, rows_processed=duplicates.total_rows)
+            record['rows_in'] = record['rows_out'] = duplicates.total_rows
+        
+        columns = columns or []
+        recheck = [i for i, col in enumerate(columns) if accumulators[col].whitespace_unresolved]
+        if recheck and text_chunks is not None:
+            with stage('analyze', 'recheck_whitespace', columns=len(recheck)):
+                for chunk in text_chunks(recheck):
+                    pending = False
+                    for position, i in enumerate(recheck):
+                        acc = accumulators[columns[i]]
+                        if acc.whitespace_unresolved:
+                            acc.update_text(chunk.iloc[:, position])
+                            pending = pending or acc.whitespace_unresolved
+                    if not pending:
+                        break
+        
+        issues = []
+        
+        column_issues = self.check_column_names(pd.DataFrame(columns=columns))
         if column_issues:
             issues.append(column_issues)
         
-        # Check for date format inconsistencies
-        date_issues = self.check_date_formats(df)
-        issues.extend(date_issues)
+        for col in columns:
+            if self.is_potential_date_column(col):
+                date_formats = self.detect_date_formats(pd.Series(accumulators[col].date_sample, dtype=object))
+                if len(date_formats) > 1:
+                    issues.append(self._date_format_issue(col, date_formats))
         
-        # Check for missing values
-        missing_issues = self.check_missing_values(df)
+        missing_counts = pd.Series({col: accumulators[col].missing for col in columns}, dtype='int64')
+        missing_issues = self._missing_values_issue(missing_counts)
         if missing_issues:
             issues.append(missing_issues)
         
-        # Check for duplicates
-        duplicate_issues = self.check_duplicates(df)
-        if duplicate_issues:
-            issues.append(duplicate_issues)
+        if duplicates.duplicates > 0:
+            issues.append(self._duplicates_issue(duplicates.duplicates))
         
-        # Check data type consistency
-        type_issues = self.check_data_types(df)
-        issues.extend(type_issues)
+        for col in columns:
+            acc = accumulators[col]
+            if acc.is_object and 0.7 < acc.numeric_ratio < 1.0 and acc.non_numeric > 0:
+                issues.append(self._data_type_issue(col, acc.non_numeric, acc.non_numeric_examples))
         
-        # Check for phone number formats
-        phone_issues = self.check_phone_formats(df)
-        issues.extend(phone_issues)
+        for col in columns:
+            if self.is_potential_phone_column(col):
+                formats = self.detect_phone_formats(pd.Series(accumulators[col].phone_sample, dtype=object))
+                if len(formats) > 1:
+                    issues.append(self._phone_format_issue(col, formats))
         
-        # Check for email validation
-        email_issues = self.check_email_formats(df)
-        issues.extend(email_issues)
+        for col in columns:
+            acc = accumulators[col]
+            if acc.track_emails and acc.invalid_emails > 0:
+                issues.append(self._email_issue(col, acc.invalid_emails, acc.invalid_email_examples))
         
-        # Check for whitespace issues
-        whitespace_issues = self.check_whitespace(df)
-        if whitespace_issues:
-            issues.append(whitespace_issues)
+        columns_with_whitespace = [col for col in columns if accumulators[col].has_whitespace]
+        if columns_with_whitespace:
+            issues.append(self._whitespace_issue(columns_with_whitespace))
         
-        return issues
+        stats = {
+            "total_rows": duplicates.total_rows,
+            "total_columns": len(columns),
+            "empty_rows": duplicates.empty_rows,
+            "duplicate_rows": duplicates.duplicates
+        }
+        report_progress(progress, start, stage='analyze', operation='build_issues',
+                        rows_processed=duplicates.total_rows)
+        return issues, stats
+    
+    def _new_accumulator(self, col: str, total_rows: Optional[int] = None) -> ColumnAccumulator:
+        """Create an accumulator tracking only what the checks need for a column"""
+        return ColumnAccumulator(
+            col,
+            date_sample_size=DATE_SAMPLE_SIZE if self.is_potential_date_column(col) else 0,
+            phone_sample_size=PHONE_SAMPLE_SIZE if self.is_potential_phone_column(col) else 0,
+            track_emails=self.is_potential_email_column(col),
+            sampling=self.sampling,
+            total_rows=total_rows
+        )
     
     def convert_to_native_types(self, obj):
         """Convert numpy types to native Python types"""
@@ -64,7 +243,7 @@ class DataAnalyzer:
             return [self.convert_to_native_types(item) for item in obj]
         return obj
     
-    def check_column_names(self, df: pd.DataFrame) -> Dict:
+    def check_column_names(self, df: pd.DataFrame, profile: Optional[DataProfile] = None) -> Dict:
         """Check for column naming issues"""
         suggestions = []
         has_issues = False
@@ -97,28 +276,32 @@ class DataAnalyzer:
         normalized = re.sub(r'_+', '_', normalized)
         return normalized
     
-    def check_date_formats(self, df: pd.DataFrame) -> List[Dict]:
+    def check_date_formats(self, df: pd.DataFrame, profile: Optional[DataProfile] = None) -> List[Dict]:
         """Check for date format inconsistencies"""
         issues = []
+        profile = profile or DataProfile(df)
         
         for col in df.columns:
             if self.is_potential_date_column(col):
-                date_formats = self.detect_date_formats(df[col])
+                date_formats = self.detect_date_formats(profile.column(col).series)
                 if len(date_formats) > 1:
-                    issues.append({
-                        'id': int(self.get_next_id()),
-                        'type': 'date_format',
-                        'severity': 'high',
-                        'title': f'Inconsistent Date Formats in "{col}"',
-                        'description': f'Found {len(date_formats)} different date formats',
-                        'column': col,
-                        'examples': list(date_formats)[:5],
-                        'suggestion': 'Standardize to YYYY-MM-DD format',
-                        'auto_fix': True
-                    })
+                    issues.append(self._date_format_issue(col, date_formats))
         
         return issues
     
+    def _date_format_issue(self, col: str, date_formats: set) -> Dict:
+        return {
+            'id': int(self.get_next_id()),
+            'type': 'date_format',
+            'severity': 'high',
+            'title': f'Inconsistent Date Formats in "{col}"',
+            'description': f'Found {len(date_formats)} different date formats',
+            'column': col,
+            'examples': list(date_formats)[:5],
+            'suggestion': 'Standardize to YYYY-MM-DD format',
+            'auto_fix': True
+        }
+    
     def is_potential_date_column(self, col_name: str) -> bool:
         """Check if column name suggests it contains dates"""
         date_keywords = ['date', 'time', 'day', 'month', 'year', 'created', 'updated', 'modified']
@@ -126,27 +309,15 @@ class DataAnalyzer:
         return any(keyword in col_lower for keyword in date_keywords)
     
     def detect_date_formats(self, series: pd.Series) -> set:
-        """Detect different date formats in a series"""
-        formats = set()
-        
-        for val in series.dropna().head(100):
-            val_str = str(val)
-            
-            # Check various date patterns
-            if re.match(r'\d{4}[-/]\d{1,2}[-/]\d{1,2}', val_str):
-                formats.add('YYYY-MM-DD or YYYY/MM/DD')
-            elif re.match(r'\d{1,2}[-/]\d{1,2}[-/]\d{4}', val_str):
-                formats.add('DD-MM-YYYY or MM-DD-YYYY')
-            elif re.match(r'\w{3}\s+\d{1,2},?\s+\d{4}', val_str):
-                formats.add('Mon DD, YYYY')
-            elif re.match(r'\d{1,2}\s+\w+\s+\d{4}', val_str):
-                formats.add('DD Month YYYY')
-        
-        return formats
+        """Detect different date formats among a sample of a series' values"""
+        return match_formats(sample_values(series, DATE_SAMPLE_SIZE, self.sampling), DATE_PATTERNS)
     
-    def check_missing_values(self, df: pd.DataFrame) -> Dict:
+    def check_missing_values(self, df: pd.DataFrame, profile: Optional[DataProfile] = None) -> Dict:
         """Check for missing values"""
-        missing_counts = df.isnull().sum()
+        profile = profile or DataProfile(df)
+        return self._missing_values_issue(profile.null_counts)
+    
+    def _missing_values_issue(self, missing_counts: pd.Series) -> Dict:
         columns_with_missing = missing_counts[missing_counts > 0]
         
         if len(columns_with_missing) > 0:
@@ -166,150 +337,204 @@ class DataAnalyzer:
             }
         return None
     
-    def check_duplicates(self, df: pd.DataFrame) -> Dict:
+    def check_duplicates(self, df: pd.DataFrame, profile: Optional[DataProfile] = None) -> Dict:
         """Check for duplicate rows"""
-        duplicate_count = int(df.duplicated().sum())
+        profile = profile or DataProfile(df)
+        duplicate_count = profile.duplicate_count
         
         if duplicate_count > 0:
-            return {
-                'id': int(self.get_next_id()),
-                'type': 'duplicates',
-                'severity': 'high',
-                'title': 'Duplicate Rows Found',
-                'description': f'Found {duplicate_count} duplicate rows',
-                'count': duplicate_count,
-                'suggestion': 'Remove duplicate rows to ensure data integrity',
-                'auto_fix': True
-            }
+            return self._duplicates_issue(duplicate_count)
         return None
     
-    def check_data_types(self, df: pd.DataFrame) -> List[Dict]:
+    def _duplicates_issue(self, duplicate_count: int) -> Dict:
+        return {
+            'id': int(self.get_next_id()),
+            'type': 'duplicates',
+            'severity': 'high',
+            'title': 'Duplicate Rows Found',
+            'description': f'Found {duplicate_count} duplicate rows',
+            'count': duplicate_count,
+            'suggestion': 'Remove duplicate rows to ensure data integrity',
+            'auto_fix': True
+        }
+    
+    def check_data_types(self, df: pd.DataFrame, profile: Optional[DataProfile] = None) -> List[Dict]:
         """Check for data type inconsistencies"""
         issues = []
+        profile = profile or DataProfile(df)
         
         for col in df.columns:
-            if df[col].dtype == 'object':
+            column = profile.column(col)
+            if column.is_object and column.non_null_count > 0:
                 # Check if column should be numeric
-                numeric_ratio = self.get_numeric_ratio(df[col])
+                failed = column.numeric_failed
+                numeric_ratio = float((~failed).sum() / column.non_null_count)
                 if numeric_ratio > 0.7 and numeric_ratio < 1.0:
-                    non_numeric = df[col][pd.to_numeric(df[col], errors='coerce').isna()].dropna()
+                    non_numeric = column.present[failed]
                     if len(non_numeric) > 0:
-                        issues.append({
-                            'id': int(self.get_next_id()),
-                            'type': 'data_type',
-                            'severity': 'medium',
-                            'title': f'Mixed Data Types in "{col}"',
-                            'description': f'Column appears mostly numeric but contains {len(non_numeric)} non-numeric values',
-                            'column': col,
-                            'examples': [str(x) for x in non_numeric.head(3).tolist()],
-                            'suggestion': 'Convert to numeric or remove non-numeric values',
-                            'auto_fix': False
-                        })
+                        issues.append(self._data_type_issue(
+                            col, len(non_numeric), [str(x) for x in non_numeric.head(3).tolist()]
+                        ))
         
         return issues
     
-    def get_numeric_ratio(self, series: pd.Series) -> float:
-        """Get ratio of numeric values in series"""
-        try:
-            numeric_series = pd.to_numeric(series, errors='coerce')
-            return float(numeric_series.notna().sum() / len(series.dropna()))
-        except:
-            return 0.0
+    def _data_type_issue(self, col: str, non_numeric_count: int, examples: List[str]) -> Dict:
+        return {
+            'id': int(self.get_next_id()),
+            'type': 'data_type',
+            'severity': 'medium',
+            'title': f'Mixed Data Types in "{col}"',
+            'description': f'Column appears mostly numeric but contains {non_numeric_count} non-numeric values',
+            'column': col,
+            'examples': examples,
+            'suggestion': 'Convert to numeric or remove non-numeric values',
+            'auto_fix': False
+        }
     
-    def check_phone_formats(self, df: pd.DataFrame) -> List[Dict]:
+    def check_phone_formats(self, df: pd.DataFrame, profile: Optional[DataProfile] = None) -> List[Dict]:
         """Check for phone number format inconsistencies"""
         issues = []
-        phone_keywords = ['phone', 'mobile', 'tel', 'contact']
+        profile = profile or DataProfile(df)
         
         for col in df.columns:
-            col_lower = col.lower()
-            if any(keyword in col_lower for keyword in phone_keywords):
-                formats = self.detect_phone_formats(df[col])
+            if self.is_potential_phone_column(col):
+                formats = self.detect_phone_formats(profile.column(col).series)
                 if len(formats) > 1:
-                    issues.append({
-                        'id': int(self.get_next_id()),
-                        'type': 'phone_format',
-                        'severity': 'low',
-                        'title': f'Inconsistent Phone Formats in "{col}"',
-                        'description': f'Found {len(formats)} different phone number formats',
-                        'column': col,
-                        'examples': list(formats)[:3],
-                        'suggestion': 'Standardize to XXX-XXX-XXXX or (XXX) XXX-XXXX format',
-                        'auto_fix': True
-                    })
+                    issues.append(self._phone_format_issue(col, formats))
         
         return issues
     
+    def is_potential_phone_column(self, col_name: str) -> bool:
+        """Check if column name suggests it contains phone numbers"""
+        phone_keywords = ['phone', 'mobile', 'tel', 'contact']
+        col_lower = col_name.lower()
+        return any(keyword in col_lower for keyword in phone_keywords)
+    
+    def _phone_format_issue(self, col: str, formats: set) -> Dict:
+        return {
+            'id': int(self.get_next_id()),
+            'type': 'phone_format',
+            'severity': 'low',
+            'title': f'Inconsistent Phone Formats in "{col}"',
+            'description': f'Found {len(formats)} different phone number formats',
+            'column': col,
+            'examples': list(formats)[:3],
+            'suggestion': 'Standardize to XXX-XXX-XXXX or (XXX) XXX-XXXX format',
+            'auto_fix': True
+        }
+    
     def detect_phone_formats(self, series: pd.Series) -> set:
-        """Detect different phone number formats"""
-        formats = set()
-        
-        for val in series.dropna().head(50):
-            val_str = str(val)
-            
-            if re.match(r'\d{3}-\d{3}-\d{4}', val_str):
-                formats.add('XXX-XXX-XXXX')
-            elif re.match(r'\(\d{3}\)\s*\d{3}-\d{4}', val_str):
-                formats.add('(XXX) XXX-XXXX')
-            elif re.match(r'\d{10}', val_str):
-                formats.add('XXXXXXXXXX')
-            elif re.match(r'\d{3}\s+\d{3}\s+\d{4}', val_str):
-                formats.add('XXX XXX XXXX')
-        
-        return formats
+        """Detect different phone number formats among a sample of a series' values"""
+        return match_formats(sample_values(series, PHONE_SAMPLE_SIZE, self.sampling), PHONE_PATTERNS)
     
-    def check_email_formats(self, df: pd.DataFrame) -> List[Dict]:
+    def check_email_formats(self, df: pd.DataFrame, profile: Optional[DataProfile] = None) -> List[Dict]:
         """Check for invalid email formats"""
         issues = []
-        email_keywords = ['email', 'mail', 'e-mail']
-        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+        profile = profile or DataProfile(df)
         
         for col in df.columns:
-            col_lower = col.lower()
-            if any(keyword in col_lower for keyword in email_keywords):
-                invalid_emails = []
-                for val in df[col].dropna():
-                    if not re.match(email_pattern, str(val)):
-                        invalid_emails.append(str(val))
+            if self.is_potential_email_column(col):
+                column = profile.column(col)
+                invalid = np.flatnonzero(column.text_mask(lambda text: ~text.str.match(EMAIL_PATTERN)))
                 
-                if len(invalid_emails) > 0:
-                    issues.append({
-                        'id': int(self.get_next_id()),
-                        'type': 'data_validation',
-                        'severity': 'high',
-                        'title': f'Invalid Email Formats in "{col}"',
-                        'description': f'Found {len(invalid_emails)} invalid email addresses',
-                        'column': col,
-                        'examples': invalid_emails[:3],
-                        'suggestion': 'Flag or remove invalid email entries',
-                        'auto_fix': False
-                    })
+                if len(invalid) > 0:
+                    issues.append(self._email_issue(col, len(invalid), column.text_at(invalid[:3])))
         
         return issues
     
-    def check_whitespace(self, df: pd.DataFrame) -> Dict:
+    def is_potential_email_column(self, col_name: str) -> bool:
+        """Check if column name suggests it contains email addresses"""
+        email_keywords = ['email', 'mail', 'e-mail']
+        col_lower = col_name.lower()
+        return any(keyword in col_lower for keyword in email_keywords)
+    
+    def _email_issue(self, col: str, invalid_count: int, examples: List[str]) -> Dict:
+        return {
+            'id': int(self.get_next_id()),
+            'type': 'data_validation',
+            'severity': 'high',
+            'title': f'Invalid Email Formats in "{col}"',
+            'description': f'Found {invalid_count} invalid email addresses',
+            'column': col,
+            'examples': examples,
+            'suggestion': 'Flag or remove invalid email entries',
+            'auto_fix': False
+        }
+    
+    def check_whitespace(self, df: pd.DataFrame, profile: Optional[DataProfile] = None) -> Dict:
         """Check for leading/trailing whitespace"""
         columns_with_whitespace = []
+        profile = profile or DataProfile(df)
         
         for col in df.columns:
-            if df[col].dtype == 'object':
-                has_whitespace = df[col].astype(str).str.strip().ne(df[col].astype(str)).any()
+            column = profile.column(col)
+            if column.is_object:
+                # Nulls never have whitespace, so only non-null text is compared
+                has_whitespace = column.text_mask(lambda text: text.str.strip().ne(text)).any()
                 if has_whitespace:
                     columns_with_whitespace.append(col)
         
         if columns_with_whitespace:
-            return {
-                'id': int(self.get_next_id()),
-                'type': 'whitespace',
-                'severity': 'low',
-                'title': 'Whitespace Issues',
-                'description': f'Found leading/trailing whitespace in {len(columns_with_whitespace)} columns',
-                'columns': columns_with_whitespace,
-                'suggestion': 'Trim whitespace from text fields',
-                'auto_fix': True
-            }
+            return self._whitespace_issue(columns_with_whitespace)
         return None
     
+    def _whitespace_issue(self, columns_with_whitespace: List[str]) -> Dict:
+        return {
+            'id': int(self.get_next_id()),
+            'type': 'whitespace',
+            'severity': 'low',
+            'title': 'Whitespace Issues',
+            'description': f'Found leading/trailing whitespace in {len(columns_with_whitespace)} columns',
+            'columns': columns_with_whitespace,
+            'suggestion': 'Trim whitespace from text fields',
+            'auto_fix': True
+        }
+    
+    def issue_columns(self, issue: Dict) -> Optional[List[str]]:
+        """Columns needed to find the rows of an issue, or None if it needs all of them"""
+        if issue['type'] == 'duplicates':
+            return None
+        if 'column' in issue:
+            return [issue['column']]
+        return list(issue.get('columns', []))
+
+    def issue_rows(self, df: pd.DataFrame, issue: Dict) -> np.ndarray:
+        """Return a boolean mask of the rows affected by an issue"""
+        issue_type = issue['type']
+        mask = np.zeros(len(df), dtype=bool)
+
+        if issue_type == 'column_naming':
+            raise ValueError("Column naming issues don't apply to individual rows")
+
+        if issue_type == 'duplicates':
+            return df.duplicated().to_numpy()
+
+        # Columns renamed or dropped since the analysis have no affected rows
+        columns = [col for col in (self.issue_columns(issue) or []) if col in df.columns]
+        for col in columns:
+            values = df[col]
+            present = values.notna().to_numpy()
+
+            if issue_type == 'missing_values':
+                mask |= ~present
+            elif issue_type == 'whitespace':
+                if is_text_dtype(values.dtype):
+                    as_str = values.astype(str)
+                    mask |= as_str.str.strip().ne(as_str).to_numpy()
+            elif issue_type == 'data_type':
+                mask |= present & pd.to_numeric(values, errors='coerce').isna().to_numpy()
+            elif issue_type == 'data_validation':
+                mask |= present & ~as_text(values).str.match(EMAIL_PATTERN).to_numpy()
+            elif issue_type in ('date_format', 'phone_format'):
+                # Rows not in the column's most common format
+                patterns = DATE_PATTERNS if issue_type == 'date_format' else PHONE_PATTERNS
+                labels = classify_formats(values, patterns)
+                common = labels[present].mode()
+                expected = common.iat[0] if len(common) else None
+                mask |= present & labels.ne(expected).to_numpy()
+
+        return mask
+
     def enhance_with_ai(self, issues: List[Dict], ai_suggestions: Dict) -> List[Dict]:
         """Enhance rule-based issues with AI suggestions"""
         # Merge AI suggestions into issues
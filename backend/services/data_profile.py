@@ -0,0 +1,174 @@
+import pandas as pd
+import numpy as np
+from functools import cached_property
+from typing import Callable, Dict, List, Optional
+from utils.dtypes import as_text, is_text_dtype
+from utils.row_index import RowHashIndex
+
+
+class ColumnProfile:
+    """Derived views of one column, each computed on first use and then
+    shared by every check that needs it."""
+
+    def __init__(self, series: pd.Series):
+        self.series = series
+
+    @cached_property
+    def null_mask(self) -> np.ndarray:
+        return self.series.isna().to_numpy()
+
+    @cached_property
+    def non_null_count(self) -> int:
+        return int(len(self.series) - self.null_mask.sum())
+
+    @cached_property
+    def is_object(self) -> bool:
+        return is_text_dtype(self.series.dtype)
+
+    @cached_property
+    def present(self) -> pd.Series:
+        """Non-null values"""
+        return self.series[~self.null_mask]
+
+    @cached_property
+    def text(self) -> pd.Series:
+        """Non-null values as strings"""
+        return as_text(self.present)
+
+    @cached_property
+    def stripped(self) -> pd.Series:
+        return self.text.str.strip()
+
+    @cached_property
+    def numeric(self) -> pd.Series:
+        """Non-null values coerced to numbers, NaN where that fails"""
+        return pd.to_numeric(self.present, errors='coerce')
+
+    @cached_property
+    def numeric_failed(self) -> np.ndarray:
+        """For each non-null value, whether it can't be read as a number.
+
+        Coerces each distinct value once; values equal under == always
+        coerce alike, so this matches ``numeric.isna()``.
+        """
+        uniques = pd.Series(np.asarray(self._factorized[1], dtype=object), dtype=object)
+        failed = pd.to_numeric(uniques, errors='coerce').isna().to_numpy()
+        return failed[self.present_codes]
+
+    @cached_property
+    def _factorized(self) -> tuple:
+        return pd.factorize(self.series)
+
+    @cached_property
+    def codes(self) -> np.ndarray:
+        """Factorized value codes, -1 for nulls, with the equality df.duplicated uses"""
+        return self._factorized[0]
+
+    @cached_property
+    def present_codes(self) -> np.ndarray:
+        return self.codes[~self.null_mask]
+
+    @cached_property
+    def unique_count(self) -> int:
+        return int(len(self._factorized[1]))
+
+    @cached_property
+    def unique_text(self) -> Optional[pd.Series]:
+        """Distinct values when they are all strings, otherwise None.
+
+        Factorizing treats 1, 1.0 and True as one value although their string
+        forms differ, so only pure-string columns can be handled per value.
+        """
+        if not self.is_object:
+            return None
+        uniques = np.asarray(self._factorized[1], dtype=object)
+        if pd.api.types.infer_dtype(uniques, skipna=False) != 'string':
+            return None
+        return pd.Series(uniques, dtype=object)
+
+    def text_mask(self, predicate: Callable[[pd.Series], pd.Series]) -> np.ndarray:
+        """Evaluate a vectorized predicate on the non-null values as strings.
+
+        Pure-string columns evaluate it once per distinct value.
+        """
+        if self.unique_text is not None:
+            return predicate(self.unique_text).to_numpy(dtype=bool)[self.present_codes]
+        return predicate(self.text).to_numpy(dtype=bool)
+
+    def text_at(self, positions: np.ndarray) -> List[str]:
+        """String form of the non-null values at the given positions"""
+        if self.unique_text is not None:
+            return self.unique_text.to_numpy()[self.present_codes[positions]].tolist()
+        return self.text.iloc[positions].tolist()
+
+
+class DataProfile:
+    """Column profiles and row-level facts about a DataFrame, shared by the
+    analyzer checks and the /analyze stats so each is computed once."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._columns = {}
+
+    def column(self, col) -> ColumnProfile:
+        if col not in self._columns:
+            self._columns[col] = ColumnProfile(self.df[col])
+        return self._columns[col]
+
+    @cached_property
+    def null_counts(self) -> pd.Series:
+        """Missing values per column"""
+        return pd.Series(
+            [int(self.column(col).null_mask.sum()) for col in self.df.columns],
+            index=self.df.columns,
+            dtype='int64'
+        )
+
+    @cached_property
+    def empty_rows(self) -> int:
+        """Rows where every column is null"""
+        mask = np.ones(len(self.df), dtype=bool)
+        for col in self.df.columns:
+            mask &= self.column(col).null_mask
+        return int(mask.sum())
+
+    @cached_property
+    def code_frame(self) -> pd.DataFrame:
+        """Factorized codes of every column, by position"""
+        return pd.DataFrame({i: self.column(col).codes for i, col in enumerate(self.df.columns)})
+
+    @cached_property
+    def row_hashes(self) -> np.ndarray:
+        """64-bit hash per row, equal for rows df.duplicated considers equal"""
+        return pd.util.hash_pandas_object(self.code_frame, index=False).to_numpy()
+
+    @cached_property
+    def row_index(self) -> RowHashIndex:
+        """The row hashes as an index that can be stored with the dataset"""
+        return RowHashIndex(self.row_hashes)
+
+    @cached_property
+    def duplicated(self) -> np.ndarray:
+        """Same mask as df.duplicated(), computed from the row hashes"""
+        if len(self.df.columns) <= 1:
+            # pandas compares a single column directly, telling None from NaN
+            return self.df.duplicated().to_numpy()
+        # Only rows sharing a hash can be duplicates; confirm those on their codes
+        candidates = pd.Series(self.row_hashes).duplicated(keep=False).to_numpy()
+        mask = np.zeros(len(self.df), dtype=bool)
+        if candidates.any():
+            mask[candidates] = self.code_frame[candidates].duplicated().to_numpy()
+        return mask
+
+    @cached_property
+    def duplicate_count(self) -> int:
+        return int(self.duplicated.sum())
+
+    def stats(self) -> Dict:
+        """Dataset stats reported by /analyze"""
+        return {
+            "total_rows": int(len(self.df)),
+            "total_columns": int(len(self.df.columns)),
+            "empty_rows": self.empty_rows,
+            "duplicate_rows": self.duplicate_count
+        }
@@ -0,0 +1,297 @@
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class DatasetStore:
+    """Persists DataFrames as memory-mappable Arrow IPC files keyed by
+    ``<file_id>/<kind>`` and keeps recently used ones in memory up to a byte
+    budget.
+
+    The files are the source of truth, so any worker process can open a
+    dataset written by another one. The in-memory copies are a per-process
+    LRU cache that is invalidated when the file on disk changes.
+
+    Datasets too large to hold in memory are stored with ``put_parts`` as a
+    directory of consecutive parts, one file per chunk, and read back by
+    row position with ``take_rows``.
+    """
+
+    def __init__(self, memory_budget: Optional[int] = None, dataset_dir: Optional[str] = None):
+        self.memory_budget = memory_budget if memory_budget is not None else int(
+            os.getenv("DATASET_MEMORY_BUDGET", 1024 ** 3)
+        )
+        self.dataset_dir = dataset_dir or os.getenv("DATASET_DIR", "./storage/datasets")
+        os.makedirs(self.dataset_dir, exist_ok=True)
+
+        self._frames = OrderedDict()  # key -> (DataFrame, size in bytes, file mtime)
+        self._lock = threading.RLock()
+
+        self.memory_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def put(self, key: str, df: pd.DataFrame) -> str:
+        """Write a DataFrame to its dataset file, cache it and return the path"""
+        with self._lock:
+            path = self._write(key, df)
+            self._forget(key)
+            self._cache(key, df, os.stat(path).st_mtime_ns)
+            return path
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """Return a stored DataFrame, loading it from its dataset file if needed"""
+        with self._lock:
+            path = self.find(key)
+            if path is None:
+                self._forget(key)
+                return None
+
+            mtime = os.stat(path).st_mtime_ns
+            cached = self._frames.get(key)
+            if cached is not None and cached[2] == mtime:
+                self.hits += 1
+                self._frames.move_to_end(key)
+                return cached[0]
+
+            self.misses += 1
+            self._forget(key)
+            df = self._read(path)
+            self._cache(key, df, mtime)
+            return df
+
+    def open_table(self, key: str) -> Optional[pa.Table]:
+        """Open a dataset as a zero-copy, memory-mapped Arrow table"""
+        path = self.find(key)
+        if path is None or not path.endswith('.arrow'):
+            return None
+        with pa.memory_map(path, 'r') as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def iter_chunks(self, key: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        """Yield a dataset as DataFrames of at most chunk_rows rows without loading it whole"""
+        table = self.open_table(key)
+        if table is None:
+            df = self.get(key)
+            if df is None:
+                return
+            for start in range(0, max(len(df), 1), chunk_rows):
+                yield df.iloc[start:start + chunk_rows]
+            return
+        if table.num_rows == 0:
+            yield table.to_pandas()
+            return
+        for batch in table.to_batches(max_chunksize=chunk_rows):
+            yield batch.to_pandas()
+
+    def link(self, source_key: str, key: str) -> Optional[str]:
+        """Make a dataset available under another key without copying its data"""
+        source = self.find(source_key)
+        if source is None:
+            return self._link_parts(source_key, key)
+        path = self._base_path(key) + os.path.splitext(source)[1]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._link_file(source, path)
+        return path
+
+    def put_parts(self, key: str, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """Store chunks as consecutive parts of one dataset, passing each on once written.
+
+        Parts are named by the row they start at and aren't cached in memory.
+        They appear under the key together, after the last chunk.
+        """
+        base = self._base_path(key)
+        tmp_dir = f"{base}.{os.getpid()}.parts.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        try:
+            start = 0
+            for number, chunk in enumerate(chunks):
+                # An empty part is only kept to record the columns
+                if number == 0 or len(chunk):
+                    tmp_path = os.path.join(tmp_dir, 'part.tmp')
+                    ext = self._write_frame(chunk, tmp_path)
+                    os.replace(tmp_path, os.path.join(tmp_dir, f"{start:012d}{ext}"))
+                start += len(chunk)
+                yield chunk
+            shutil.rmtree(base + '.parts', ignore_errors=True)
+            os.replace(tmp_dir, base + '.parts')
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def parts_path(self, key: str) -> Optional[str]:
+        """Return the directory of a dataset stored in parts, if one exists"""
+        directory = self._base_path(key) + '.parts'
+        return directory if os.path.isdir(directory) else None
+
+    def parts(self, key: str) -> Optional[List[Tuple[int, str]]]:
+        """Starting row and path of each part of a dataset stored with put_parts"""
+        directory = self.parts_path(key)
+        if directory is None:
+            return None
+        return [(int(os.path.splitext(name)[0]), os.path.join(directory, name))
+                for name in sorted(os.listdir(directory))]
+
+    def take_rows(self, key: str, positions: np.ndarray, columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        """Rows at ascending positions of a dataset stored in parts, indexed by position.
+
+        Only the parts the rows fall in are opened, and of those only the
+        given columns are converted. Positions past the end are skipped.
+        """
+        parts = self.parts(key)
+        if not parts:
+            return None if parts is None else pd.DataFrame(columns=columns)
+        positions = np.asarray(positions, dtype=np.int64)
+        starts = np.array([start for start, _ in parts], dtype=np.int64)
+        owners = np.searchsorted(starts, positions, side='right') - 1
+        # The first part always gives the columns, even when no rows are taken
+        frames = [] if len(positions) and owners[0] == 0 else [self._take_part(parts[0][1], positions[:0], 0, columns)]
+        for number in np.unique(owners[owners >= 0]):
+            start, path = parts[number]
+            frames.append(self._take_part(path, positions[owners == number] - start, start, columns))
+        return pd.concat(frames) if len(frames) > 1 else frames[0]
+
+    def iter_parts(self, key: str, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+        """Yield each part of a dataset stored in parts, with only the given columns"""
+        for start, path in self.parts(key) or []:
+            yield self._take_part(path, None, start, columns)
+
+    def find(self, key: str) -> Optional[str]:
+        """Return the path of the dataset file for a key, if one exists"""
+        base = self._base_path(key)
+        for ext in ('.arrow', '.pkl'):
+            if os.path.exists(base + ext):
+                return base + ext
+        return None
+
+    def __contains__(self, key: str) -> bool:
+        return self.find(key) is not None
+
+    def delete(self, key: str):
+        """Forget a DataFrame both in memory and on disk"""
+        with self._lock:
+            self._forget(key)
+            path = self.find(key)
+            while path is not None:
+                os.remove(path)
+                path = self.find(key)
+            shutil.rmtree(self._base_path(key) + '.parts', ignore_errors=True)
+
+    def stats(self) -> Dict:
+        """Counters used to size the memory budget"""
+        with self._lock:
+            return {
+                "memory_budget": self.memory_budget,
+                "memory_used": self.memory_used,
+                "in_memory": len(self._frames),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+    def _cache(self, key: str, df: pd.DataFrame, mtime: int):
+        size = int(df.memory_usage(deep=True).sum())
+        self._frames[key] = (df, size, mtime)
+        self.memory_used += size
+        # The most recently used frame always stays, even if it alone exceeds the budget
+        while self.memory_used > self.memory_budget and len(self._frames) > 1:
+            _, (_, evicted_size, _) = self._frames.popitem(last=False)
+            self.memory_used -= evicted_size
+            self.evictions += 1
+
+    def _forget(self, key: str):
+        if key in self._frames:
+            _, size, _ = self._frames.pop(key)
+            self.memory_used -= size
+
+    def _base_path(self, key: str) -> str:
+        return os.path.join(self.dataset_dir, *key.split('/'))
+
+    def _write(self, key: str, df: pd.DataFrame) -> str:
+        base = self._base_path(key)
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        # Write to a temporary file and rename, so readers in other processes
+        # never see a half-written dataset
+        tmp_path = f"{base}.{os.getpid()}.tmp"
+        ext = self._write_frame(df, tmp_path)
+        path, stale = base + ext, base + ('.pkl' if ext == '.arrow' else '.arrow')
+        os.replace(tmp_path, path)
+        if os.path.exists(stale):
+            os.remove(stale)
+        return path
+
+    @staticmethod
+    def _write_frame(df: pd.DataFrame, tmp_path: str) -> str:
+        """Write a DataFrame to tmp_path and return the extension its format needs"""
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=True)
+            # Uncompressed, so the file can be memory-mapped without copying
+            with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            return '.arrow'
+        except (pa.ArrowException, TypeError, ValueError):
+            # Columns mixing Python types can't be represented in Arrow
+            df.to_pickle(tmp_path)
+            return '.pkl'
+
+    def _link_parts(self, source_key: str, key: str) -> Optional[str]:
+        parts = self.parts(source_key)
+        if parts is None:
+            return None
+        directory = self._base_path(key) + '.parts'
+        tmp_dir = f"{directory}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        try:
+            for _, source in parts:
+                self._link_file(source, os.path.join(tmp_dir, os.path.basename(source)))
+            shutil.rmtree(directory, ignore_errors=True)
+            os.replace(tmp_dir, directory)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return directory
+
+    @staticmethod
+    def _link_file(source: str, path: str):
+        try:
+            os.link(source, path)
+        except OSError:
+            # Hard links need the same filesystem
+            shutil.copyfile(source, path)
+
+    @staticmethod
+    def _take_part(path: str, local: Optional[np.ndarray], start: int, columns: Optional[List[str]]) -> pd.DataFrame:
+        """Rows of one part at local positions, or all of them, indexed by their position in the dataset"""
+        if path.endswith('.arrow'):
+            with pa.memory_map(path, 'r') as source:
+                table = pa.ipc.open_file(source).read_all()
+            if columns is not None:
+                table = table.select(columns)
+            if local is not None:
+                local = local[local < table.num_rows]
+                table = table.take(pa.array(local, type=pa.int64()))
+            frame = table.to_pandas()
+            if columns is not None:
+                frame = frame[columns]
+        else:
+            frame = pd.read_pickle(path)
+            if columns is not None:
+                # Arrow stores column names as strings, so they are asked for that way
+                frame = frame[[col for col in frame.columns if str(col) in columns]]
+            if local is not None:
+                local = local[local < len(frame)]
+                frame = frame.iloc[local]
+        frame.index = pd.RangeIndex(start, start + len(frame)) if local is None else pd.Index(local + start)
+        return frame
+
+    def _read(self, path: str) -> pd.DataFrame:
+        if path.endswith('.arrow'):
+            with pa.memory_map(path, 'r') as source:
+                return pa.ipc.open_file(source).read_all().to_pandas()
+        return pd.read_pickle(path)
@@ -0,0 +1,73 @@
+import os
+import shutil
+from typing import Iterator, Optional
+
+
+class ExportCache:
+    """Keeps exported downloads on disk, keyed by file id, cleaning version
+    and export variant (format plus options such as gzip or SQL style).
+
+    A new cleaning run bumps the version, so stale exports are never served
+    even if another worker hasn't removed them yet.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or os.getenv("EXPORT_CACHE_DIR", "./storage/exports")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def variant(self, format: str, compress: bool = False, sql_style: str = 'insert',
+                batch_size: Optional[int] = None) -> str:
+        """Name for one combination of export options, used as the cached file name"""
+        variant = format.lower()
+        if variant == 'sql':
+            variant += f"-{sql_style}" + (f"-{batch_size}" if sql_style == 'insert' else "")
+        return variant + ('.gz' if compress else '')
+
+    def etag(self, file_id: str, version: int, variant: str) -> str:
+        """Strong ETag of an export, known without touching the disk"""
+        return f'"{file_id}-v{version}-{variant}"'
+
+    def path(self, file_id: str, version: int, variant: str) -> str:
+        return os.path.join(self.cache_dir, file_id, f"v{version}", variant)
+
+    def get(self, file_id: str, version: int, variant: str) -> Optional[str]:
+        """Return the path of a cached export, if there is one"""
+        path = self.path(file_id, version, variant)
+        return path if os.path.exists(path) else None
+
+    def put(self, file_id: str, version: int, variant: str, source_path: str) -> str:
+        """Move a freshly written export into the cache and return its new path"""
+        path = self.path(file_id, version, variant)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(source_path, path)
+        return path
+
+    def tee(self, file_id: str, version: int, variant: str, stream: Iterator[bytes]) -> Iterator[bytes]:
+        """Pass a streamed export through while saving a copy in the cache.
+
+        The copy only becomes visible once the stream finished, so a client
+        disconnecting halfway never leaves a truncated export behind.
+        """
+        path = self.path(file_id, version, variant)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{id(stream)}.tmp"
+        completed = False
+        try:
+            with open(tmp_path, 'wb') as f:
+                for data in stream:
+                    f.write(data)
+                    yield data
+            completed = True
+        finally:
+            try:
+                if completed:
+                    os.replace(tmp_path, path)
+                else:
+                    os.remove(tmp_path)
+            except OSError:
+                # The file was cleaned again and its exports removed meanwhile
+                pass
+
+    def invalidate(self, file_id: str):
+        """Remove every cached export of a file"""
+        shutil.rmtree(os.path.join(self.cache_dir, file_id), ignore_errors=True)
@@ -1,43 +1,232 @@
 import pandas as pd
+import numpy as np
 import os
 import aiofiles
-from typing import Dict, List
+from typing import Dict, List, Iterable, Iterator, Optional
 import json
+import hashlib
+import uuid
+import zipfile
+import zlib
 from datetime import datetime
+from utils.sql_export import create_table_statement, insert_statements, copy_block
+from utils.dtypes import expand_categoricals, logical_dtypes, optimize_dtypes
+from utils.excel_io import read_excel_chunks, write_excel, sheet_names
+from utils.metrics import stage
+
+
+class FileTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured maximum size"""
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        super().__init__(f"File exceeds maximum upload size of {max_size} bytes")
+
+
+class SheetNotFoundError(ValueError):
+    """Raised when a requested worksheet isn't in the uploaded workbook"""
+
 
 class FileHandler:
+    UPLOAD_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+    EXPORT_FORMATS = ('csv', 'xlsx', 'json', 'sql')
+    # Formats stream_export can produce without building the whole file
+    STREAMING_FORMATS = ('csv', 'json', 'sql')
+
     def __init__(self):
         self.upload_dir = os.getenv("UPLOAD_DIR", "./storage/uploads")
         self.cleaned_dir = os.getenv("CLEANED_DIR", "./storage/cleaned")
+        # Uploads are copied to disk in chunks of this many bytes
+        self.upload_chunk_size = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+        # 0 disables the limit
+        self.max_upload_size = int(os.getenv("MAX_UPLOAD_SIZE", 2 * 1024 ** 3))
+        # Streamed exports are produced this many rows at a time
+        self.export_chunk_rows = int(os.getenv("EXPORT_CHUNK_ROWS", 50000))
+        # Rows per INSERT statement in SQL exports
+        self.sql_batch_size = int(os.getenv("SQL_INSERT_BATCH_SIZE", 500))
+        # Parsed uploads are stored with downcast integers and categorical strings
+        self.optimize_dtypes = os.getenv("OPTIMIZE_DTYPES", "true").lower() in ("1", "true", "yes")
+        # Rows sampled to pick categorical columns, and the largest share of
+        # distinct values a column may have to become one
+        self.dtype_sample_rows = int(os.getenv("DTYPE_SAMPLE_ROWS", 10000))
+        self.category_ratio = float(os.getenv("CATEGORY_MAX_RATIO", 0.5))
+        # "pyarrow" parses CSV faster, but reads ISO dates as dates and very
+        # large integers as floats; files it can't match fall back to "c"
+        self.csv_engine = os.getenv("CSV_ENGINE", "c").lower()
+        # Most data files accepted in one batch upload, archive members included
+        self.batch_max_files = int(os.getenv("BATCH_MAX_FILES", 100))
         os.makedirs(self.upload_dir, exist_ok=True)
         os.makedirs(self.cleaned_dir, exist_ok=True)
     
     async def save_upload(self, file, file_id: str) -> tuple:
-        """Save uploaded file and return path and size"""
+        """Stream uploaded file to disk and return path, size and SHA-256 hash"""
         ext = file.filename.split('.')[-1]
         file_path = os.path.join(self.upload_dir, f"{file_id}.{ext}")
         
+        # Reject early when the client declared a size up front
+        declared_size = getattr(file, 'size', None)
+        if self.max_upload_size and declared_size and declared_size > self.max_upload_size:
+            raise FileTooLargeError(self.max_upload_size)
+        
         file_size = 0
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            file_size = len(content)
-            await f.write(content)
+        hasher = hashlib.sha256()
+        try:
+            async with aiofiles.open(file_path, 'wb') as f:
+                while True:
+                    chunk = await file.read(self.upload_chunk_size)
+                    if not chunk:
+                        break
+                    file_size += len(chunk)
+                    if self.max_upload_size and file_size > self.max_upload_size:
+                        raise FileTooLargeError(self.max_upload_size)
+                    hasher.update(chunk)
+                    await f.write(chunk)
+        except Exception:
+            # Don't leave partial uploads behind
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
         
-        return file_path, file_size
+        return file_path, file_size, hasher.hexdigest()
     
-    def read_file(self, file_path: str) -> pd.DataFrame:
-        
-        """Read CSV or Excel file"""
+    def is_archive(self, filename: str) -> bool:
+        return filename.lower().endswith('.zip')
+    
+    def extract_archive(self, archive_path: str) -> List[tuple]:
+        """Copy the data files of a zip archive into the upload directory.
+
+        Returns (file_id, filename, path, size, SHA-256 hash) per member;
+        other members are skipped. Each member gets a fresh name, so paths
+        inside the archive are never used on disk.
+        """
+        extracted = []
+        try:
+            with zipfile.ZipFile(archive_path) as archive:
+                members = [
+                    info for info in archive.infolist()
+                    if not info.is_dir() and info.filename.endswith(self.UPLOAD_EXTENSIONS)
+                    and not info.filename.startswith('__MACOSX/')
+                ]
+                if len(members) > self.batch_max_files:
+                    raise ValueError(f"Archive has {len(members)} data files; at most {self.batch_max_files} are accepted")
+                for info in members:
+                    file_id = str(uuid.uuid4())
+                    ext = info.filename.split('.')[-1]
+                    file_path = os.path.join(self.upload_dir, f"{file_id}.{ext}")
+                    # Record the path first so a failed copy is cleaned up below
+                    extracted.append((file_id, os.path.basename(info.filename), file_path))
+                    file_size = 0
+                    hasher = hashlib.sha256()
+                    with archive.open(info) as src, open(file_path, 'wb') as dst:
+                        while True:
+                            chunk = src.read(self.upload_chunk_size)
+                            if not chunk:
+                                break
+                            file_size += len(chunk)
+                            # Checked on the bytes read, not the size the archive claims
+                            if self.max_upload_size and file_size > self.max_upload_size:
+                                raise FileTooLargeError(self.max_upload_size)
+                            hasher.update(chunk)
+                            dst.write(chunk)
+                    extracted[-1] += (file_size, hasher.hexdigest())
+        except Exception:
+            for _, _, file_path, *_ in extracted:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            raise
+        return extracted
+    
+    def is_excel(self, file_path: str) -> bool:
+        return file_path.endswith(('.xlsx', '.xls'))
+    
+    def sheet_names(self, file_path: str) -> List[str]:
+        """Worksheet names of an Excel file"""
+        return sheet_names(file_path)
+    
+    def resolve_sheet(self, sheets: List[str], sheet: Optional[str] = None) -> str:
+        """Name of the worksheet to read out of a workbook's sheets, the first one by default"""
+        if sheet is None:
+            return sheets[0]
+        if sheet not in sheets:
+            raise SheetNotFoundError(f"Sheet '{sheet}' not found; the workbook has: {', '.join(sheets)}")
+        return sheet
+    
+    def read_file(self, file_path: str, optimize: Optional[bool] = None, sheet: Optional[str] = None) -> pd.DataFrame:
+        """Read CSV or Excel file, in compact dtypes unless optimize is False"""
         if file_path.endswith('.csv'):
+            with stage('parse', 'csv') as record:
+                df = self._read_csv(file_path)
+                record['rows_out'] = len(df)
+        elif self.is_excel(file_path):
+            with stage('parse', 'excel') as record:
+                # pandas reads through a read-only workbook, so only the values are held
+                df = pd.read_excel(file_path, sheet_name=0 if sheet is None else sheet)
+                record['rows_out'] = len(df)
+        else:
+            raise ValueError("Unsupported file format")
+        if self.optimize_dtypes if optimize is None else optimize:
+            with stage('parse', 'optimize_dtypes', len(df)) as record:
+                df = optimize_dtypes(df, self.dtype_sample_rows, self.category_ratio)
+                record['rows_out'] = len(df)
+        return df
+    
+    def compact(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Same data in compact dtypes, when OPTIMIZE_DTYPES is on"""
+        if not self.optimize_dtypes:
+            return df
+        return optimize_dtypes(df, self.dtype_sample_rows, self.category_ratio)
+    
+    def _read_csv(self, file_path: str) -> pd.DataFrame:
+        if self.csv_engine != 'pyarrow':
+            return pd.read_csv(file_path)
+        try:
+            df = pd.read_csv(file_path, engine='pyarrow')
+        except Exception:
+            # Ragged rows, duplicate headers and the like
+            return pd.read_csv(file_path)
+        header = pd.read_csv(file_path, nrows=0).columns
+        if not df.columns.equals(header):
+            # Blank or repeated header names, which the C parser renames
             return pd.read_csv(file_path)
-        elif file_path.endswith(('.xlsx', '.xls')):
-            return pd.read_excel(file_path)
+        for i in range(df.shape[1]):
+            # Missing text is None here but NaN from the C parser
+            if df.dtypes.iloc[i] == 'object':
+                df.isetitem(i, df.iloc[:, i].where(df.iloc[:, i].notna(), np.nan))
+        return df
+    
+    def read_file_chunks(self, file_path: str, chunksize: int, sheet: Optional[str] = None,
+                         columns: Optional[List[int]] = None, as_text: bool = False) -> Iterator[pd.DataFrame]:
+        """Read CSV or Excel file as an iterator of DataFrames of at most chunksize rows.
+
+        columns keeps only the columns at those positions; as_text reads
+        every value as its original text instead of inferring types.
+        """
+        dtype = str if as_text else None
+        if file_path.endswith('.csv'):
+            with pd.read_csv(file_path, chunksize=chunksize, usecols=columns, dtype=dtype) as reader:
+                for chunk in reader:
+                    yield chunk
+        elif file_path.endswith('.xlsx'):
+            for chunk in read_excel_chunks(file_path, chunksize, sheet, as_text):
+                yield chunk if columns is None else chunk.iloc[:, columns]
+        elif file_path.endswith('.xls'):
+            # Legacy workbooks can't be read row by row, so slice the loaded frame
+            df = pd.read_excel(file_path, sheet_name=0 if sheet is None else sheet, dtype=dtype)
+            if columns is not None:
+                df = df.iloc[:, columns]
+            for start in range(0, max(len(df), 1), chunksize):
+                yield df.iloc[start:start + chunksize]
         else:
             raise ValueError("Unsupported file format")
     
+    def frame_chunks(self, df: pd.DataFrame) -> Iterator[pd.DataFrame]:
+        """Slices of export_chunk_rows rows, at least one even for an empty frame"""
+        for start in range(0, max(len(df), 1), self.export_chunk_rows):
+            yield df.iloc[start:start + self.export_chunk_rows]
+    
     def get_preview(self, df: pd.DataFrame, rows: int = 20) -> Dict:
         """Get preview of dataframe"""
-        preview_df = df.head(rows)
+        # Compact storage dtypes are an implementation detail the preview doesn't show
+        preview_df = expand_categoricals(df.head(rows))
         
         # Replace NaN with None for JSON serialization
         preview_data = preview_df.where(pd.notnull(preview_df), None).values.tolist()
@@ -45,7 +234,7 @@ class FileHandler:
         return {
             "columns": df.columns.tolist(),
             "rows": preview_data,
-            "dtypes": df.dtypes.astype(str).to_dict()
+            "dtypes": logical_dtypes(df)
         }
     
     def save_cleaned_data(self, df: pd.DataFrame, original_filename: str, file_id: str) -> str:
@@ -61,82 +250,120 @@ class FileHandler:
         # Save to cleaned directory
         cleaned_path = os.path.join(self.cleaned_dir, cleaned_filename)
         
-        if original_ext.lower() == '.csv':
-            df.to_csv(cleaned_path, index=False)
-        else:  # Excel format
-            df.to_excel(cleaned_path, index=False, engine='openpyxl')
+        with stage('save', original_ext.lower().lstrip('.'), len(df)) as record:
+            if original_ext.lower() == '.csv':
+                df.to_csv(cleaned_path, index=False)
+            else:  # Excel format
+                write_excel(self.frame_chunks(df), cleaned_path)
+            record['rows_out'] = len(df)
         
         return cleaned_filename
     
-    def export_data(self, df: pd.DataFrame, format: str, cleaned_filename: str) -> str:
+    def export_data(self, df: pd.DataFrame, format: str, cleaned_filename: str, sql_style: str = 'insert',
+                    batch_size: Optional[int] = None) -> str:
         """Export cleaned data to specified format for download"""
         base_name = os.path.splitext(cleaned_filename)[0]
+        if format.lower() not in self.EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {format}")
         
-        if format.lower() == 'csv':
-            output_path = os.path.join(self.cleaned_dir, f"{base_name}.csv")
-            df.to_csv(output_path, index=False)
+        with stage('export', format.lower(), len(df)) as record:
+            if format.lower() == 'csv':
+                output_path = os.path.join(self.cleaned_dir, f"{base_name}.csv")
+                df.to_csv(output_path, index=False)
         
-        elif format.lower() == 'xlsx':
-            output_path = os.path.join(self.cleaned_dir, f"{base_name}.xlsx")
-            df.to_excel(output_path, index=False, engine='openpyxl')
+            elif format.lower() == 'xlsx':
+                output_path = os.path.join(self.cleaned_dir, f"{base_name}.xlsx")
+                write_excel(self.frame_chunks(df), output_path)
         
-        elif format.lower() == 'json':
-            output_path = os.path.join(self.cleaned_dir, f"{base_name}.json")
-            df.to_json(output_path, orient='records', indent=2)
+            elif format.lower() == 'json':
+                output_path = os.path.join(self.cleaned_dir, f"{base_name}.json")
+                # Same writer as stream_export, so both give the same bytes
+                with open(output_path, 'w', encoding='utf-8') as f:
+                    for part in self._export_parts(self.frame_chunks(df), 'json', None, sql_style, batch_size):
+                        f.write(part)
         
-        elif format.lower() == 'sql':
-            output_path = os.path.join(self.cleaned_dir, f"{base_name}.sql")
-            # Extract table name from filename
-            table_name = base_name.lower().replace(' ', '_').replace('-', '_')
-            # Remove _cleaned suffix for table name
-            table_name = table_name.replace('_cleaned', '')
-            sql_content = self.generate_sql(df, table_name)
-            with open(output_path, 'w') as f:
-                f.write(sql_content)
+            elif format.lower() == 'sql':
+                output_path = os.path.join(self.cleaned_dir, f"{base_name}.sql")
+                sql_content = self.generate_sql(df, self.sql_table_name(cleaned_filename), sql_style, batch_size)
+                with open(output_path, 'w') as f:
+                    f.write(sql_content)
         
-        else:
-            raise ValueError(f"Unsupported export format: {format}")
+            record['rows_out'] = len(df)
         
         return output_path
     
-    def generate_sql(self, df: pd.DataFrame, table_name: str) -> str:
-        """Generate SQL INSERT statements"""
-        sql_lines = []
-        
-        # Create table statement
-        columns = []
-        for col in df.columns:
-            dtype = df[col].dtype
-            if dtype == 'int64':
-                col_type = 'INTEGER'
-            elif dtype == 'float64':
-                col_type = 'DECIMAL(10,2)'
-            else:
-                col_type = 'VARCHAR(255)'
-            columns.append(f"    {col} {col_type}")
-        
-        create_table = f"CREATE TABLE {table_name} (\n"
-        create_table += ",\n".join(columns)
-        create_table += "\n);\n\n"
-        sql_lines.append(create_table)
-        
-        # Insert statements
-        for _, row in df.iterrows():
-            values = []
-            for val in row:
-                if pd.isna(val):
-                    values.append('NULL')
-                elif isinstance(val, (int, float)):
-                    values.append(str(val))
-                else:
-                    # Escape single quotes
-                    escaped_val = str(val).replace("'", "''")
-                    values.append(f"'{escaped_val}'")
-            
-            insert_stmt = f"INSERT INTO {table_name} ({', '.join(df.columns)}) VALUES ({', '.join(values)});\n"
-            sql_lines.append(insert_stmt)
-        
-        return ''.join(sql_lines)
+    def stream_export(self, chunks: Iterable[pd.DataFrame], format: str, cleaned_filename: str,
+                      compress: bool = False, sql_style: str = 'insert',
+                      batch_size: Optional[int] = None) -> Iterator[bytes]:
+        """Yield a CSV, JSON or SQL export chunk by chunk, optionally gzipped.
+
+        Memory use and time to first byte depend on the chunk size only, not
+        on the size of the dataset. JSON is written without indentation.
+        """
+        format = format.lower()
+        if format not in self.STREAMING_FORMATS:
+            raise ValueError(f"Unsupported streaming export format: {format}")
+        table_name = self.sql_table_name(cleaned_filename)
+        parts = self._export_parts(chunks, format, table_name, sql_style, batch_size)
+        if not compress:
+            for part in parts:
+                yield part.encode('utf-8')
+            return
+
+        # wbits=31 writes a gzip header and trailer around the deflate stream
+        compressor = zlib.compressobj(wbits=31)
+        for part in parts:
+            data = compressor.compress(part.encode('utf-8'))
+            if data:
+                yield data
+        yield compressor.flush()
+
+    def _export_parts(self, chunks: Iterable[pd.DataFrame], format: str, table_name: str,
+                      sql_style: str, batch_size: Optional[int]) -> Iterator[str]:
+        first = True
+        wrote_records = False
+        for chunk in chunks:
+            if format == 'csv':
+                yield chunk.to_csv(index=False, header=first)
+            elif format == 'json':
+                # Join each chunk's records into a single JSON array
+                records = chunk.to_json(orient='records')[1:-1]
+                if records:
+                    yield (',' if wrote_records else '[') + records
+                    wrote_records = True
+            elif format == 'sql':
+                if first:
+                    yield self.sql_create_table(chunk, table_name)
+                yield self.sql_data(chunk, table_name, sql_style, batch_size)
+            first = False
+
+        if format == 'json':
+            yield ']' if wrote_records else '[]'
+
+    def sql_table_name(self, cleaned_filename: str) -> str:
+        """Table name for SQL exports, derived from the cleaned filename"""
+        base_name = os.path.splitext(cleaned_filename)[0]
+        table_name = base_name.lower().replace(' ', '_').replace('-', '_')
+        # Remove _cleaned suffix for table name
+        return table_name.replace('_cleaned', '')
+
+    def generate_sql(self, df: pd.DataFrame, table_name: str, sql_style: str = 'insert',
+                     batch_size: Optional[int] = None) -> str:
+        """Generate the CREATE TABLE statement and data of a SQL export"""
+        return self.sql_create_table(df, table_name) + self.sql_data(df, table_name, sql_style, batch_size)
+
+    def sql_create_table(self, df: pd.DataFrame, table_name: str) -> str:
+        """Generate the CREATE TABLE statement for a DataFrame"""
+        return create_table_statement(df, table_name)
+
+    def sql_data(self, df: pd.DataFrame, table_name: str, sql_style: str = 'insert',
+                 batch_size: Optional[int] = None) -> str:
+        """Generate multi-row INSERT statements, or a COPY data block for the copy style"""
+        if sql_style == 'copy':
+            return copy_block(df, table_name)
+        if sql_style != 'insert':
+            raise ValueError(f"Unsupported SQL export style: {sql_style}")
+        return insert_statements(df, table_name, batch_size or self.sql_batch_size)
     
     def get_media_type(self, format: str) -> str:
         """Get media type for file format"""
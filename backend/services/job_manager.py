@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, Optional
+from fastapi.encoders import jsonable_encoder
+from models.database import SessionLocal, Job
+from services.worker_pool import WorkerPool
+from utils.cleaning_operations import convert_numpy_types, replace_nan
+
+# Minimum seconds between progress writes for one job
+PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", 0.5))
+# How often the event stream polls a job, and how long it may stay silent
+EVENTS_POLL_INTERVAL = float(os.getenv("JOB_EVENTS_POLL_INTERVAL", 0.5))
+EVENTS_HEARTBEAT = float(os.getenv("JOB_EVENTS_HEARTBEAT", 15))
+
+FINISHED_STATUSES = ("completed", "failed")
+
+
+def update_job(job_id: str, **fields):
+    """Set fields on a job row; safe to call from any worker process"""
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.job_id == job_id).first()
+        for name, value in fields.items():
+            setattr(job, name, value)
+        job.updated_date = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+
+class JobProgress:
+    """Progress callback that saves the latest event on a job row.
+
+    Writes are throttled to one per PROGRESS_INTERVAL, except for the last
+    step of an operation, so fast checks don't flood the database.
+    """
+
+    def __init__(self, job_id: str, total_rows: Optional[int] = None, interval: float = PROGRESS_INTERVAL):
+        self.job_id = job_id
+        self.total_rows = total_rows
+        self.interval = interval
+        self._last_write = None
+
+    def __call__(self, event: Dict):
+        now = time.monotonic()
+        last_step = event.get('step') is not None and event.get('step') == event.get('total_steps')
+        if self._last_write is not None and now - self._last_write < self.interval and not last_step:
+            return
+        self._last_write = now
+        if self.total_rows is not None:
+            event.setdefault('total_rows', self.total_rows)
+        update_job(self.job_id, progress=event)
+
+
+def format_event(event: str, data: Dict, event_id: int) -> str:
+    """Encode one server-sent event"""
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class JobManager:
+    """Runs long operations in the background and tracks them as Job rows,
+    so any worker process can report their status.
+
+    Database calls made from the event loop run on a thread, so polling
+    event streams don't hold up other requests.
+    """
+
+    def __init__(self, pool: WorkerPool):
+        self.pool = pool
+        self._tasks = set()
+
+    async def submit(self, kind: str, file_id: str, func: Callable, *args) -> str:
+        """Queue func(*args, job_id=...) on the worker pool and return the new job id.
+
+        func receives the job id so it can report progress with JobProgress.
+        """
+        job_id = str(uuid.uuid4())
+        await asyncio.to_thread(self._create, job_id, kind, file_id)
+
+        # Keep a reference so the task isn't garbage collected while running
+        task = asyncio.create_task(self._run(job_id, func, *args))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job_id
+
+    @staticmethod
+    def _create(job_id: str, kind: str, file_id: str):
+        db = SessionLocal()
+        try:
+            db.add(Job(job_id=job_id, kind=kind, file_id=file_id, status="queued"))
+            db.commit()
+        finally:
+            db.close()
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        """Return the current state of a job"""
+        return await asyncio.to_thread(self._load, job_id)
+
+    @staticmethod
+    def _load(job_id: str) -> Optional[Dict]:
+        db = SessionLocal()
+        try:
+            job = db.query(Job).filter(Job.job_id == job_id).first()
+            if job is None:
+                return None
+            return {
+                "job_id": job.job_id,
+                "kind": job.kind,
+                "file_id": job.file_id,
+                "status": job.status,
+                "progress": job.progress,
+                "result": job.result,
+                "error_message": job.error_message,
+                "created_date": job.created_date.isoformat(),
+                "updated_date": job.updated_date.isoformat() if job.updated_date else None
+            }
+        finally:
+            db.close()
+
+    async def events(self, job_id: str) -> AsyncIterator[str]:
+        """Stream a job's status and progress changes as server-sent events.
+
+        Sends a ``status`` event when the job starts, a ``progress`` event for
+        every new progress update, and ends with a ``completed`` or ``failed``
+        event carrying the full job. Comment lines keep idle connections open.
+        """
+        event_id = 0
+        last_status = last_progress = None
+        last_sent = time.monotonic()
+        while True:
+            job = await self.get(job_id)
+            if job is None:
+                return
+
+            updates = []
+            if job["status"] in FINISHED_STATUSES:
+                if job["progress"] != last_progress and job["progress"] is not None:
+                    updates.append(("progress", job["progress"]))
+                updates.append((job["status"], job))
+            else:
+                if job["status"] != last_status:
+                    updates.append(("status", {"job_id": job_id, "status": job["status"]}))
+                if job["progress"] != last_progress and job["progress"] is not None:
+                    updates.append(("progress", job["progress"]))
+            last_status, last_progress = job["status"], job["progress"]
+
+            for event, data in updates:
+                event_id += 1
+                yield format_event(event, data, event_id)
+            if job["status"] in FINISHED_STATUSES:
+                return
+
+            now = time.monotonic()
+            if updates:
+                last_sent = now
+            elif now - last_sent >= EVENTS_HEARTBEAT:
+                last_sent = now
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(EVENTS_POLL_INTERVAL)
+
+    async def _run(self, job_id: str, func: Callable, *args):
+        try:
+            await asyncio.to_thread(update_job, job_id, status="running")
+            result = await self.pool.run(func, *args, job_id=job_id)
+            # Results can hold numpy values, NaN and Timestamps, which the JSON column can't store
+            result = jsonable_encoder(replace_nan(convert_numpy_types(result)))
+            await asyncio.to_thread(update_job, job_id, status="completed", result=result)
+        except Exception as e:
+            await asyncio.to_thread(update_job, job_id, status="failed", error_message=str(e))
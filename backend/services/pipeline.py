@@ -0,0 +1,685 @@
+"""CPU-heavy upload, analysis, cleaning and export steps.
+
+These are plain top-level functions that open their own database session,
+so the same code runs inline, on a worker thread or in a worker process.
+"""
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import os
+import threading
+import time
+import traceback
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import pytz
+from services.file_handler import FileHandler
+from services.data_analyzer import DataAnalyzer
+from services.data_profile import DataProfile
+from services.column_accumulators import row_fingerprints
+from utils.row_index import RowHashIndex
+from services.dataset_store import DatasetStore
+from services.analysis_cache import AnalysisCache
+from services.export_cache import ExportCache
+from services.cleaning_memo import CleaningMemo
+from services.job_manager import JobProgress
+from models.database import SessionLocal, FileRecord
+from utils.cleaning_operations import CleaningOperations, replace_nan, convert_numpy_types
+from utils.sampling import StreamSampler, sample_positions
+from utils.metrics import stage
+from utils.dtypes import expand_categoricals, logical_dtypes, memory_usage, plain_memory_usage
+
+file_handler = FileHandler()
+data_analyzer = DataAnalyzer()
+cleaning_ops = CleaningOperations()
+
+# Analysis results of previously seen file contents
+analysis_cache = AnalysisCache(data_analyzer.rules_version)
+
+# Downloads exported from each version of the cleaned data
+export_cache = ExportCache()
+
+# Per-step results of recent cleaning runs, so changing the selection only
+# reruns the steps after the first difference
+cleaning_memo = CleaningMemo()
+
+# Original and cleaned DataFrames as memory-mapped Arrow files shared by all
+# worker processes, with an in-memory cache bounded by DATASET_MEMORY_BUDGET
+dataset_store = DatasetStore()
+
+# Files at least this large (bytes) are analyzed chunk by chunk instead of loaded whole
+CHUNKED_ANALYSIS_THRESHOLD = int(os.getenv("CHUNKED_ANALYSIS_THRESHOLD", 200 * 1024 * 1024))
+ANALYSIS_CHUNK_SIZE = int(os.getenv("ANALYSIS_CHUNK_SIZE", 100000))
+# Rows a fast analysis looks at, picked across the whole file
+ANALYSIS_SAMPLE_ROWS = int(os.getenv("ANALYSIS_SAMPLE_ROWS", 100000))
+
+# Number of issue row-position lists kept for paging through previews
+PREVIEW_CACHE_SIZE = int(os.getenv("PREVIEW_CACHE_SIZE", 32))
+_issue_positions = OrderedDict()
+_issue_positions_lock = threading.Lock()
+
+ist = pytz.timezone('Asia/Kolkata')
+
+
+class PreviewError(ValueError):
+    """A preview request that doesn't match the stored dataset"""
+
+
+def scan_file(file_path: str, sheet: Optional[str] = None, store_key: Optional[str] = None) -> tuple:
+    """Return the first rows and total row count of a file without loading it whole.
+
+    With store_key, the chunks read are also stored as that dataset's parts.
+    """
+    head = None
+    total_rows = 0
+    chunks = file_handler.read_file_chunks(file_path, ANALYSIS_CHUNK_SIZE, sheet)
+    if store_key is not None:
+        chunks = dataset_store.put_parts(store_key, chunks)
+    for chunk in chunks:
+        if head is None:
+            head = chunk.head(20)
+        total_rows += len(chunk)
+    return head, total_rows
+
+
+def dataset_head(key: str, rows: int = 20) -> pd.DataFrame:
+    """Read the first rows of a stored dataset without loading all of it"""
+    table = dataset_store.open_table(key)
+    if table is not None:
+        return table.slice(0, rows).to_pandas()
+    head = dataset_store.take_rows(key, np.arange(rows))
+    if head is not None:
+        return head
+    return dataset_store.get(key).head(rows)
+
+
+def row_index_key(file_id: str) -> str:
+    return f"{file_id}/row_index"
+
+
+def load_row_index(file_id: str) -> Optional[RowHashIndex]:
+    """Row hashes stored for a file's original dataset by its analysis, if any"""
+    table = dataset_store.open_table(row_index_key(file_id))
+    if table is not None:
+        return RowHashIndex(table.column(RowHashIndex.COLUMN).to_numpy())
+    frame = dataset_store.get(row_index_key(file_id))
+    return RowHashIndex.from_frame(frame) if frame is not None else None
+
+
+def sample_dataset(record: FileRecord) -> pd.DataFrame:
+    """Rows picked across a whole file for fast analysis.
+
+    Stored datasets are sampled by position from the memory-mapped file, so
+    only the sampled rows are read. Large uploads stored in parts only
+    convert the sampled rows of each part; files stored neither way are
+    streamed through a StreamSampler.
+    """
+    key = f"{record.file_id}/original"
+    table = dataset_store.open_table(key)
+    if table is not None:
+        positions = sample_positions(table.num_rows, ANALYSIS_SAMPLE_ROWS, data_analyzer.sampling)
+        return table.take(pa.array(positions, type=pa.int64())).to_pandas()
+    df = dataset_store.get(key)
+    if df is not None:
+        return df.iloc[sample_positions(len(df), ANALYSIS_SAMPLE_ROWS, data_analyzer.sampling)]
+    # The same positions a StreamSampler over the file would pick
+    sample = dataset_store.take_rows(key, sample_positions(record.total_rows, ANALYSIS_SAMPLE_ROWS,
+                                                           data_analyzer.sampling))
+    if sample is not None:
+        return sample
+    sampler = StreamSampler(ANALYSIS_SAMPLE_ROWS, data_analyzer.sampling, record.total_rows)
+    for chunk in file_handler.read_file_chunks(record.file_path, ANALYSIS_CHUNK_SIZE, record.sheet_name):
+        sampler.update(chunk)
+    return sampler.sample()
+
+
+def get_dataframe(record: FileRecord) -> pd.DataFrame:
+    """Get the uploaded DataFrame, reading it from disk if it was analyzed in chunks"""
+    df = dataset_store.get(f"{record.file_id}/original")
+    if df is None:
+        df = file_handler.read_file(record.file_path, sheet=record.sheet_name)
+    return df
+
+
+def record_error(file_id: str, message: str):
+    """Mark a file as failed in the database"""
+    db = SessionLocal()
+    try:
+        db_record = db.query(FileRecord).filter(FileRecord.file_id == file_id).first()
+        if db_record:
+            db_record.error_message = message
+            db_record.status = "error"
+            db.commit()
+    finally:
+        db.close()
+
+
+def ingest_upload(file_id: str, filename: str, file_path: str, file_size: int, content_hash: str,
+                  sheet: Optional[str] = None) -> Dict:
+    """Parse a saved upload, store its dataset and record, and build the preview.
+
+    Excel uploads are read from the given worksheet, or the first one.
+    """
+    db = SessionLocal()
+    try:
+        sheets = None
+        if file_handler.is_excel(file_path):
+            sheets = file_handler.sheet_names(file_path)
+            sheet = file_handler.resolve_sheet(sheets, sheet)
+            if sheet != sheets[0]:
+                # Each worksheet is its own dataset with its own analysis
+                content_hash = f"{content_hash}:{sheet}"
+
+        # Identical content uploaded before can reuse its parsed dataset
+        previous = analysis_cache.find_previous_upload(db, content_hash, file_id)
+        dataset_path = None
+        memory = {}
+        if previous is not None:
+            dataset_path = dataset_store.link(f"{previous.file_id}/original", f"{file_id}/original")
+            dataset_store.link(row_index_key(previous.file_id), row_index_key(file_id))
+
+        if dataset_path is not None:
+            head, total_rows = dataset_head(f"{file_id}/original"), previous.total_rows
+        elif file_size >= CHUNKED_ANALYSIS_THRESHOLD:
+            # Large files are analyzed chunk by chunk later; the chunks scanned
+            # here are stored as parts, so previews needn't parse the file again
+            if previous is not None:
+                head, total_rows = next(file_handler.read_file_chunks(file_path, 20, sheet)), previous.total_rows
+            else:
+                head, total_rows = scan_file(file_path, sheet, store_key=f"{file_id}/original")
+                dataset_path = dataset_store.parts_path(f"{file_id}/original")
+        else:
+            df = file_handler.read_file(file_path, sheet=sheet)
+            head, total_rows = df.head(20), len(df)
+            # Footprint with pandas' default dtypes and as stored
+            memory = {"memory_before": plain_memory_usage(df), "memory_after": memory_usage(df)}
+            # Keep the parsed data where any worker can open it
+            dataset_path = dataset_store.put(f"{file_id}/original", df)
+        columns = head.columns.tolist()
+        head_clean = expand_categoricals(head).replace({np.nan: None, np.inf: None, -np.inf: None})
+
+        # Create preview
+        preview = head_clean.to_dict(orient="records")
+
+        # Store in database
+        db_record = FileRecord(
+            file_id=file_id,
+            original_filename=filename,
+            upload_date=datetime.utcnow(),
+            file_size=file_size,
+            total_rows=int(total_rows),
+            total_columns=int(len(columns)),
+            status="uploaded",
+            file_path=file_path,
+            dataset_path=dataset_path,
+            content_hash=content_hash,
+            sheet_name=sheet
+        )
+        db.add(db_record)
+        db.commit()
+
+        return {
+            "file_id": file_id,
+            "filename": filename,
+            "preview": preview,
+            "stats": {
+                "total_rows": int(total_rows),
+                "total_columns": int(len(columns)),
+                "columns": columns,
+                "file_size": file_size,
+                **memory,
+                **({"sheet": sheet, "sheets": sheets} if sheets else {})
+            }
+        }
+    finally:
+        db.close()
+
+
+def analyze_file(file_id: str, fast: bool = False, job_id: Optional[str] = None) -> Dict:
+    """Analyze an uploaded file, or serve the cached analysis of identical content.
+
+    With fast, only a sample of rows across the file is analyzed and each
+    issue carries an estimate of how many rows it affects; sampled results
+    aren't cached. When run as a job, progress is saved on the job after
+    each check.
+    """
+    db = SessionLocal()
+    try:
+        db_record = db.query(FileRecord).filter(FileRecord.file_id == file_id).first()
+        progress = JobProgress(job_id, total_rows=db_record.total_rows) if job_id else None
+
+        # Identical content analyzed by the current rules is served from cache
+        cached = analysis_cache.get(db, db_record.content_hash)
+        if cached is not None:
+            enhanced_issues, stats = cached.issues, cached.stats
+        elif fast:
+            sample = sample_dataset(db_record)
+            # A stored row index counts duplicates exactly, which a sample can't
+            row_index = load_row_index(file_id)
+            duplicate_count = row_index.duplicate_count() if row_index is not None else None
+            enhanced_issues = data_analyzer.analyze_sample(sample, db_record.total_rows, progress=progress,
+                                                           duplicate_count=duplicate_count)
+            stats = {
+                "total_rows": db_record.total_rows,
+                "total_columns": len(sample.columns),
+                "sample_rows": len(sample),
+                "sampling": data_analyzer.sampling,
+                **({"duplicate_rows": duplicate_count} if duplicate_count is not None else {})
+            }
+        else:
+            df = dataset_store.get(f"{file_id}/original")
+            dtypes = None
+
+            # Perform analysis; the row hashes it computes are kept for
+            # duplicate removal and issue previews
+            if df is None:
+                chunks = file_handler.read_file_chunks(db_record.file_path, ANALYSIS_CHUNK_SIZE, db_record.sheet_name)
+                row_hashes = []
+                text_chunks = lambda columns: file_handler.read_file_chunks(
+                    db_record.file_path, ANALYSIS_CHUNK_SIZE, db_record.sheet_name, columns=columns, as_text=True)
+                enhanced_issues, stats = data_analyzer.analyze_chunks(chunks, progress=progress, row_hashes=row_hashes,
+                                                                      total_rows=db_record.total_rows,
+                                                                      text_chunks=text_chunks)
+                row_index = RowHashIndex(np.concatenate(row_hashes) if row_hashes else np.empty(0, dtype=np.uint64))
+            else:
+                # The stats reuse the null masks and row hashes the checks computed
+                profile = DataProfile(df)
+                enhanced_issues = data_analyzer.analyze(df, progress=progress, profile=profile)
+                stats = profile.stats()
+                dtypes = logical_dtypes(df)
+                row_index = profile.row_index
+            dataset_store.put(row_index_key(file_id), row_index.to_frame())
+            analysis_cache.put(db, db_record.content_hash, enhanced_issues, stats, dtypes)
+
+        # Store analysis results
+        db_record.issues = enhanced_issues
+        db_record.issues_found = [
+            {
+                'type': issue['type'],
+                'severity': issue['severity'],
+                'title': issue['title']
+            } for issue in enhanced_issues
+        ]
+        db_record.issues_count = len(enhanced_issues)
+        db_record.status = "analyzed"
+        db.commit()
+
+        return {
+            "file_id": file_id,
+            "issues": enhanced_issues,
+            "stats": stats,
+            "cached": cached is not None,
+            "sampled": fast and cached is None
+        }
+    except Exception as e:
+        db.rollback()
+        record_error(file_id, str(e))
+        raise
+    finally:
+        db.close()
+
+
+def clean_file(file_id: str, selected_issue_ids: List[int], job_id: Optional[str] = None) -> Dict:
+    """Apply the selected cleaning operations and store the cleaned dataset.
+
+    When run as a job, progress is saved on the job after each operation.
+    """
+    db = SessionLocal()
+    try:
+        db_record = db.query(FileRecord).filter(FileRecord.file_id == file_id).first()
+        progress = JobProgress(job_id, total_rows=db_record.total_rows) if job_id else None
+        # Cleaning never modifies the stored frame, so it isn't copied
+        df = get_dataframe(db_record)
+        issues = db_record.issues
+        original_filename = db_record.original_filename
+
+        # Apply cleaning operations, reusing the steps the last run on the
+        # same data and issues started with
+        memo_token = (db_record.content_hash, data_analyzer.rules_version)
+        memo = cleaning_memo.get(file_id, memo_token)
+        cleaned_df, changes = cleaning_ops.apply_cleaning(
+            df,
+            issues,
+            selected_issue_ids,
+            progress=progress,
+            row_index=load_row_index(file_id),
+            memo=memo
+        )
+        cleaning_memo.put(file_id, memo_token, memo)
+
+        # Save cleaned data permanently
+        cleaned_filename = file_handler.save_cleaned_data(
+            cleaned_df,
+            original_filename,
+            file_id
+        )
+
+        # Store cleaned data and update database record; fixes leave text
+        # columns as plain strings, so compact them again first
+        with stage('save', 'dataset', len(cleaned_df)) as record:
+            cleaned_df = file_handler.compact(cleaned_df)
+            db_record.cleaned_dataset_path = dataset_store.put(f"{file_id}/cleaned", cleaned_df)
+            record['rows_out'] = len(cleaned_df)
+        db_record.cleaned_filename = cleaned_filename
+        db_record.cleaned_date = datetime.now(ist)
+        # Exports of the previous cleaning run are stale now
+        db_record.cleaning_version = (db_record.cleaning_version or 0) + 1
+        db_record.rows_removed = changes.get('rows_removed', 0)
+        db_record.values_fixed = changes.get('values_fixed', 0)
+        db_record.columns_renamed = changes.get('columns_renamed', 0)
+        db_record.status = "cleaned"
+        db.commit()
+        export_cache.invalidate(file_id)
+
+        # Get preview of cleaned data
+        preview = file_handler.get_preview(cleaned_df, rows=20)
+        preview = replace_nan(preview)
+
+        return convert_numpy_types({
+            "file_id": file_id,
+            "preview": preview,
+            "changes": changes,
+            "cleaned_filename": cleaned_filename,
+            "stats": {
+                "original_rows": int(len(df)),
+                "cleaned_rows": int(len(cleaned_df)),
+                "rows_removed": int(len(df) - len(cleaned_df))
+            }
+        })
+    except Exception as e:
+        # Log error to database
+        traceback.print_exc()
+        db.rollback()
+        record_error(file_id, str(e))
+        raise
+    finally:
+        db.close()
+
+
+def process_batch_file(file_id: str, filename: str, file_path: str, file_size: int, content_hash: str,
+                       issue_types: List[str]) -> Dict:
+    """Upload, analyze and clean one file of a batch.
+
+    Every found issue of the given types is cleaned. Failures are reported
+    in the result rather than raised, so one bad file doesn't fail the batch.
+    """
+    start = time.perf_counter()
+    result = {"file_id": file_id, "filename": filename, "status": "error"}
+    ingested = False
+    try:
+        upload = ingest_upload(file_id, filename, file_path, file_size, content_hash)
+        ingested = True
+        analysis = analyze_file(file_id)
+        issues = analysis["issues"]
+        result["total_rows"] = upload["stats"]["total_rows"]
+        result["issues_found"] = len(issues)
+        result["issue_types"] = dict(Counter(issue["type"] for issue in issues))
+        result["cached"] = analysis["cached"]
+        result["status"] = "analyzed"
+
+        selected_issue_ids = [issue["id"] for issue in issues if issue["type"] in issue_types]
+        if selected_issue_ids:
+            cleaning = clean_file(file_id, selected_issue_ids)
+            result["cleaned_filename"] = cleaning["cleaned_filename"]
+            result["cleaned_rows"] = cleaning["stats"]["cleaned_rows"]
+            result["changes"] = cleaning["changes"]
+            result["status"] = "cleaned"
+    except Exception as e:
+        traceback.print_exc()
+        result["error"] = str(e)
+        # Without a record nothing refers to the saved file
+        if not ingested and os.path.exists(file_path):
+            os.remove(file_path)
+    result["duration"] = round(time.perf_counter() - start, 3)
+    return convert_numpy_types(result)
+
+
+def summarize_batch(results: List[Dict]) -> Dict:
+    """Totals over the per-file results of a batch"""
+    summary = {
+        "files": len(results),
+        "cleaned": sum(result["status"] == "cleaned" for result in results),
+        "analyzed": sum(result["status"] == "analyzed" for result in results),
+        "failed": sum(result["status"] == "error" for result in results),
+        "total_rows": sum(result.get("total_rows", 0) for result in results),
+        "issues_found": sum(result.get("issues_found", 0) for result in results),
+        "rows_removed": 0,
+        "values_fixed": 0,
+        "columns_renamed": 0,
+        "issue_types": {}
+    }
+    for result in results:
+        for change, count in result.get("changes", {}).items():
+            summary[change] += count
+        for issue_type, count in result.get("issue_types", {}).items():
+            summary["issue_types"][issue_type] = summary["issue_types"].get(issue_type, 0) + count
+    return summary
+
+
+def original_columns(record: FileRecord) -> List:
+    """Column names of an upload, from its stored dataset when there is one"""
+    key = f"{record.file_id}/original"
+    if dataset_store.find(key) or dataset_store.parts_path(key):
+        return dataset_head(key, 0).columns.tolist()
+    return next(file_handler.read_file_chunks(record.file_path, 1, record.sheet_name)).columns.tolist()
+
+
+def explain_cleaning(file_id: str, selected_issue_ids: List[int]) -> Dict:
+    """The cleaning plan for a selection, without running it"""
+    db = SessionLocal()
+    try:
+        db_record = db.query(FileRecord).filter(FileRecord.file_id == file_id).first()
+        columns = original_columns(db_record)
+        has_row_index = dataset_store.find(row_index_key(file_id)) is not None
+        plan = cleaning_ops.explain(columns, db_record.total_rows, db_record.issues, selected_issue_ids, has_row_index)
+        return convert_numpy_types({"file_id": file_id, **plan})
+    finally:
+        db.close()
+
+
+def preview_rows(file_id: str, dataset: str = "original", offset: int = 0, limit: int = 50,
+                 columns: Optional[List[str]] = None, issue_id: Optional[int] = None) -> Dict:
+    """Return one page of rows from the original or cleaned dataset.
+
+    Arrow datasets are sliced straight from the memory-mapped file, so only
+    the requested rows are converted; large uploads stored in parts only
+    open the parts the page falls in. With issue_id, only rows affected by
+    that issue are paged through; their positions are cached per dataset
+    version so paging doesn't rescan the data.
+    """
+    db = SessionLocal()
+    try:
+        db_record = db.query(FileRecord).filter(FileRecord.file_id == file_id).first()
+        key = f"{file_id}/{dataset}"
+        table = dataset_store.open_table(key)
+        parts_key = key if table is None and dataset_store.parts_path(key) else None
+        df = None
+        if table is not None:
+            all_columns = table_columns(table)
+        elif parts_key is not None:
+            all_columns = [str(col) for col in dataset_store.take_rows(key, []).columns]
+        elif dataset == "cleaned":
+            df = dataset_store.get(key)
+            if df is None:
+                raise PreviewError("No cleaned data available")
+        else:
+            df = get_dataframe(db_record)
+        if df is not None:
+            all_columns = [str(col) for col in df.columns]
+        # Identifies this version of the data, for caching issue rows
+        path = dataset_store.find(key) or db_record.file_path
+        version = (path, os.stat(path).st_mtime_ns)
+
+        columns = columns or all_columns
+        unknown = [col for col in columns if col not in all_columns]
+        if unknown:
+            raise PreviewError(f"Unknown columns: {', '.join(unknown)}")
+
+        positions = None
+        if issue_id is not None:
+            issue = next((i for i in (db_record.issues or []) if i['id'] == issue_id), None)
+            if issue is None:
+                raise PreviewError(f"Issue {issue_id} not found")
+            if issue['type'] == 'column_naming':
+                raise PreviewError("Column naming issues don't apply to individual rows")
+            if dataset == "cleaned":
+                # Issues name the original columns, which cleaning may have renamed
+                renamed_from = pd.Index([str(col) for col in original_columns(db_record)])
+                issue = cleaning_ops.current_names(issue, renamed_from, pd.Index(all_columns))
+            # Duplicates in the original data can be found from its stored row hashes
+            row_index = load_row_index(file_id) if dataset == "original" and issue['type'] == 'duplicates' else None
+            positions = issue_positions(version, issue, table, df, row_index, parts_key)
+            total_rows = len(positions)
+            row_numbers = positions[offset:offset + limit]
+        else:
+            if table is not None:
+                total_rows = table.num_rows
+            else:
+                total_rows = db_record.total_rows if parts_key is not None else len(df)
+            row_numbers = np.arange(offset, min(offset + limit, total_rows))
+
+        if table is not None:
+            if positions is None:
+                page = table.slice(offset, limit).select(columns).to_pandas()
+            else:
+                page = table.take(pa.array(row_numbers, type=pa.int64())).select(columns).to_pandas()
+        elif parts_key is not None:
+            page = dataset_store.take_rows(parts_key, row_numbers, columns)
+        else:
+            page = df.iloc[row_numbers]
+            page = page[[col for col in page.columns if str(col) in columns]]
+
+        page = expand_categoricals(page).replace({np.nan: None, np.inf: None, -np.inf: None})
+        return {
+            "file_id": file_id,
+            "dataset": dataset,
+            "offset": offset,
+            "limit": limit,
+            "total_rows": int(total_rows),
+            "columns": columns,
+            "row_numbers": [int(i) for i in row_numbers],
+            "rows": convert_numpy_types(page.to_dict(orient="records"))
+        }
+    finally:
+        db.close()
+
+
+def table_columns(table: pa.Table) -> List[str]:
+    """Data column names of a stored table, without the saved DataFrame index"""
+    metadata = table.schema.pandas_metadata or {}
+    index_columns = [col for col in metadata.get('index_columns', []) if isinstance(col, str)]
+    return [name for name in table.column_names if name not in index_columns]
+
+
+def issue_positions(version: tuple, issue: Dict, table, df: Optional[pd.DataFrame],
+                    row_index: Optional[RowHashIndex] = None, parts_key: Optional[str] = None) -> np.ndarray:
+    """Positions of the rows affected by an issue, cached per dataset version.
+
+    The rows come from table, df, or the dataset stored in parts under
+    parts_key, whichever is given.
+    """
+    cache_key = version + (issue['id'],)
+    with _issue_positions_lock:
+        if cache_key in _issue_positions:
+            _issue_positions.move_to_end(cache_key)
+            return _issue_positions[cache_key]
+
+    if table is not None:
+        num_rows = table.num_rows
+    elif df is not None:
+        num_rows = len(df)
+    else:
+        # Parts and row index were both built from the file's chunks
+        num_rows = len(row_index) if row_index is not None else None
+    if row_index is not None and len(row_index) == num_rows:
+        # Only rows sharing a hash can be duplicates, so only those are loaded
+        candidates = row_index.candidates()
+        if table is not None:
+            rows = table.take(pa.array(candidates, type=pa.int64())).to_pandas()
+        elif df is not None:
+            rows = df.iloc[candidates]
+        else:
+            # Parts keep each chunk's dtypes, so rows are compared as the analysis hashed them
+            rows = pd.Series(row_fingerprints(dataset_store.take_rows(parts_key, candidates)))
+        positions = candidates[rows.duplicated().to_numpy()]
+    else:
+        # Only load the columns the issue looks at
+        needed = data_analyzer.issue_columns(issue)
+        if table is not None:
+            if needed is not None:
+                needed = [col for col in needed if col in table.column_names]
+                df = table.select(needed).to_pandas()
+            else:
+                df = table.to_pandas()
+        elif df is None:
+            if needed is not None:
+                available = [str(col) for col in dataset_store.take_rows(parts_key, []).columns]
+                needed = [col for col in needed if col in available]
+            df = pd.concat(dataset_store.iter_parts(parts_key, needed))
+        positions = np.flatnonzero(data_analyzer.issue_rows(df, issue))
+
+    with _issue_positions_lock:
+        _issue_positions[cache_key] = positions
+        while len(_issue_positions) > PREVIEW_CACHE_SIZE:
+            _issue_positions.popitem(last=False)
+    return positions
+
+
+def export_variant(format: str, compress: bool = False, sql_style: str = 'insert',
+                   batch_size: Optional[int] = None) -> str:
+    """Cache variant name for a download request"""
+    return export_cache.variant(format, compress, sql_style, batch_size or file_handler.sql_batch_size)
+
+
+def download_filename(cleaned_filename: str, format: str, compress: bool = False) -> str:
+    """Filename a download is saved under"""
+    base_name = os.path.splitext(cleaned_filename)[0]
+    return f"{base_name}.{format.lower()}" + (".gz" if compress else "")
+
+
+def find_export(file_id: str, cleaned_filename: str, version: int, format: str, variant: str) -> Optional[str]:
+    """Path of an existing export of this cleaning version, if there is one"""
+    # The copy /clean saved already is the CSV or XLSX export
+    if variant == os.path.splitext(cleaned_filename)[1].lower().lstrip('.') and variant in ('csv', 'xlsx'):
+        path = os.path.join(file_handler.cleaned_dir, cleaned_filename)
+        if os.path.exists(path):
+            return path
+    return export_cache.get(file_id, version, variant)
+
+
+def export_file(file_id: str, format: str, cleaned_filename: str, version: int = 0, sql_style: str = 'insert',
+                batch_size: Optional[int] = None) -> Optional[Tuple[str, str]]:
+    """Export the cleaned dataset into the export cache and return its path and download filename"""
+    cleaned_df = dataset_store.get(f"{file_id}/cleaned")
+    if cleaned_df is None:
+        return None
+
+    # Export to requested format
+    output_path = file_handler.export_data(
+        cleaned_df,
+        format,
+        cleaned_filename,
+        sql_style,
+        batch_size
+    )
+    variant = export_variant(format, False, sql_style, batch_size)
+    output_path = export_cache.put(file_id, version, variant, output_path)
+    return output_path, download_filename(cleaned_filename, format)
+
+
+def stream_export(file_id: str, format: str, cleaned_filename: str, version: int = 0, compress: bool = False,
+                  sql_style: str = 'insert', batch_size: Optional[int] = None) -> Optional[Tuple[Iterator[bytes], str]]:
+    """Return a chunked byte stream of the cleaned dataset and its download filename.
+
+    The stream is saved to the export cache as it is sent.
+    """
+    key = f"{file_id}/cleaned"
+    if key not in dataset_store:
+        return None
+
+    chunks = dataset_store.iter_chunks(key, file_handler.export_chunk_rows)
+    stream = file_handler.stream_export(chunks, format, cleaned_filename, compress, sql_style, batch_size)
+    variant = export_variant(format, compress, sql_style, batch_size)
+    stream = export_cache.tee(file_id, version, variant, stream)
+    return stream, download_filename(cleaned_filename, format, compress)
@@ -0,0 +1,60 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+from utils.metrics import metrics, run_collected
+
+
+def _init_worker_process():
+    """Drop database connections inherited from the parent process"""
+    from models.database import engine
+    engine.dispose(close=False)
+
+
+class WorkerPool:
+    """Runs blocking pandas work off the event loop on a thread or process pool.
+
+    Configured with WORKER_POOL_TYPE ("thread" or "process") and
+    WORKER_POOL_SIZE. Process pools need module-level functions with
+    picklable arguments.
+    """
+
+    def __init__(self, kind: Optional[str] = None, size: Optional[int] = None):
+        self.kind = (kind or os.getenv("WORKER_POOL_TYPE", "thread")).lower()
+        if self.kind not in ("thread", "process"):
+            raise ValueError(f"Unsupported worker pool type: {self.kind}")
+        self.size = size or int(os.getenv("WORKER_POOL_SIZE", os.cpu_count() or 4))
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.size, initializer=_init_worker_process)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="worker")
+            return self._executor
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Run func(*args, **kwargs) in the pool and await its result"""
+        result, _ = await self.run_timed(func, *args, **kwargs)
+        return result
+
+    async def run_timed(self, func: Callable, *args, **kwargs) -> Tuple[object, List[Dict]]:
+        """Run func in the pool and await its result with the stages it recorded (see utils.metrics)"""
+        loop = asyncio.get_running_loop()
+        result, stages = await loop.run_in_executor(self.executor, partial(run_collected, func, *args, **kwargs))
+        if self.kind == "process":
+            # Worker processes record into their own metrics, which /metrics doesn't see
+            metrics.observe_all(stages)
+        return result, stages
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,240 @@
+import os
+import re
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+from services import data_analyzer
+from services.data_analyzer import DataAnalyzer
+
+# The detectors as they were before the vectorized checks, copied unchanged
+# with the sample sizes and email pattern they used
+DATE_SAMPLE_SIZE = 100
+PHONE_SAMPLE_SIZE = 50
+EMAIL_PATTERN = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+
+
+class OriginalDetectors(DataAnalyzer):
+    """The per-value format checks the vectorized ones replaced, kept as the reference"""
+
+    def check_date_formats(self, df: pd.DataFrame) -> List[Dict]:
+        """Check for date format inconsistencies"""
+        issues = []
+        
+        for col in df.columns:
+            if self.is_potential_date_column(col):
+                date_formats = self.detect_date_formats(df[col])
+                if len(date_formats) > 1:
+                    issues.append(self._date_format_issue(col, date_formats))
+        
+        return issues
+
+    def detect_date_formats(self, series: pd.Series) -> set:
+        """Detect different date formats in a series"""
+        formats = set()
+        
+        for val in series.dropna().head(DATE_SAMPLE_SIZE):
+            val_str = str(val)
+            
+            # Check various date patterns
+            if re.match(r'\d{4}[-/]\d{1,2}[-/]\d{1,2}', val_str):
+                formats.add('YYYY-MM-DD or YYYY/MM/DD')
+            elif re.match(r'\d{1,2}[-/]\d{1,2}[-/]\d{4}', val_str):
+                formats.add('DD-MM-YYYY or MM-DD-YYYY')
+            elif re.match(r'\w{3}\s+\d{1,2},?\s+\d{4}', val_str):
+                formats.add('Mon DD, YYYY')
+            elif re.match(r'\d{1,2}\s+\w+\s+\d{4}', val_str):
+                formats.add('DD Month YYYY')
+        
+        return formats
+
+    def check_phone_formats(self, df: pd.DataFrame) -> List[Dict]:
+        """Check for phone number format inconsistencies"""
+        issues = []
+        
+        for col in df.columns:
+            if self.is_potential_phone_column(col):
+                formats = self.detect_phone_formats(df[col])
+                if len(formats) > 1:
+                    issues.append(self._phone_format_issue(col, formats))
+        
+        return issues
+
+    def detect_phone_formats(self, series: pd.Series) -> set:
+        """Detect different phone number formats"""
+        formats = set()
+        
+        for val in series.dropna().head(PHONE_SAMPLE_SIZE):
+            val_str = str(val)
+            
+            if re.match(r'\d{3}-\d{3}-\d{4}', val_str):
+                formats.add('XXX-XXX-XXXX')
+            elif re.match(r'\(\d{3}\)\s*\d{3}-\d{4}', val_str):
+                formats.add('(XXX) XXX-XXXX')
+            elif re.match(r'\d{10}', val_str):
+                formats.add('XXXXXXXXXX')
+            elif re.match(r'\d{3}\s+\d{3}\s+\d{4}', val_str):
+                formats.add('XXX XXX XXXX')
+        
+        return formats
+
+    def check_email_formats(self, df: pd.DataFrame) -> List[Dict]:
+        """Check for invalid email formats"""
+        issues = []
+        
+        for col in df.columns:
+            if self.is_potential_email_column(col):
+                invalid_emails = []
+                for val in df[col].dropna():
+                    if not re.match(EMAIL_PATTERN, str(val)):
+                        invalid_emails.append(str(val))
+                
+                if len(invalid_emails) > 0:
+                    issues.append(self._email_issue(col, len(invalid_emails), invalid_emails[:3]))
+        
+        return issues
+
+
+def comparable(issues: list) -> list:
+    """Issues without their ids, with format examples as sets since they come from a set"""
+    result = []
+    for issue in issues:
+        issue = {key: value for key, value in issue.items() if key != 'id'}
+        if issue['type'] in ('date_format', 'phone_format'):
+            issue['examples'] = set(issue['examples'])
+        result.append(issue)
+    return result
+
+
+def random_frame(rng: np.random.Generator, rows: int) -> pd.DataFrame:
+    """Columns mixing valid, malformed, numeric and missing values"""
+    dates = np.array(['2023-01-05', '2023/1/5', '01/05/2023', '5-1-2023', 'Jan 5, 2023', 'Jan  5 2023',
+                      '5 January 2023', 'yesterday', '20230105', ''], dtype=object)
+    phones = np.array(['555-123-4567', '(555) 123-4567', '(555)123-4567', '5551234567', '555 123 4567',
+                       '+1 555.123.4567', '555-1234', 'n/a', ' 555-123-4567'], dtype=object)
+    emails = np.array(['a.b@example.com', 'A+tag@mail.co.uk', 'bad at example.com', 'x@@y.com', 'no-tld@host',
+                       ' padded@example.com', 'ok@example.org', ''], dtype=object)
+    others = np.array([5551234567, 1.5, 20230105, True, None, np.nan, 'text'], dtype=object)
+
+    def column(pool: np.ndarray) -> np.ndarray:
+        values = pool[rng.integers(0, len(pool), rows)]
+        mixed = rng.random(rows) < 0.2
+        values[mixed] = others[rng.integers(0, len(others), int(mixed.sum()))]
+        values[rng.random(rows) < 0.1] = None
+        return values
+
+    return pd.DataFrame({
+        'order_date': column(dates),
+        'Phone Number': column(phones),
+        'email': column(emails),
+        'contact email': pd.Series(emails[rng.integers(0, len(emails), rows)]),
+    })
+
+
+class DetectorParityTest(unittest.TestCase):
+    """With the original sample sizes and first-values sampling, the vectorized checks report exactly what the loops did"""
+
+    def setUp(self):
+        sizes = mock.patch.multiple(data_analyzer, DATE_SAMPLE_SIZE=DATE_SAMPLE_SIZE, PHONE_SAMPLE_SIZE=PHONE_SAMPLE_SIZE)
+        sizes.start()
+        self.addCleanup(sizes.stop)
+        # The loops looked at the first values, which "head" sampling reproduces
+        self.analyzer = DataAnalyzer(sampling='head')
+        self.original = OriginalDetectors()
+
+    def assert_same_formats(self, series: pd.Series):
+        self.assertEqual(self.analyzer.detect_date_formats(series), self.original.detect_date_formats(series))
+        self.assertEqual(self.analyzer.detect_phone_formats(series), self.original.detect_phone_formats(series))
+
+    def assert_same_issues(self, df: pd.DataFrame):
+        for check in ('check_date_formats', 'check_phone_formats', 'check_email_formats'):
+            self.assertEqual(comparable(getattr(self.analyzer, check)(df)),
+                             comparable(getattr(self.original, check)(df)), check)
+
+    def test_every_format(self):
+        series = pd.Series(['2023-01-05', '2023/1/5', '01/05/2023', 'Jan 5, 2023', '5 January 2023',
+                            '555-123-4567', '(555) 123-4567', '5551234567', '555 123 4567', 'nothing'])
+        self.assert_same_formats(series)
+
+    def test_missing_values(self):
+        series = pd.Series([None, '2023-01-05', np.nan, '01/05/2023', None, '555-123-4567', pd.NA], dtype=object)
+        self.assert_same_formats(series)
+        self.assert_same_issues(pd.DataFrame({
+            'date': series, 'phone': series, 'email': pd.Series([None, 'a@b.com', np.nan, 'bad'], dtype=object),
+        }))
+
+    def test_mixed_types(self):
+        series = pd.Series([5551234567, 20230105, 1.5, True, '2023-01-05', 'Jan 5, 2023', '(555) 123-4567',
+                            pd.Timestamp('2023-01-05'), b'555-123-4567', None], dtype=object)
+        self.assert_same_formats(series)
+        self.assert_same_issues(pd.DataFrame({'date': series, 'phone': series, 'email': series}))
+
+    def test_numeric_columns(self):
+        self.assert_same_formats(pd.Series([5551234567, 5559876543, 20230105]))
+        self.assert_same_formats(pd.Series([5551234567.0, np.nan, 1.5]))
+        self.assert_same_issues(pd.DataFrame({
+            'phone': [5551234567, 5559876543, 1234], 'email': [1.0, np.nan, 2.5], 'date': [20230105, 1, 2],
+        }))
+
+    def test_empty_columns(self):
+        for series in (pd.Series([], dtype=object), pd.Series([], dtype='float64'),
+                       pd.Series([None, None], dtype=object), pd.Series([np.nan, np.nan])):
+            self.assert_same_formats(series)
+            self.assert_same_issues(pd.DataFrame({'date': series, 'phone': series, 'email': series}))
+        self.assert_same_issues(pd.DataFrame(columns=['date', 'phone', 'email']))
+
+    def test_sample_size(self):
+        # Past the original sample sizes, only the first values count
+        dates = pd.Series(['2023-01-05'] * DATE_SAMPLE_SIZE + ['Jan 5, 2023'] * 10)
+        phones = pd.Series(['555-123-4567'] * PHONE_SAMPLE_SIZE + ['5551234567'] * 10)
+        self.assert_same_formats(dates)
+        self.assert_same_formats(phones)
+        self.assertEqual(self.analyzer.detect_date_formats(dates), {'YYYY-MM-DD or YYYY/MM/DD'})
+        self.assert_same_issues(pd.DataFrame({'date': dates, 'phone': phones.reindex(dates.index)}))
+
+    def test_categorical_columns(self):
+        series = pd.Series(['2023-01-05', '01/05/2023', None, 'a@b.com', 'bad'], dtype='category')
+        self.assert_same_formats(series)
+        self.assert_same_issues(pd.DataFrame({'date': series, 'phone': series, 'email': series}))
+
+    def test_random_frames(self):
+        rng = np.random.default_rng(0)
+        for rows in (0, 1, 7, 50, 300, 2500):
+            df = random_frame(rng, rows)
+            for col in df.columns:
+                self.assert_same_formats(df[col])
+            self.assert_same_issues(df)
+
+
+class DeliberateChangesTest(unittest.TestCase):
+    """Where the current checks knowingly differ from the original detectors"""
+
+    def setUp(self):
+        self.original = OriginalDetectors()
+
+    def test_larger_sample_sizes(self):
+        # Formats are now checked on up to 1000 values instead of the first 100 dates and 50 phones
+        self.assertEqual((data_analyzer.DATE_SAMPLE_SIZE, data_analyzer.PHONE_SAMPLE_SIZE), (1000, 1000))
+        dates = pd.Series(['2023-01-05'] * 500 + ['Jan 5, 2023'] * 10)
+        phones = pd.Series(['555-123-4567'] * 500 + ['5551234567'] * 10)
+        analyzer = DataAnalyzer(sampling='head')
+        self.assertEqual(self.original.detect_date_formats(dates), {'YYYY-MM-DD or YYYY/MM/DD'})
+        self.assertEqual(analyzer.detect_date_formats(dates), {'YYYY-MM-DD or YYYY/MM/DD', 'Mon DD, YYYY'})
+        self.assertEqual(self.original.detect_phone_formats(phones), {'XXX-XXX-XXXX'})
+        self.assertEqual(analyzer.detect_phone_formats(phones), {'XXX-XXX-XXXX', 'XXXXXXXXXX'})
+
+    def test_stratified_sampling_by_default(self):
+        # The default sample is spread over the whole column rather than taken from its start
+        with mock.patch.dict(os.environ):
+            os.environ.pop('ANALYSIS_SAMPLING', None)
+            analyzer = DataAnalyzer()
+        self.assertEqual(analyzer.sampling, 'stratified')
+        dates = pd.Series(['2023-01-05'] * 20000 + ['Jan 5, 2023'] * 2000)
+        self.assertEqual(self.original.detect_date_formats(dates), {'YYYY-MM-DD or YYYY/MM/DD'})
+        self.assertEqual(DataAnalyzer(sampling='head').detect_date_formats(dates), {'YYYY-MM-DD or YYYY/MM/DD'})
+        self.assertEqual(analyzer.detect_date_formats(dates), {'YYYY-MM-DD or YYYY/MM/DD', 'Mon DD, YYYY'})
+
+
+if __name__ == '__main__':
+    unittest.main()
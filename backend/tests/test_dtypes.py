@@ -0,0 +1,38 @@
+import unittest
+import numpy as np
+import pandas as pd
+from services.file_handler import FileHandler
+from utils.dtypes import logical_dtypes, optimize_dtypes
+
+
+class LogicalDtypesTest(unittest.TestCase):
+    """Compact storage dtypes are reported as the dtypes the file was read with"""
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'id': np.arange(1, 101, dtype='int64'),
+            'big': np.arange(100, dtype='uint64') * 1000,
+            'price': np.linspace(0, 1, 100),
+            'city': ['Berlin', 'Paris', None, 'Rome'] * 25,
+            'active': [True, False] * 50,
+            'when': pd.date_range('2023-01-01', periods=100),
+        })
+        self.optimized = optimize_dtypes(self.df)
+
+    def test_optimized_frame_reports_original_dtypes(self):
+        self.assertEqual(str(self.optimized['id'].dtype), 'int8')
+        self.assertIsInstance(self.optimized['city'].dtype, pd.CategoricalDtype)
+        self.assertEqual(logical_dtypes(self.optimized), self.df.dtypes.astype(str).to_dict())
+
+    def test_preview(self):
+        preview = FileHandler().get_preview(self.optimized, rows=5)
+        self.assertEqual(preview['dtypes'], self.df.dtypes.astype(str).to_dict())
+        self.assertEqual(preview['rows'], FileHandler().get_preview(self.df, rows=5)['rows'])
+
+    def test_non_string_categoricals_keep_their_dtype(self):
+        df = pd.DataFrame({'size': pd.Categorical([1, 2, 1])})
+        self.assertEqual(logical_dtypes(df), {'size': 'category'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from services.file_handler import FileHandler
+
+
+class JsonExportTest(unittest.TestCase):
+    """Saved and streamed JSON exports are byte for byte the same"""
+
+    def setUp(self):
+        self.file_handler = FileHandler()
+        self.file_handler.cleaned_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.file_handler.cleaned_dir)
+        self.file_handler.export_chunk_rows = 7
+
+    def assert_same_bytes(self, df: pd.DataFrame):
+        path = self.file_handler.export_data(df, 'json', 'orders_cleaned.csv')
+        with open(path, 'rb') as f:
+            saved = f.read()
+        streamed = b''.join(self.file_handler.stream_export(self.file_handler.frame_chunks(df), 'json',
+                                                            'orders_cleaned.csv'))
+        self.assertEqual(saved, streamed)
+
+    def test_several_chunks(self):
+        self.assert_same_bytes(pd.DataFrame({
+            'id': range(30), 'city': ['Berlin', None, 'Zürich'] * 10, 'when': pd.date_range('2023-01-01', periods=30),
+        }))
+
+    def test_empty_and_missing(self):
+        self.assert_same_bytes(pd.DataFrame(columns=['id']))
+        self.assert_same_bytes(pd.DataFrame({'price': [np.nan, 1.5]}))
+
+
+if __name__ == '__main__':
+    unittest.main()
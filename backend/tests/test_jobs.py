@@ -0,0 +1,57 @@
+import io
+import os
+import tempfile
+import time
+import unittest
+import pandas as pd
+
+# The app reads its settings on import, so point it at scratch storage first
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_tmp, 'jobs.db')}")
+for _name in ('UPLOAD_DIR', 'CLEANED_DIR', 'DATASET_DIR', 'EXPORT_CACHE_DIR'):
+    os.environ.setdefault(_name, os.path.join(_tmp, _name.lower()))
+
+from fastapi.testclient import TestClient
+import main
+
+
+class BackgroundJobTest(unittest.TestCase):
+    """Background jobs finish with a JSON result, whatever the data holds"""
+
+    def wait(self, client: TestClient, job_id: str) -> dict:
+        for _ in range(100):
+            job = client.get(f"/api/v1/jobs/{job_id}").json()
+            if job['status'] in ('completed', 'failed'):
+                return job
+            time.sleep(0.05)
+        self.fail(f"Job {job_id} didn't finish")
+
+    def test_clean_file_with_dates(self):
+        df = pd.DataFrame({
+            'Order Date': pd.to_datetime(['2023-01-05', '2023-02-01', '2023-02-01', '2023-03-09']),
+            ' Name ': [' a', 'b', 'b', 'c'],
+        })
+        buffer = io.BytesIO()
+        df.to_excel(buffer, index=False)
+
+        with TestClient(main.app) as client:
+            upload = client.post('/api/v1/upload', files={'file': ('dates.xlsx', buffer.getvalue(), 'application/octet-stream')})
+            file_id = upload.json()['file_id']
+            issues = client.post(f'/api/v1/analyze/{file_id}').json()['issues']
+            response = client.post(f'/api/v1/clean/{file_id}?background=true',
+                                   json={'selected_issues': [issue['id'] for issue in issues]})
+            self.assertEqual(response.status_code, 202)
+            job_id = response.json()['job_id']
+
+            job = self.wait(client, job_id)
+            self.assertEqual(job['status'], 'completed', job['error_message'])
+            rows = job['result']['preview']['rows']
+            self.assertEqual(rows[0][0], '2023-01-05T00:00:00')
+            self.assertEqual(len(rows), 3)
+
+            events = client.get(f'/api/v1/jobs/{job_id}/events').text
+            self.assertIn('event: completed', events)
+
+
+if __name__ == '__main__':
+    unittest.main()
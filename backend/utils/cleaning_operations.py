@@ -1,68 +1,177 @@
 import pandas as pd
-import re
-from typing import List, Dict, Tuple
+import logging
+import time
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 import numpy as np
+from utils.date_parsing import normalize_dates
+from utils.metrics import stage
+from utils.progress import ProgressCallback, report_progress
+from utils.dtypes import is_text_dtype
+from utils.row_index import RowHashIndex
+from utils.cleaning_plan import VALUE_FIXES, plan_cleaning, estimate_plan, in_issue_order, explain_plan
+
+logger = logging.getLogger(__name__)
+
 
 class CleaningOperations:
+    # Issue types apply_cleaning can fix
+    ISSUE_TYPES = ('column_naming', 'date_format', 'duplicates', 'phone_format', 'whitespace', 'missing_values')
+    # Fixes that rewrite values, after which stored row hashes no longer match
+    VALUE_FIXES = VALUE_FIXES
+
     def remove_empty_rows(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
         """Remove rows where all columns are empty (NaN or empty string)"""
         original_count = len(df)
-        # Consider both NaN and empty string as empty
-        mask = df.apply(lambda row: row.isna().all() or all((str(x).strip() == '' or pd.isna(x)) for x in row), axis=1)
+        if len(df.columns) == 0:
+            return df, 0
+        # Consider both NaN and empty string as empty, one column at a time
+        mask = np.ones(original_count, dtype=bool)
+        for i in range(len(df.columns)):
+            col = df.iloc[:, i]
+            empty = col.isna().to_numpy()
+            if is_text_dtype(col.dtype):
+                empty = empty | col.astype(str).str.strip().eq('').to_numpy()
+            mask &= empty
+            # Most rows have a value in the first columns, so stop once none can be empty
+            if not mask.any():
+                return df, 0
         df = df[~mask]
         removed_count = original_count - len(df)
         return df, removed_count
-    def apply_cleaning(self, df: pd.DataFrame, issues: List[Dict], selected_issue_ids: List[int]) -> Tuple[pd.DataFrame, Dict]:
-        """Apply selected cleaning operations"""
-        cleaned_df = df.copy()
+    
+    def apply_cleaning(self, df: pd.DataFrame, issues: List[Dict], selected_issue_ids: List[int],
+                       progress: Optional[ProgressCallback] = None,
+                       row_index: Optional[RowHashIndex] = None,
+                       memo: Optional[List[tuple]] = None) -> Tuple[pd.DataFrame, Dict]:
+        """Apply selected cleaning operations in planned order, reporting each finished step to progress.
+
+        The plan (see plan_cleaning) drops rows before fixing values and gives
+        the same data as applying the issues in order. row_index, the stored
+        row hashes of df, lets duplicate removal skip hashing as long as no
+        earlier step rewrote values. memo holds (step, frame, changes) after
+        each step of an earlier run on the same df and issues; the steps both
+        plans start with are reused from it, and it is rewritten to this
+        run's steps. The result shares unchanged columns with df and the
+        memo, so it must not be modified in place.
+        """
+        start = time.perf_counter()
+        # Operations replace the columns they fix instead of writing into
+        # them, so a shallow copy keeps df unchanged
+        cleaned_df = df.copy(deep=False)
+        if row_index is not None and not row_index.covers(cleaned_df):
+            row_index = None
         changes = {
             'rows_removed': 0,
             'values_fixed': 0,
             'columns_renamed': 0
         }
-        
-        # Filter selected issues
-        selected_issues = [issue for issue in issues if issue['id'] in selected_issue_ids]
-        
-        for issue in selected_issues:
-            issue_type = issue['type']
+        plan = plan_cleaning(list(df.columns), len(df), issues, selected_issue_ids, row_index is not None)
 
-            if issue_type == 'column_naming':
-                cleaned_df, renamed_count = self.fix_column_names(cleaned_df, issue)
-                changes['columns_renamed'] += renamed_count
+        # Resume after the steps this run has in common with the memoized one
+        reused = 0
+        if memo is not None:
+            while reused < min(len(memo), len(plan)) and memo[reused][0] == plan[reused]['key']:
+                reused += 1
+            del memo[reused:]
+            if reused:
+                cleaned_df, changes = memo[-1][1].copy(deep=False), dict(memo[-1][2])
 
-            elif issue_type == 'date_format':
-                cleaned_df, fixed_count = self.fix_date_formats(cleaned_df, issue)
-                changes['values_fixed'] += fixed_count
+        for step_number, step in enumerate(plan, 1):
+            operation = '+'.join(issue['type'] for issue in step['issues']) if step['operation'] == 'fix_column' else step['operation']
+            if step_number > reused:
+                with stage('clean', operation, len(cleaned_df), column=step['column']) as record:
+                    cleaned_df = self.apply_step(cleaned_df, step, changes, df.columns, row_index)
+                    record['rows_out'] = len(cleaned_df)
+                if memo is not None:
+                    memo.append((step['key'], cleaned_df.copy(deep=False), dict(changes)))
 
-            elif issue_type == 'duplicates':
-                cleaned_df, removed_count = self.remove_duplicates(cleaned_df)
-                changes['rows_removed'] += removed_count
+            if any(issue['type'] in self.VALUE_FIXES for issue in step['issues']):
+                row_index = None
 
-            elif issue_type == 'phone_format':
-                cleaned_df, fixed_count = self.fix_phone_formats(cleaned_df, issue)
-                changes['values_fixed'] += fixed_count
+            report_progress(progress, start, stage='clean', operation=operation, column=step['column'],
+                            step=step_number, total_steps=len(plan), rows_processed=len(df),
+                            rows_remaining=len(cleaned_df))
 
-            elif issue_type == 'whitespace':
-                cleaned_df, fixed_count = self.fix_whitespace(cleaned_df, issue)
-                changes['values_fixed'] += fixed_count
+        return cleaned_df, changes
 
-            elif issue_type == 'missing_values':
-                cleaned_df, removed_count = self.handle_missing_values(cleaned_df)
-                changes['rows_removed'] += removed_count
+    def explain(self, columns: List, total_rows: int, issues: List[Dict], selected_issue_ids: List[int],
+                has_row_index: bool = False) -> Dict:
+        """Planned cleaning steps with their estimated rows and cost, next to the cost of issue order"""
+        plan = plan_cleaning(columns, total_rows, issues, selected_issue_ids, has_row_index)
+        baseline = estimate_plan(in_issue_order(issues, selected_issue_ids), len(columns), total_rows, has_row_index)
+        return explain_plan(plan, baseline)
 
-        # Always remove rows where all columns are empty (NaN or empty string)
-        cleaned_df, removed_empty = self.remove_empty_rows(cleaned_df)
-        changes['rows_removed'] += removed_empty
+    def apply_step(self, df: pd.DataFrame, step: Dict, changes: Dict, original_columns: pd.Index,
+                   row_index: Optional[RowHashIndex] = None) -> pd.DataFrame:
+        """Run one planned step, adding what changed to changes"""
+        if step['operation'] == 'remove_empty_rows':
+            df, removed_empty = self.remove_empty_rows(df)
+            changes['rows_removed'] += removed_empty
+        elif step['operation'] == 'duplicates':
+            df = self.apply_issue(df, step['issues'][0], changes, row_index)
+        else:
+            for issue in step['issues']:
+                df = self.apply_issue(df, self.current_names(issue, original_columns, df.columns), changes)
+        return df
 
-        return cleaned_df, changes
-    
+    def current_names(self, issue: Dict, original_columns: pd.Index, columns: pd.Index) -> Dict:
+        """Issue naming its columns as they are called after earlier renames.
+
+        Renames keep every column in place, so a column is found by its
+        position among the columns the issue was found in.
+        """
+        if issue['type'] == 'column_naming':
+            return issue
+
+        def rename(column):
+            matches = np.flatnonzero(original_columns == column) if column is not None else []
+            return columns[matches[0]] if len(matches) else column
+
+        if 'column' in issue:
+            return dict(issue, column=rename(issue['column']))
+        if isinstance(issue.get('columns'), dict):
+            # Missing values are counted per column
+            return dict(issue, columns={rename(column): count for column, count in issue['columns'].items()})
+        if 'columns' in issue:
+            return dict(issue, columns=[rename(column) for column in issue['columns']])
+        return issue
+
+    def apply_issue(self, df: pd.DataFrame, issue: Dict, changes: Dict,
+                    row_index: Optional[RowHashIndex] = None) -> pd.DataFrame:
+        """Fix one issue, adding what changed to changes"""
+        issue_type = issue['type']
+
+        if issue_type == 'column_naming':
+            df, renamed_count = self.fix_column_names(df, issue)
+            changes['columns_renamed'] += renamed_count
+
+        elif issue_type == 'date_format':
+            df, fixed_count = self.fix_date_formats(df, issue)
+            changes['values_fixed'] += fixed_count
+
+        elif issue_type == 'duplicates':
+            df, removed_count = self.remove_duplicates(df, row_index)
+            changes['rows_removed'] += removed_count
+
+        elif issue_type == 'phone_format':
+            df, fixed_count = self.fix_phone_formats(df, issue)
+            changes['values_fixed'] += fixed_count
+
+        elif issue_type == 'whitespace':
+            df, fixed_count = self.fix_whitespace(df, issue)
+            changes['values_fixed'] += fixed_count
+
+        elif issue_type == 'missing_values':
+            df, removed_count = self.handle_missing_values(df)
+            changes['rows_removed'] += removed_count
+
+        return df
     
     def fix_column_names(self, df: pd.DataFrame, issue: Dict) -> Tuple[pd.DataFrame, int]:
         """Rename columns according to suggestions"""
         rename_map = {s['from']: s['to'] for s in issue.get('suggestions', [])}
-        df = df.rename(columns=rename_map)
+        df = df.rename(columns=rename_map, copy=False)
         return df, len(rename_map)
     
     def fix_date_formats(self, df: pd.DataFrame, issue: Dict) -> Tuple[pd.DataFrame, int]:
@@ -71,27 +180,16 @@ class CleaningOperations:
         if not column:
             return df, 0
         
-        fixed_count = 0
-        def parse_date(val):
-            nonlocal fixed_count
-            if pd.isna(val):
-                return val
-            
-            try:
-                # Try parsing various formats
-                parsed_date = pd.to_datetime(val, infer_datetime_format=True)
-                fixed_count += 1
-                return parsed_date.strftime('%Y-%m-%d')
-            except:
-                return val
-        
-        df[column] = df[column].apply(parse_date)
+        df[column], fixed_count = normalize_dates(df[column])
         return df, fixed_count
     
-    def remove_duplicates(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
-        """Remove duplicate rows"""
+    def remove_duplicates(self, df: pd.DataFrame, row_index: Optional[RowHashIndex] = None) -> Tuple[pd.DataFrame, int]:
+        """Remove duplicate rows, comparing only rows whose hashes repeat when row_index is given"""
         original_count = len(df)
-        df = df.drop_duplicates()
+        if row_index is None:
+            df = df.drop_duplicates()
+        else:
+            df = df[~row_index.duplicated(df)]
         removed_count = original_count - len(df)
         return df, removed_count
     
@@ -107,24 +205,29 @@ class CleaningOperations:
         col_key = column.strip().lower()
 
         if col_key not in column_map:
-            print(f"[WARN] Column '{column}' not found. Available columns: {list(df.columns)}")
+            logger.warning("Column '%s' not found. Available columns: %s", column, list(df.columns))
             return df, 0
 
         real_column = column_map[col_key]
 
-        fixed_count = 0
-        def standardize_phone(val):
-            nonlocal fixed_count
-            if pd.isna(val):
-                return val
-            digits = re.sub(r'\D', '', str(val))
-            if len(digits) == 10:
-                fixed_count += 1
-                return f"{digits[:3]}-{digits[3:6]}-{digits[6:]}"
-            return val
-
-        df[real_column] = df[real_column].apply(standardize_phone)
-        return df, fixed_count
+        # Standardize each distinct text once, then broadcast back by code.
+        # Keying on the text keeps 1, 1.0 and True apart, and entries that
+        # aren't fixed keep their original value.
+        values = df[real_column]
+        present = np.flatnonzero(values.notna().to_numpy())
+        codes, uniques = pd.factorize(values.iloc[present].astype(str))
+        digits = pd.Series(np.asarray(uniques, dtype=object)).str.replace(r'\D', '', regex=True)
+        fixable = digits.str.len().eq(10).to_numpy()
+        fix = digits[fixable]
+        formatted = (fix.str.slice(0, 3) + '-' + fix.str.slice(3, 6) + '-' + fix.str.slice(6)).to_numpy()
+        lookup = np.empty(len(uniques), dtype=object)
+        lookup[fixable] = formatted
+
+        fixed_rows = fixable[codes]
+        standardized = values.to_numpy(dtype=object, copy=True)
+        standardized[present[fixed_rows]] = lookup[codes[fixed_rows]]
+        df[real_column] = pd.Series(standardized, index=values.index)
+        return df, int(fixed_rows.sum())
 
     
     def fix_whitespace(self, df: pd.DataFrame, issue: Dict) -> Tuple[pd.DataFrame, int]:
@@ -133,7 +236,7 @@ class CleaningOperations:
         fixed_count = 0
         
         for col in columns:
-            if col in df.columns and df[col].dtype == 'object':
+            if col in df.columns and is_text_dtype(df[col].dtype):
                 original = df[col].copy()
                 df[col] = df[col].astype(str).str.strip()
                 fixed_count += (original != df[col]).sum()
@@ -0,0 +1,204 @@
+import pandas as pd
+from typing import Dict, List, Optional
+
+# Rough time per row in microseconds, measured on a million-row frame.
+# Costs marked per column are multiplied by the number of columns scanned.
+STEP_COSTS = {
+    'column_naming': 0.0,
+    'missing_values': 0.03,     # per column
+    'duplicates': 0.05,         # per column
+    'duplicates_indexed': 0.1,  # comparing only rows whose stored hashes repeat
+    'date_format': 5.0,
+    'phone_format': 0.1,
+    'whitespace': 0.6,          # per column
+    'remove_empty_rows': 0.1,   # per column
+}
+
+# Fixes that rewrite values one at a time, so rows equal before them are equal after
+VALUE_FIXES = ('date_format', 'phone_format', 'whitespace')
+ROW_FILTERS = ('missing_values', 'duplicates')
+
+
+def _step(operation: str, issues: List[Dict], column: Optional[str] = None, key: Optional[str] = None) -> Dict:
+    if key is None:
+        key = f"{operation}:" + '+'.join(str(issue['id']) for issue in issues)
+        if column is not None:
+            key += f"@{column}"
+    return {
+        'key': key,
+        'operation': operation,
+        'issues': issues,
+        'column': column,
+    }
+
+
+def _value_fix_groups(fixes: List[tuple]) -> List[Dict]:
+    """Fuse (issue, column) fixes into one step per column, keeping their order within a column"""
+    groups = {}
+    for issue, column in fixes:
+        groups.setdefault(column, []).append(issue)
+    return [_step('fix_column', issues, column) for column, issues in groups.items()]
+
+
+def plan_cleaning(columns: List, total_rows: int, issues: List[Dict], selected_issue_ids: List[int],
+                  has_row_index: bool = False) -> List[Dict]:
+    """Order the selected issues into cleaning steps that give the same data as
+    applying them one by one in issue order, but drop rows before fixing values.
+
+    - Column renames run first. Issues keep naming columns as analyzed, and
+      apply_cleaning finds them by position, so renames never hide them.
+    - Duplicate and missing-value removal run before the value fixes.
+      Duplicates that a fix could create are removed again right after the
+      fixes that preceded duplicate removal in issue order, unless one of
+      those trims whitespace; then only the second removal runs. Missing-value
+      removal waits for the whitespace fix if that came first, since
+      trimming turns missing values into text.
+    - Value fixes are split per column, and the fixes of one column are
+      fused into one step.
+
+    Each step gets its estimated rows, cost and a memo key. Issue types
+    without a cleaning operation are left out.
+    """
+    selected = [issue for issue in issues if issue['id'] in selected_issue_ids]
+    first = {}
+    for position, issue in enumerate(selected):
+        first.setdefault(issue['type'], position)
+    duplicates_at = first.get('duplicates', len(selected))
+    missing_after_whitespace = 'missing_values' in first and first.get('whitespace', len(selected)) < first['missing_values']
+
+    # Fixes before and after duplicate removal in issue order, per column
+    before, after = [], []
+    for position, issue in enumerate(selected):
+        if issue['type'] not in VALUE_FIXES:
+            continue
+        target = before if position < duplicates_at else after
+        if issue['type'] == 'whitespace':
+            # Split so each column can be fused with the other fixes on it
+            target += [(dict(issue, columns=[column]), column) for column in issue.get('columns', [])]
+        else:
+            target.append((issue, issue.get('column')))
+
+    renames = [issue for issue in selected if issue['type'] == 'column_naming']
+    duplicates = [issue for issue in selected if issue['type'] == 'duplicates']
+    missing = [issue for issue in selected if issue['type'] == 'missing_values']
+
+    # Trimming writes None and NaN as different text, which splits rows
+    # duplicate removal counts as equal, so duplicates can't go before it
+    dedupe_early = not any(issue['type'] == 'whitespace' for issue, _ in before)
+
+    plan = [_step('column_naming', renames)] if renames else []
+    if missing and not missing_after_whitespace:
+        plan.append(_step('missing_values', missing))
+    if duplicates and dedupe_early:
+        plan.append(_step('duplicates', duplicates))
+    plan += _value_fix_groups(before)
+    if duplicates and before:
+        plan.append(_step('duplicates', duplicates, key=f"duplicates:{duplicates[0]['id']}:again"))
+    plan += _value_fix_groups(after)
+    if missing and missing_after_whitespace:
+        # Right after the last whitespace step; it commutes with the others
+        trimmed_at = max(i for i, step in enumerate(plan) if any(s['type'] == 'whitespace' for s in step['issues']))
+        plan.insert(trimmed_at + 1, _step('missing_values', missing))
+    plan.append(_step('remove_empty_rows', [], key='remove_empty_rows'))
+
+    plan = _order_filters(plan, len(columns), has_row_index)
+    if duplicates and before and dedupe_early:
+        plan = _drop_early_duplicates_if_costly(plan, len(columns), total_rows, has_row_index)
+    return estimate_plan(plan, len(columns), total_rows, has_row_index)
+
+
+def _drop_early_duplicates_if_costly(plan: List[Dict], column_count: int, total_rows: int,
+                                     has_row_index: bool) -> List[Dict]:
+    """Skip the first duplicate removal when it costs more than the fixes it spares.
+
+    Its second run alone gives the same rows, so the first one only pays off
+    when later steps save more on the dropped duplicates than it takes.
+    """
+    early = next(i for i, step in enumerate(plan) if step['operation'] == 'duplicates')
+    duplicates = plan[early]['issues'][0].get('count', 0)
+    indexed = has_row_index and not any(
+        issue['type'] in VALUE_FIXES for step in plan[:early] for issue in step['issues']
+    )
+    cost = total_rows * _row_cost(plan[early], column_count, indexed)
+    saved = duplicates * sum(_row_cost(step, column_count, False) for step in plan[early + 1:])
+    return plan if saved > cost else plan[:early] + plan[early + 1:]
+
+
+def _order_filters(plan: List[Dict], column_count: int, has_row_index: bool) -> List[Dict]:
+    """Run the leading row filters cheapest first; filters commute with each other"""
+    leading = 1 if plan and plan[0]['operation'] == 'column_naming' else 0
+    end = leading
+    while end < len(plan) and plan[end]['operation'] in ROW_FILTERS:
+        end += 1
+    ordered = sorted(plan[leading:end], key=lambda step: _row_cost(step, column_count, has_row_index))
+    return plan[:leading] + ordered + plan[end:]
+
+
+def _row_cost(step: Dict, column_count: int, indexed: bool) -> float:
+    """Estimated microseconds per row of a step"""
+    operation = step['operation']
+    if operation == 'duplicates' and indexed:
+        return STEP_COSTS['duplicates_indexed']
+    if operation in ('missing_values', 'duplicates', 'remove_empty_rows'):
+        return STEP_COSTS[operation] * column_count
+    if operation == 'fix_column':
+        return sum(STEP_COSTS[issue['type']] for issue in step['issues'])
+    return STEP_COSTS.get(operation, 0.0)
+
+
+def estimate_plan(plan: List[Dict], column_count: int, total_rows: int, has_row_index: bool = False) -> List[Dict]:
+    """Fill in the rows each step sees and its estimated cost in milliseconds.
+
+    Duplicate removal is expected to drop the duplicate count the analysis
+    found; other row filters aren't expected to drop rows. Stored row hashes
+    only speed up duplicate removal while no value has been rewritten.
+    """
+    rows = total_rows
+    indexed = has_row_index
+    deduplicated = False
+    for step in plan:
+        step['rows_in'] = int(rows)
+        step['row_index'] = step['operation'] == 'duplicates' and indexed
+        step['estimated_ms'] = round(rows * _row_cost(step, column_count, step['row_index']) / 1000, 3)
+        if step['operation'] == 'duplicates' and not deduplicated:
+            rows = max(rows - step['issues'][0].get('count', 0), 0)
+            deduplicated = True
+        if any(issue['type'] in VALUE_FIXES for issue in step['issues']):
+            indexed = False
+    return plan
+
+
+def in_issue_order(issues: List[Dict], selected_issue_ids: List[int]) -> List[Dict]:
+    """The selected issues as one step each, in the order apply_cleaning ran them before planning"""
+    selected = [issue for issue in issues if issue['id'] in selected_issue_ids and issue['type'] in STEP_COSTS]
+    plan = []
+    for issue in selected:
+        if issue['type'] == 'whitespace':
+            plan += [_step('fix_column', [issue], column) for column in issue.get('columns', [])]
+        elif issue['type'] in VALUE_FIXES:
+            plan.append(_step('fix_column', [issue], issue.get('column')))
+        else:
+            plan.append(_step(issue['type'], [issue]))
+    return plan + [_step('remove_empty_rows', [], key='remove_empty_rows')]
+
+
+def explain_plan(plan: List[Dict], baseline: Optional[List[Dict]] = None) -> Dict:
+    """JSON-ready description of a plan, with the cost of the unplanned order for comparison"""
+    explained = {
+        'steps': [
+            {
+                'step': position,
+                'operation': step['operation'],
+                'issue_ids': [issue['id'] for issue in step['issues']],
+                'issue_types': [issue['type'] for issue in step['issues']],
+                'column': step['column'],
+                'rows_in': step['rows_in'],
+                'uses_row_index': step['row_index'],
+                'estimated_ms': step['estimated_ms'],
+            } for position, step in enumerate(plan, 1)
+        ],
+        'estimated_ms': round(sum(step['estimated_ms'] for step in plan), 3),
+    }
+    if baseline is not None:
+        explained['issue_order_estimated_ms'] = round(sum(step['estimated_ms'] for step in baseline), 3)
+    return explained
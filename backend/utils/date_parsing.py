@@ -0,0 +1,75 @@
+import pandas as pd
+import numpy as np
+from typing import Tuple
+from utils.patterns import DATE_PATTERNS, classify_formats
+
+# strptime formats tried, in order, for each format detected by the analyzer.
+# Month-first comes before day-first to match dateutil, which only reads a
+# date day-first when the month-first reading is invalid.
+DATE_FORMAT_CANDIDATES = {
+    'YYYY-MM-DD or YYYY/MM/DD': ['%Y-%m-%d', '%Y/%m/%d'],
+    'DD-MM-YYYY or MM-DD-YYYY': ['%m-%d-%Y', '%m/%d/%Y', '%d-%m-%Y', '%d/%m/%Y'],
+    'Mon DD, YYYY': ['%b %d, %Y', '%b %d %Y'],
+    'DD Month YYYY': ['%d %B %Y', '%d %b %Y'],
+}
+
+
+def parse_date_value(val):
+    """Parse a single value with pandas' flexible parser, or return None"""
+    try:
+        return pd.to_datetime(val)
+    except Exception:
+        return None
+
+
+def normalize_dates(series: pd.Series, output_format: str = '%Y-%m-%d') -> Tuple[pd.Series, int]:
+    """Rewrite every parseable date in a series to output_format.
+
+    Values are grouped by detected format and each group is parsed with one
+    vectorized ``to_datetime(format=...)`` call per candidate format. Only the
+    values no candidate accepts are parsed one at a time. Returns the new
+    series and the number of values that were parsed.
+    """
+    values = series.to_numpy(dtype=object, copy=True)
+    # Work positionally so duplicate index labels can't misassign values
+    positions = np.flatnonzero(series.notna().to_numpy())
+    if len(positions) == 0:
+        return pd.Series(values, index=series.index, name=series.name), 0
+    non_null = pd.Series(values[positions])
+
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        values[positions] = series.iloc[positions].dt.strftime(output_format).to_numpy()
+        return pd.Series(values, index=series.index, name=series.name), int(len(positions))
+
+    parsed = pd.Series(pd.NaT, index=non_null.index, dtype='datetime64[ns]')
+    as_str = non_null.astype(str)
+    labels = classify_formats(non_null, DATE_PATTERNS)
+
+    for label, formats in DATE_FORMAT_CANDIDATES.items():
+        pending = as_str[labels == label]
+        for fmt in formats:
+            if len(pending) == 0:
+                break
+            attempt = pd.to_datetime(pending, format=fmt, errors='coerce')
+            hits = attempt.dropna()
+            parsed[hits.index] = hits
+            pending = pending[attempt.isna()]
+
+    batch_hits = parsed.dropna()
+    values[positions[batch_hits.index]] = batch_hits.dt.strftime(output_format).to_numpy()
+    fixed_count = len(batch_hits)
+
+    # Anything left falls back to parsing each distinct original value once
+    fallback_cache = {}
+    for i in np.flatnonzero(parsed.isna().to_numpy()):
+        val = non_null.iat[i]
+        key = (type(val), val)
+        if key not in fallback_cache:
+            parsed_date = parse_date_value(val)
+            valid = parsed_date is not None and not pd.isna(parsed_date)
+            fallback_cache[key] = parsed_date.strftime(output_format) if valid else None
+        if fallback_cache[key] is not None:
+            values[positions[i]] = fallback_cache[key]
+            fixed_count += 1
+
+    return pd.Series(values, index=series.index, name=series.name), int(fixed_count)
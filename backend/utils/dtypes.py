@@ -0,0 +1,108 @@
+import sys
+import numpy as np
+import pandas as pd
+from typing import Dict
+
+
+def is_text_dtype(dtype) -> bool:
+    """Whether a column holds Python objects such as strings, including categoricals of them"""
+    if isinstance(dtype, pd.CategoricalDtype):
+        return dtype.categories.dtype == 'object'
+    return dtype == 'object'
+
+
+def as_text(values: pd.Series) -> pd.Series:
+    """Each value as str() writes it; astype(str) alone decodes bytes instead"""
+    text = values.astype(str)
+    if not is_text_dtype(values.dtype):
+        return text
+    categorical = isinstance(values.dtype, pd.CategoricalDtype)
+    kinds = pd.api.types.infer_dtype(values.cat.categories if categorical else values, skipna=True)
+    if kinds not in ('bytes', 'mixed', 'mixed-integer'):
+        return text
+    objects = values.to_numpy(dtype=object)
+    is_bytes = np.fromiter((isinstance(value, bytes) for value in objects), dtype=bool, count=len(objects))
+    if is_bytes.any():
+        text = text.copy()
+        text.iloc[np.flatnonzero(is_bytes)] = [str(value) for value in objects[is_bytes]]
+    return text
+
+
+def _is_numpy_integer(dtype) -> bool:
+    return isinstance(dtype, np.dtype) and dtype.kind in 'iu'
+
+
+def optimize_dtypes(df: pd.DataFrame, sample_rows: int = 10000, category_ratio: float = 0.5) -> pd.DataFrame:
+    """Store a parsed frame in compact dtypes without changing any value.
+
+    Integer columns are downcast to the smallest type holding their range.
+    String columns become categoricals when distinct values make up at most
+    category_ratio of an evenly spaced sample of rows, and stay categorical
+    only if the whole column passes the same test. Floats keep 64 bits,
+    since fewer would round some values.
+    """
+    step = max(len(df) // sample_rows, 1) if sample_rows > 0 else 1
+    sample = df.iloc[::step]
+    columns = {}
+    for i in range(df.shape[1]):
+        values = df.iloc[:, i]
+        if _is_numpy_integer(values.dtype):
+            columns[i] = pd.to_numeric(values, downcast='integer' if values.dtype.kind == 'i' else 'unsigned')
+        elif values.dtype == 'object':
+            candidate = sample.iloc[:, i].dropna()
+            # Only pure strings: 1, 1.0 and True would share one category
+            if len(candidate) == 0 or candidate.nunique() > category_ratio * len(candidate):
+                continue
+            if pd.api.types.infer_dtype(candidate, skipna=False) != 'string':
+                continue
+            encoded = values.astype('category')
+            categories = encoded.cat.categories
+            if (len(categories) <= category_ratio * encoded.count()
+                    and pd.api.types.infer_dtype(categories, skipna=False) == 'string'):
+                columns[i] = encoded
+    if not columns:
+        return df
+    optimized = df.copy(deep=False)
+    for i, values in columns.items():
+        optimized.isetitem(i, values)
+    return optimized
+
+
+def expand_categoricals(df: pd.DataFrame) -> pd.DataFrame:
+    """Same frame with categorical columns as object columns, e.g. so NaN can be replaced by None"""
+    categorical = {col: object for col, dtype in df.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)}
+    return df.astype(categorical) if categorical else df
+
+
+def logical_dtypes(df: pd.DataFrame) -> Dict[str, str]:
+    """Each column's dtype as read_csv would give it, hiding the compact ones optimize_dtypes picks"""
+    dtypes = {}
+    for col, dtype in df.dtypes.items():
+        if _is_numpy_integer(dtype):
+            dtype = np.dtype('int64' if dtype.kind == 'i' else 'uint64')
+        elif is_text_dtype(dtype):
+            dtype = np.dtype(object)
+        dtypes[col] = str(dtype)
+    return dtypes
+
+
+def plain_memory_usage(df: pd.DataFrame) -> int:
+    """Bytes the frame would use with pandas' default dtypes, as read_csv returns it"""
+    total = int(df.index.memory_usage(deep=True))
+    for i in range(df.shape[1]):
+        values = df.iloc[:, i]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # A pointer per row plus the Python object it points to
+            counts = values.value_counts(sort=False, dropna=False)
+            sizes = np.array([sys.getsizeof(value) for value in counts.index], dtype='int64')
+            total += 8 * len(values) + int((counts.to_numpy() * sizes).sum())
+        elif _is_numpy_integer(values.dtype):
+            total += 8 * len(values)
+        else:
+            total += int(values.memory_usage(index=False, deep=True))
+    return total
+
+
+def memory_usage(df: pd.DataFrame) -> int:
+    """Bytes the frame uses, including the Python objects it holds"""
+    return int(df.memory_usage(index=True, deep=True).sum())
@@ -0,0 +1,159 @@
+import logging
+import numpy as np
+import pandas as pd
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from openpyxl.styles import Alignment, Border, Font, Side
+from pandas.io.parsers import TextParser
+
+logger = logging.getLogger(__name__)
+
+# Rows per worksheet, including the header row
+EXCEL_MAX_ROWS = 1048576
+# Number format pandas gives datetime cells
+DATETIME_FORMAT = 'YYYY-MM-DD HH:MM:SS'
+
+
+def sheet_names(file_path: str) -> List[str]:
+    """Names of a workbook's worksheets, in order"""
+    if not file_path.endswith('.xlsx'):
+        return pd.ExcelFile(file_path).sheet_names
+    workbook = load_workbook(file_path, read_only=True, keep_links=False)
+    try:
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+
+
+def _convert_cell(cell):
+    """Cell value as pd.read_excel sees it: empty cells are "" and whole floats are ints"""
+    if cell.value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return np.nan
+    if cell.data_type == TYPE_NUMERIC:
+        value = int(cell.value)
+        return value if value == cell.value else float(cell.value)
+    return cell.value
+
+
+def _sheet_rows(worksheet) -> Iterator[list]:
+    """Converted rows without trailing empty cells, dropping empty rows at the end of the sheet"""
+    pending = []
+    for row in worksheet.rows:
+        values = [_convert_cell(cell) for cell in row]
+        while values and values[-1] == "":
+            values.pop()
+        if not values:
+            # Only kept if a row with data follows
+            pending.append(values)
+            continue
+        if pending:
+            yield from pending
+            pending = []
+        yield values
+
+
+def read_excel_chunks(file_path: str, chunksize: int, sheet: Optional[str] = None,
+                      as_text: bool = False) -> Iterator[pd.DataFrame]:
+    """Stream a worksheet as DataFrames of at most chunksize rows.
+
+    Rows are read from a read-only workbook and parsed like pd.read_excel
+    does, so each chunk matches the same rows of the whole-sheet read. The
+    width is the widest row among the header and the first chunk; cells
+    beyond it in later rows are dropped. With as_text, values are kept as
+    strings instead of being converted to numbers.
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        worksheet = workbook[sheet] if sheet is not None else workbook.worksheets[0]
+        # Size the sheet by its rows, not by a possibly stale dimension tag
+        worksheet.reset_dimensions()
+        rows = _sheet_rows(worksheet)
+        batch = list(islice(rows, chunksize + 1))
+        if not batch:
+            yield pd.DataFrame()
+            return
+
+        width = max(len(row) for row in batch)
+        header, batch = batch[0] + [""] * (width - len(batch[0])), batch[1:]
+        start = 0
+        warned = False
+        while True:
+            if not warned and any(len(row) > width for row in batch):
+                logger.warning("%s has rows wider than its first %d rows; extra cells are skipped", file_path, chunksize)
+                warned = True
+            padded = [row[:width] + [""] * (width - len(row)) for row in batch]
+            # Rows without data are kept as rows of NaN, as pd.read_excel does
+            chunk = TextParser([header] + padded, header=0, skip_blank_lines=False,
+                               dtype=str if as_text else None).read()
+            chunk.index = pd.RangeIndex(start, start + len(chunk))
+            yield chunk
+            start += len(chunk)
+            batch = list(islice(rows, chunksize))
+            if not batch:
+                break
+    finally:
+        workbook.close()
+
+
+def _header_cell(worksheet, value) -> WriteOnlyCell:
+    """Header cell styled like pandas' to_excel header"""
+    cell = WriteOnlyCell(worksheet, value=value)
+    cell.font = Font(bold=True)
+    side = Side(style='thin')
+    cell.border = Border(left=side, right=side, top=side, bottom=side)
+    cell.alignment = Alignment(horizontal='center', vertical='top')
+    return cell
+
+
+def _cell_values(worksheet, series: pd.Series) -> list:
+    """Every value of a column ready for a write-only row, with missing values as empty cells"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    missing = series.isna().to_numpy()
+
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        if series.dt.tz is not None:
+            # Excel has no time zones; keep the local wall-clock time
+            series = series.dt.tz_localize(None)
+        values = np.empty(len(series), dtype=object)
+        for i, value in enumerate(series.dt.to_pydatetime()):
+            if not missing[i]:
+                values[i] = WriteOnlyCell(worksheet, value=value)
+                values[i].number_format = DATETIME_FORMAT
+        return values.tolist()
+
+    values = series.to_numpy(dtype=object, copy=True)
+    if pd.api.types.is_float_dtype(series.dtype):
+        # pandas writes infinities as text
+        floats = series.to_numpy(dtype='float64', na_value=np.nan)
+        values[floats == np.inf] = 'inf'
+        values[floats == -np.inf] = '-inf'
+    values[missing] = None
+    return values.tolist()
+
+
+def write_excel(chunks: Iterable[pd.DataFrame], file_path: str, sheet_title: str = 'Sheet1'):
+    """Write DataFrame chunks as one worksheet, row by row through a write-only workbook.
+
+    Only the rows of the current chunk are held in memory, unlike to_excel,
+    which builds every cell of the workbook before saving.
+    """
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_title)
+    rows_written = 0
+    for i, chunk in enumerate(chunks):
+        if i == 0 and len(chunk.columns) > 0:
+            worksheet.append([_header_cell(worksheet, col) for col in chunk.columns])
+            rows_written += 1
+        rows_written += len(chunk)
+        if rows_written > EXCEL_MAX_ROWS:
+            raise ValueError(f"This sheet is too large! Excel allows at most {EXCEL_MAX_ROWS} rows")
+        columns = [_cell_values(worksheet, chunk.iloc[:, j]) for j in range(chunk.shape[1])]
+        for row in zip(*columns):
+            worksheet.append(row)
+    workbook.save(file_path)
@@ -0,0 +1,199 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Upper bounds in seconds of the stage latency histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+PREFIX = 'datacleaning_stage'
+
+# Stages recorded while collect_stages is active in this context
+_collected: ContextVar[Optional[List[Dict]]] = ContextVar('collected_stages', default=None)
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = None
+
+
+def resident_memory() -> Optional[int]:
+    """Resident set size of this process in bytes, where /proc provides it"""
+    if _PAGE_SIZE is None:
+        return None
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class _StageSeries:
+    """Everything recorded for one (stage, operation) pair"""
+
+    def __init__(self, bucket_count: int):
+        self.buckets = [0] * bucket_count
+        self.count = 0
+        self.seconds = 0.0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.errors = 0
+        self.memory_delta = None
+        self.memory_delta_max = None
+
+
+class StageMetrics:
+    """Latency histograms, row totals and memory deltas per processing stage.
+
+    Rendered in the Prometheus text format by ``render``. Memory deltas are
+    the change in the resident size of the whole process, so stages running
+    at the same time on other threads show up in each other's deltas.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        self.bucket_bounds = tuple(buckets)
+        self._series: Dict[Tuple[str, str], _StageSeries] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, record: Dict):
+        """Add one stage record, as produced by ``stage``"""
+        key = (record['stage'], record['operation'])
+        seconds = record['seconds']
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _StageSeries(len(self.bucket_bounds))
+            for position, bound in enumerate(self.bucket_bounds):
+                if seconds <= bound:
+                    series.buckets[position] += 1
+                    break
+            series.count += 1
+            series.seconds += seconds
+            series.rows_in += record.get('rows_in') or 0
+            series.rows_out += record.get('rows_out') or 0
+            series.errors += 1 if record.get('failed') else 0
+            delta = record.get('memory_delta')
+            if delta is not None:
+                series.memory_delta = delta
+                series.memory_delta_max = delta if series.memory_delta_max is None else max(series.memory_delta_max, delta)
+
+    def observe_all(self, records: List[Dict]):
+        for record in records:
+            self.observe(record)
+
+    def render(self) -> str:
+        """All series in the Prometheus text exposition format"""
+        with self._lock:
+            series = sorted(self._series.items())
+            lines = [
+                f"# HELP {PREFIX}_duration_seconds Time spent in each processing stage",
+                f"# TYPE {PREFIX}_duration_seconds histogram",
+            ]
+            for (stage_name, operation), values in series:
+                labels = _labels(stage=stage_name, operation=operation)
+                cumulative = 0
+                for bound, count in zip(self.bucket_bounds, values.buckets):
+                    cumulative += count
+                    lines.append(f"{PREFIX}_duration_seconds_bucket{{{labels},le=\"{bound:g}\"}} {cumulative}")
+                lines.append(f"{PREFIX}_duration_seconds_bucket{{{labels},le=\"+Inf\"}} {values.count}")
+                lines.append(f"{PREFIX}_duration_seconds_sum{{{labels}}} {values.seconds:.6f}")
+                lines.append(f"{PREFIX}_duration_seconds_count{{{labels}}} {values.count}")
+
+            for name, kind, help_text, field in (
+                ('rows_in_total', 'counter', 'Rows passed into each processing stage', 'rows_in'),
+                ('rows_out_total', 'counter', 'Rows left after each processing stage', 'rows_out'),
+                ('errors_total', 'counter', 'Processing stages that raised an error', 'errors'),
+                ('memory_delta_bytes', 'gauge', 'Change in resident memory over the last run of each stage', 'memory_delta'),
+                ('memory_delta_max_bytes', 'gauge', 'Largest change in resident memory over a run of each stage', 'memory_delta_max'),
+            ):
+                lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+                lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+                for (stage_name, operation), values in series:
+                    value = getattr(values, field)
+                    if value is not None:
+                        lines.append(f"{PREFIX}_{name}{{{_labels(stage=stage_name, operation=operation)}}} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _labels(**labels) -> str:
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+    return ','.join(f'{name}="{value}"' for name, value in escaped)
+
+
+# Stages recorded in this process
+metrics = StageMetrics()
+
+
+@contextmanager
+def stage(stage_name: str, operation: str, rows_in: Optional[int] = None, **details) -> Iterator[Dict]:
+    """Time the enclosed block and record it as one run of a stage.
+
+    Yields the record, so the block can set ``rows_out`` (and correct
+    ``rows_in``) once it knows them. details, such as the column a step
+    fixed, are kept in per-request breakdowns but not in the metrics.
+    """
+    record = {'stage': stage_name, 'operation': operation, 'rows_in': rows_in, 'rows_out': None, **details}
+    memory = resident_memory()
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException:
+        record['failed'] = True
+        raise
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        after = resident_memory() if memory is not None else None
+        record['memory_delta'] = after - memory if after is not None else None
+        metrics.observe(record)
+        collected = _collected.get()
+        if collected is not None:
+            collected.append(record)
+
+
+@contextmanager
+def collect_stages() -> Iterator[List[Dict]]:
+    """Gather the stages recorded in this context into the yielded list"""
+    records = []
+    token = _collected.set(records)
+    try:
+        yield records
+    finally:
+        _collected.reset(token)
+
+
+def run_collected(func: Callable, *args, **kwargs) -> Tuple[object, List[Dict]]:
+    """Call func and return its result with the stages it recorded"""
+    with collect_stages() as records:
+        result = func(*args, **kwargs)
+    return result, records
+
+
+def timing_breakdown(records: List[Dict]) -> Dict:
+    """JSON-ready summary of the stages one request went through"""
+    return {
+        'total_seconds': round(sum(record['seconds'] for record in records), 4),
+        'stages': [
+            {
+                **{key: value for key, value in record.items() if key not in ('seconds', 'memory_delta')},
+                'seconds': round(record['seconds'], 4),
+                'memory_delta_bytes': record['memory_delta'],
+            } for record in records
+        ],
+    }
+
+
+def server_timing(records: List[Dict]) -> str:
+    """Stages as a Server-Timing header value, durations in milliseconds"""
+    return ', '.join(
+        f"{record['stage']}-{record['operation']};dur={record['seconds'] * 1000:.1f}"
+        for record in records
+    )
@@ -0,0 +1,41 @@
+import re
+import pandas as pd
+from typing import List, Tuple, Pattern
+from utils.dtypes import as_text
+
+# Formats are tested in order and a value takes the first one it matches
+DATE_PATTERNS: List[Tuple[str, Pattern]] = [
+    ('YYYY-MM-DD or YYYY/MM/DD', re.compile(r'\d{4}[-/]\d{1,2}[-/]\d{1,2}')),
+    ('DD-MM-YYYY or MM-DD-YYYY', re.compile(r'\d{1,2}[-/]\d{1,2}[-/]\d{4}')),
+    ('Mon DD, YYYY', re.compile(r'\w{3}\s+\d{1,2},?\s+\d{4}')),
+    ('DD Month YYYY', re.compile(r'\d{1,2}\s+\w+\s+\d{4}')),
+]
+
+PHONE_PATTERNS: List[Tuple[str, Pattern]] = [
+    ('XXX-XXX-XXXX', re.compile(r'\d{3}-\d{3}-\d{4}')),
+    ('(XXX) XXX-XXXX', re.compile(r'\(\d{3}\)\s*\d{3}-\d{4}')),
+    ('XXXXXXXXXX', re.compile(r'\d{10}')),
+    ('XXX XXX XXXX', re.compile(r'\d{3}\s+\d{3}\s+\d{4}')),
+]
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+
+def classify_formats(values: pd.Series, patterns: List[Tuple[str, Pattern]]) -> pd.Series:
+    """Label each value with the first format it matches, or None"""
+    as_str = as_text(values)
+    labels = pd.Series(None, index=values.index, dtype=object)
+    unmatched = pd.Series(True, index=values.index)
+    for label, pattern in patterns:
+        matched = unmatched & as_str.str.match(pattern)
+        labels[matched] = label
+        unmatched &= ~matched
+    return labels
+
+
+def match_formats(values: pd.Series, patterns: List[Tuple[str, Pattern]]) -> set:
+    """Return the set of formats matched by at least one value"""
+    if len(values) == 0:
+        return set()
+    return set(classify_formats(values, patterns).dropna().unique())
+
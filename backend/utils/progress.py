@@ -0,0 +1,13 @@
+import time
+from typing import Callable, Dict, Optional
+
+# Receives one event dict per finished check or cleaning step
+ProgressCallback = Callable[[Dict], None]
+
+
+def report_progress(callback: Optional[ProgressCallback], start: float, **event):
+    """Send a progress event stamped with the seconds elapsed since start"""
+    if callback is None:
+        return
+    event['elapsed'] = round(time.perf_counter() - start, 3)
+    callback(event)
@@ -0,0 +1,56 @@
+import pandas as pd
+import numpy as np
+from typing import Optional
+
+
+class RowHashIndex:
+    """64-bit fingerprint of every row of a dataset, built once and stored
+    next to it.
+
+    Rows df.duplicated() considers equal always share a fingerprint, so
+    duplicates are found by comparing only the rows whose fingerprints
+    repeat. Fingerprints come from DataProfile.row_hashes for whole frames
+    and from row_fingerprints for files analyzed chunk by chunk.
+    """
+
+    COLUMN = 'row_hash'
+
+    def __init__(self, hashes: np.ndarray):
+        self.hashes = np.asarray(hashes, dtype=np.uint64)
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> 'RowHashIndex':
+        """Load an index saved with to_frame"""
+        return cls(frame[cls.COLUMN].to_numpy())
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({self.COLUMN: self.hashes})
+
+    def covers(self, df: pd.DataFrame) -> bool:
+        """Whether df holds the indexed rows, labelled by their positions"""
+        return isinstance(df.index, pd.RangeIndex) and df.index.equals(pd.RangeIndex(len(self.hashes)))
+
+    def duplicate_count(self) -> int:
+        """Rows whose fingerprint appeared earlier, as the chunked analysis counts duplicates"""
+        return int(pd.Series(self.hashes).duplicated().sum())
+
+    def candidates(self, positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """Positions among the given rows (all by default) whose fingerprint repeats"""
+        hashes = self.hashes if positions is None else self.hashes[positions]
+        return np.flatnonzero(pd.Series(hashes).duplicated(keep=False).to_numpy())
+
+    def duplicated(self, df: pd.DataFrame) -> np.ndarray:
+        """Same mask as df.duplicated() for a subset of the indexed rows.
+
+        df's index labels must be the rows' positions in the indexed dataset,
+        and their values unchanged since the index was built.
+        """
+        candidates = self.candidates(df.index.to_numpy())
+        mask = np.zeros(len(df), dtype=bool)
+        if len(candidates):
+            # Rows with a unique fingerprint can't equal any other row
+            mask[candidates] = df.iloc[candidates].duplicated().to_numpy()
+        return mask
@@ -0,0 +1,145 @@
+import math
+import numpy as np
+import pandas as pd
+from typing import Optional, Tuple
+
+# "head" takes the first rows, "reservoir" a uniform random sample and
+# "stratified" one random row from each of size equal slices of the file
+SAMPLING_MODES = ('head', 'reservoir', 'stratified')
+
+# z for a 95% confidence interval
+CONFIDENCE_Z = 1.96
+
+
+def row_keys(positions: np.ndarray, seed: int = 0) -> np.ndarray:
+    """A uniform number in [0, 1) for each row position.
+
+    Keys come from hashing the position (splitmix64), so a row gets the same
+    key however the file is split into chunks.
+    """
+    z = positions.astype(np.uint64) + np.uint64((seed + 1) * 0x9E3779B97F4A7C15 % 2 ** 64)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def stratified_positions(total_rows: int, size: int, seed: int = 0) -> np.ndarray:
+    """Sorted row positions, one drawn from each of size equal slices of total_rows rows"""
+    if size <= 0:
+        return np.empty(0, dtype=np.int64)
+    if total_rows <= size:
+        return np.arange(total_rows, dtype=np.int64)
+    bounds = np.arange(size + 1, dtype=np.int64) * total_rows // size
+    offsets = (row_keys(np.arange(size), seed) * (bounds[1:] - bounds[:-1])).astype(np.int64)
+    return bounds[:-1] + offsets
+
+
+class StreamSampler:
+    """Samples up to size rows of a Series or DataFrame fed one chunk at a time.
+
+    Rows are picked by position alone, so the sample doesn't depend on how
+    the rows are chunked, and samplers over consecutive parts of a file can
+    be combined with ``merge``. Stratified sampling needs total_rows and
+    falls back to reservoir sampling without it. Only eligible rows, such as
+    non-null values, are kept, so stratified samples of sparse columns come
+    out smaller than size.
+    """
+
+    def __init__(self, size: int, mode: str = 'stratified', total_rows: Optional[int] = None,
+                 seed: int = 0, start_row: int = 0):
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Unsupported sampling mode: {mode}")
+        if mode == 'stratified' and total_rows is None:
+            mode = 'reservoir'
+        self.size = size
+        self.mode = mode
+        self.seed = seed
+        self.offset = start_row
+        self.strata = stratified_positions(total_rows, size, seed) if mode == 'stratified' else None
+        self.pieces = []  # sampled rows of each chunk, in file order
+        self.keys = []    # reservoir keys of those rows
+        self.count = 0
+
+    def update(self, values, eligible: Optional[np.ndarray] = None):
+        """Fold the next chunk of rows into the sample"""
+        n = len(values)
+        if eligible is None:
+            eligible = np.ones(n, dtype=bool)
+        if self.mode == 'head':
+            picks = np.flatnonzero(eligible)[:max(self.size - self.count, 0)]
+        elif self.mode == 'stratified':
+            local = self.strata[(self.strata >= self.offset) & (self.strata < self.offset + n)] - self.offset
+            picks = local[eligible[local]]
+        else:
+            picks = np.flatnonzero(eligible)
+        keys = row_keys(picks + self.offset, self.seed) if self.mode == 'reservoir' else np.zeros(len(picks))
+        if len(picks) > self.size:
+            kept = np.sort(np.argpartition(keys, self.size - 1)[:self.size]) if self.size > 0 else []
+            picks, keys = picks[kept], keys[kept]
+        self.offset += n
+        self._add(values.iloc[picks], keys)
+
+    def merge(self, other: 'StreamSampler') -> 'StreamSampler':
+        """Combine with a sampler over the rows that follow this one"""
+        for piece, keys in zip(other.pieces, other.keys):
+            self._add(piece, keys)
+        self.offset = other.offset
+        return self
+
+    def sample(self):
+        """The sampled rows in file order, or None if no chunk was seen"""
+        if not self.pieces:
+            return None
+        self._compact()
+        return self.pieces[0]
+
+    def _add(self, piece, keys: np.ndarray):
+        if not self.pieces or len(piece):
+            self.pieces.append(piece)
+            self.keys.append(keys)
+            self.count += len(piece)
+        # Trim in batches, so a long stream of small chunks stays linear
+        if self.count >= 2 * max(self.size, 1):
+            self._compact()
+
+    def _compact(self):
+        """Join the pieces into one holding at most size rows"""
+        piece = pd.concat(self.pieces) if len(self.pieces) > 1 else self.pieces[0]
+        keys = np.concatenate(self.keys)
+        if len(keys) > self.size:
+            if self.mode == 'reservoir':
+                kept = np.sort(np.argpartition(keys, self.size - 1)[:self.size]) if self.size > 0 else []
+            else:
+                # Head samples keep the first rows; stratified ones never exceed size
+                kept = np.arange(self.size)
+            piece, keys = piece.iloc[kept], keys[kept]
+        self.pieces, self.keys, self.count = [piece], [keys], len(piece)
+
+
+def sample_values(series: pd.Series, size: int, mode: str = 'stratified', seed: int = 0) -> pd.Series:
+    """Up to size non-null values of a series, picked as StreamSampler would"""
+    sampler = StreamSampler(size, mode, len(series), seed)
+    sampler.update(series, series.notna().to_numpy())
+    return sampler.sample()
+
+
+def sample_positions(total_rows: int, size: int, mode: str = 'stratified', seed: int = 0,
+                     chunk_rows: int = 1000000) -> np.ndarray:
+    """Positions of the rows StreamSampler would pick out of total_rows rows"""
+    sampler = StreamSampler(size, mode, total_rows, seed)
+    for start in range(0, total_rows, chunk_rows):
+        sampler.update(pd.Series(np.arange(start, min(start + chunk_rows, total_rows), dtype=np.int64)))
+    sample = sampler.sample()
+    return np.empty(0, dtype=np.int64) if sample is None else sample.to_numpy()
+
+
+def wilson_interval(successes: int, trials: int, z: float = CONFIDENCE_Z) -> Tuple[float, float]:
+    """Wilson score interval for a proportion, which stays within [0, 1] for rare issues"""
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+from typing import List
+
+# COPY text format escapes; the backslash must be replaced first
+COPY_ESCAPES = [('\\', '\\\\'), ('\t', '\\t'), ('\n', '\\n'), ('\r', '\\r')]
+
+
+def sql_identifier(name) -> str:
+    """Quote a table or column name, so reserved words and spaces are safe"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def sql_column_type(dtype) -> str:
+    """SQL column type for a pandas dtype, including nullable extension types"""
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'BOOLEAN'
+    if pd.api.types.is_integer_dtype(dtype):
+        numpy_dtype = np.dtype(getattr(dtype, 'numpy_dtype', dtype))
+        # 64-bit and unsigned 32-bit values don't fit a 32-bit INTEGER
+        value_bits = numpy_dtype.itemsize * 8 - (1 if numpy_dtype.kind == 'i' else 0)
+        return 'BIGINT' if value_bits > 31 else 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'DECIMAL(10,2)'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'TIMESTAMP'
+    return 'VARCHAR(255)'
+
+
+def _datetime_text(values: pd.Series) -> pd.Series:
+    if values.dt.tz is not None:
+        # Keep the local wall-clock time
+        values = values.dt.tz_localize(None)
+    # Only keep fractional seconds when some value has them
+    unit = 'us' if (values.dt.microsecond != 0).any() else 's'
+    text = np.datetime_as_string(values.to_numpy(dtype='datetime64[ns]'), unit=unit)
+    return pd.Series(text, index=values.index, dtype=object).str.replace('T', ' ', n=1, regex=False)
+
+
+def _format_column(series: pd.Series, null: str, true: str, false: str, quote_text: bool) -> List[str]:
+    """Format every value of a column at once; nulls and non-finite floats become null"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    dtype = series.dtype
+    missing = series.isna().to_numpy()
+    if pd.api.types.is_float_dtype(dtype):
+        missing |= ~np.isfinite(series.to_numpy(dtype='float64', na_value=np.nan))
+    present = series[~missing]
+
+    if pd.api.types.is_bool_dtype(dtype):
+        text = pd.Series(np.where(present.to_numpy(dtype=bool), true, false), index=present.index)
+    elif pd.api.types.is_integer_dtype(dtype):
+        text = pd.Series(list(map(str, present.tolist())), index=present.index, dtype=object)
+    elif pd.api.types.is_float_dtype(dtype):
+        text = present.astype(str)
+    elif pd.api.types.is_datetime64_any_dtype(dtype):
+        text = _datetime_text(present)
+        if quote_text:
+            text = "'" + text + "'"
+    else:
+        text = present.astype(str)
+        if quote_text:
+            text = "'" + text.str.replace("'", "''", regex=False) + "'"
+        else:
+            for char, escaped in COPY_ESCAPES:
+                text = text.str.replace(char, escaped, regex=False)
+
+    formatted = np.full(len(series), null, dtype=object)
+    formatted[~missing] = text.to_numpy(dtype=object)
+    return formatted.tolist()
+
+
+def sql_literals(series: pd.Series) -> List[str]:
+    """SQL literal for every value of a column"""
+    return _format_column(series, 'NULL', 'TRUE', 'FALSE', quote_text=True)
+
+
+def copy_fields(series: pd.Series) -> List[str]:
+    """COPY text-format field for every value of a column"""
+    return _format_column(series, '\\N', 't', 'f', quote_text=False)
+
+
+def _join_rows(columns: List[List[str]], sep: str, prefix: str = '', suffix: str = '') -> List[str]:
+    """Join formatted columns into one string per row"""
+    return [prefix + sep.join(values) + suffix for values in zip(*columns)]
+
+
+def create_table_statement(df: pd.DataFrame, table_name: str) -> str:
+    """CREATE TABLE statement matching the DataFrame's columns and dtypes"""
+    columns = [f"    {sql_identifier(col)} {sql_column_type(df[col].dtype)}" for col in df.columns]
+    return f"CREATE TABLE {sql_identifier(table_name)} (\n" + ",\n".join(columns) + "\n);\n\n"
+
+
+def insert_statements(df: pd.DataFrame, table_name: str, batch_size: int) -> str:
+    """INSERT statements with up to batch_size rows each"""
+    if len(df) == 0 or len(df.columns) == 0:
+        return ''
+    column_list = ', '.join(sql_identifier(col) for col in df.columns)
+    head = f"INSERT INTO {sql_identifier(table_name)} ({column_list}) VALUES"
+    literals = [sql_literals(df.iloc[:, i]) for i in range(len(df.columns))]
+    rows = _join_rows(literals, ', ', '(', ')')
+
+    # Single-row statements stay on one line
+    separator = ' ' if batch_size == 1 else '\n'
+    statements = []
+    for start in range(0, len(rows), batch_size):
+        statements.append(head + separator + ',\n'.join(rows[start:start + batch_size]) + ';\n')
+    return ''.join(statements)
+
+
+def copy_block(df: pd.DataFrame, table_name: str) -> str:
+    """COPY ... FROM stdin block with tab-separated rows, for bulk loading into PostgreSQL"""
+    if len(df) == 0 or len(df.columns) == 0:
+        return ''
+    column_list = ', '.join(sql_identifier(col) for col in df.columns)
+    fields = [copy_fields(df.iloc[:, i]) for i in range(len(df.columns))]
+    rows = _join_rows(fields, '\t')
+    return f"COPY {sql_identifier(table_name)} ({column_list}) FROM stdin;\n" + '\n'.join(rows) + "\n\\.\n\n"